@@ -46,6 +46,13 @@ def backup_database():
         # コンテキストマネージャーを使用してデータベースに接続
         with DatabaseConnection(DB_FILE) as con:
             logger.debug(f"Connected to source database '{DB_FILE}'.")
+            # WAL に溜まった変更を本体に書き戻し、WAL ファイルを切り詰めてからバックアップする
+            busy, log, checkpointed = con.execute(
+                "PRAGMA wal_checkpoint(TRUNCATE)"
+            ).fetchone()
+            logger.debug(
+                f"Executed WAL checkpoint before backup. busy={busy}, log={log}, checkpointed={checkpointed}"
+            )
             # バックアップデータベースに接続 (存在しない場合は作成される)
             with DatabaseConnection(backup_file) as bck:
                 logger.debug(f"Connected to backup database '{backup_file}'.")
@@ -0,0 +1,192 @@
+"""
+インテントとキャッシュのプロファイルごとのメモリ使用量のベンチマーク。
+各プロファイルの設定で discord.py のクライアントの状態を作成し、ゲートウェイから届くものと同じ形式の
+GUILD_CREATE (メンバー・ボイスステート・プレゼンス) と MESSAGE_CREATE のデータを読み込ませて、
+キャッシュに保持されるメンバー数・メッセージ数とメモリ使用量を比較します。
+
+使い方: python bench_client_profiles.py [ギルド数] [1ギルドあたりのメンバー数] [1ギルドあたりの通話中のメンバー数] [1ギルドあたりのメッセージ数]
+"""
+
+import sys
+import tracemalloc
+from typing import Any
+
+import discord
+
+import constants
+from client_profile import build_client_options
+
+_USER_ID_BASE = 10**17
+
+
+def _member_payload(user_id: int) -> dict:
+    return {
+        "user": {
+            "id": str(user_id),
+            "username": f"user{user_id}",
+            "discriminator": "0",
+            "global_name": f"User {user_id}",
+            "avatar": None,
+        },
+        "roles": [],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+        "nick": None,
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def _guild_payload(
+    guild_id: int,
+    member_count: int,
+    voice_count: int,
+    intents: discord.Intents,
+    chunk_members: bool,
+) -> dict:
+    voice_channel_id = guild_id + 1
+    user_ids = [
+        _USER_ID_BASE + guild_id * member_count + i for i in range(member_count)
+    ]
+    members = [_member_payload(user_id) for user_id in user_ids]
+    data: dict = {
+        "id": str(guild_id),
+        "name": f"guild{guild_id}",
+        "member_count": member_count,
+        "roles": [
+            {
+                "id": str(guild_id),
+                "name": "@everyone",
+                "permissions": "0",
+                "position": 0,
+                "color": 0,
+                "hoist": False,
+                "managed": False,
+                "mentionable": False,
+            }
+        ],
+        "channels": [
+            {
+                "id": str(voice_channel_id),
+                "type": 2,
+                "name": "voice",
+                "position": 0,
+                "permission_overwrites": [],
+                "bitrate": 64000,
+                "user_limit": 0,
+            },
+            {
+                "id": str(guild_id + 2),
+                "type": 0,
+                "name": "text",
+                "position": 1,
+                "permission_overwrites": [],
+            },
+        ],
+        "voice_states": [
+            {
+                "user_id": str(user_ids[i]),
+                "channel_id": str(voice_channel_id),
+                "session_id": "session",
+                "deaf": False,
+                "mute": False,
+                "self_deaf": False,
+                "self_mute": False,
+                "suppress": False,
+            }
+            for i in range(voice_count)
+        ],
+        # 全メンバーはメンバーのインテントがあり起動時に取得する場合だけ届く (それ以外は通話中のメンバーのみ)
+        "members": members if chunk_members else members[:voice_count],
+    }
+    if intents.presences:
+        data["presences"] = [
+            {
+                "user": {"id": str(user_id)},
+                "status": "online",
+                "activities": [],
+                "client_status": {"desktop": "online"},
+            }
+            for user_id in user_ids
+        ]
+    return data
+
+
+def _message_payload(message_id: int, guild_id: int, user_id: int) -> dict:
+    return {
+        "id": str(message_id),
+        "channel_id": str(guild_id + 2),
+        "guild_id": str(guild_id),
+        "author": _member_payload(user_id)["user"],
+        "content": "message " * 10,
+        "timestamp": "2024-01-01T00:00:00+00:00",
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+
+def _measure_profile(
+    profile: str,
+    guild_count: int,
+    member_count: int,
+    voice_count: int,
+    message_count: int,
+):
+    options = build_client_options(profile)
+    intents = options["intents"]
+    client = discord.Client(**options)
+    state = client._connection
+
+    tracemalloc.start()
+    for n in range(guild_count):
+        guild_id = (n + 1) << 22
+        data: Any = _guild_payload(
+            guild_id,
+            member_count,
+            voice_count,
+            intents,
+            options["chunk_guilds_at_startup"],
+        )
+        state._add_guild(discord.Guild(data=data, state=state))
+        # メッセージのイベントはギルドメッセージのインテントがある場合だけ届く
+        if intents.guild_messages:
+            for i in range(message_count):
+                message: Any = _message_payload(
+                    guild_id + 100 + i, guild_id, _USER_ID_BASE + i % member_count
+                )
+                state.parse_message_create(message)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    cached_members = sum(len(guild.members) for guild in client.guilds)
+    cached_messages = len(client.cached_messages)
+    return size, cached_members, cached_messages
+
+
+def main():
+    guild_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    member_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    voice_count = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    message_count = int(sys.argv[4]) if len(sys.argv) > 4 else 500
+
+    print(
+        f"guilds={guild_count}, members per guild={member_count}, in voice={voice_count}, messages per guild={message_count}"
+    )
+    for profile in constants.CLIENT_PROFILES:
+        size, cached_members, cached_messages = _measure_profile(
+            profile, guild_count, member_count, voice_count, message_count
+        )
+        print(
+            f"{profile}: {size / 1024 / 1024:.2f} MiB, cached members {cached_members}, cached messages {cached_messages}"
+        )
+
+
+if __name__ == "__main__":
+    main()
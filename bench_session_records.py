@@ -0,0 +1,133 @@
+"""
+2人以上通話セッションの記録形式のベンチマーク。
+以前の辞書 + datetime 形式と、VoiceSession (slots dataclass + エポック秒) 形式について、
+セッションあたりのメモリ使用量と update_session_members 相当の処理時間を比較します。
+
+使い方: python bench_session_records.py [セッション数] [1セッションあたりのメンバー数]
+"""
+
+import datetime
+import itertools
+import sys
+import time
+import timeit
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any
+
+from voice_state_manager import StatisticalSessionManager, VoiceSession, logger
+
+
+def _build_legacy_sessions(session_count: int, member_count: int) -> dict:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return {
+        (1, channel_id): {
+            "session_start": now,
+            # 実際の参加時刻はメンバーごとに異なるため、別々のオブジェクトにする
+            "current_members": {
+                channel_id * 1000 + m: now + datetime.timedelta(microseconds=m)
+                for m in range(member_count)
+            },
+            "all_participants": {channel_id * 1000 + m for m in range(member_count)},
+        }
+        for channel_id in range(session_count)
+    }
+
+
+def _build_record_sessions(session_count: int, member_count: int) -> dict:
+    now = time.time()
+    return {
+        (1, channel_id): VoiceSession(
+            now,
+            {channel_id * 1000 + m: now + m * 1e-6 for m in range(member_count)},
+            {channel_id * 1000 + m for m in range(member_count)},
+        )
+        for channel_id in range(session_count)
+    }
+
+
+def _measure_bytes_per_session(builder, session_count: int, member_count: int):
+    tracemalloc.start()
+    sessions = builder(session_count, member_count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del sessions
+    return size / session_count
+
+
+def _legacy_update_session_members(sessions: dict, key, channel):
+    # 以前の update_session_members と同じ処理
+    logger.debug(
+        f"Updating two-or-more-member call session members in channel {channel.id} ({key[0]})."
+    )
+    now = datetime.datetime.now(datetime.timezone.utc)
+    session_data = sessions[key]
+    current_member_ids = {m.id for m in channel.members}
+    previous_member_ids = set(session_data["current_members"].keys())
+    for member_id in current_member_ids - previous_member_ids:
+        session_data["current_members"][member_id] = now
+        session_data["all_participants"].add(member_id)
+        logger.debug(f"Added member {member_id} to active_voice_sessions[{key}].")
+    ended_sessions_data = []
+    for member_id in previous_member_ids - current_member_ids:
+        if member_id in session_data["current_members"]:
+            join_time = session_data["current_members"].pop(member_id)
+            duration = (now - join_time).total_seconds()
+            ended_sessions_data.append((member_id, duration, join_time))
+            logger.debug(
+                f"Individual session end data for member {member_id}: Duration {duration}, Join time {join_time}"
+            )
+    logger.debug(
+        f"Updated active_voice_sessions[{key}]. Current members: {list(session_data['current_members'].keys())}, All participants count: {len(session_data['all_participants'])}"
+    )
+    return ended_sessions_data
+
+
+def main():
+    session_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    member_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    number = 20000
+
+    legacy_bytes = _measure_bytes_per_session(
+        _build_legacy_sessions, session_count, member_count
+    )
+    record_bytes = _measure_bytes_per_session(
+        _build_record_sessions, session_count, member_count
+    )
+
+    # 1人が退出し、別の1人が参加する更新を交互に繰り返す
+    members = [SimpleNamespace(id=m) for m in range(member_count)]
+    channel_a: Any = SimpleNamespace(id=0, members=members)
+    channel_b: Any = SimpleNamespace(
+        id=0, members=members[1:] + [SimpleNamespace(id=member_count)]
+    )
+    key = (1, 0)
+
+    legacy_sessions = _build_legacy_sessions(1, member_count)
+    legacy_channels = itertools.cycle([channel_b, channel_a])
+    legacy_seconds = timeit.timeit(
+        lambda: _legacy_update_session_members(
+            legacy_sessions, key, next(legacy_channels)
+        ),
+        number=number,
+    )
+
+    manager = StatisticalSessionManager(None)
+    manager.active_voice_sessions = _build_record_sessions(1, member_count)
+    record_channels = itertools.cycle([channel_b, channel_a])
+    record_seconds = timeit.timeit(
+        lambda: manager.update_session_members(1, next(record_channels)),
+        number=number,
+    )
+
+    print(f"sessions={session_count}, members per session={member_count}")
+    print(
+        f"memory per session: dict+datetime {legacy_bytes:.0f} B, VoiceSession {record_bytes:.0f} B"
+    )
+    print(
+        f"update_session_members: dict+datetime {legacy_seconds / number * 1e6:.2f} us, VoiceSession {record_seconds / number * 1e6:.2f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import logging
+import os
+
+import discord
+
+import constants
+
+# ロガーを取得
+logger = logging.getLogger(__name__)
+
+
+def build_intents(profile: str) -> discord.Intents:
+    """
+    プロファイルに応じたインテントを返します。
+    "full" は全てのインテント、"standard" と "minimal" はボットが使うイベントのインテントだけを有効にします
+    ("standard" はメンバー一覧のイベントも受け取ります)。
+    """
+    if profile == constants.CLIENT_PROFILE_FULL:
+        return discord.Intents.all()
+    # ギルド・チャンネル、ボイスステート (通話の検知)、リアクション (寝落ち確認) のイベントだけを受け取る
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.voice_states = True
+    intents.guild_reactions = True
+    if profile == constants.CLIENT_PROFILE_STANDARD:
+        intents.members = True
+    return intents
+
+
+def build_client_options(profile: str) -> dict:
+    """
+    プロファイルに応じた Bot のコンストラクタのオプション
+    (intents, member_cache_flags, chunk_guilds_at_startup, max_messages) を返します。
+    不明なプロファイルの場合は ValueError を送出します。
+    """
+    if profile not in constants.CLIENT_PROFILES:
+        raise ValueError(f"Unknown client profile: {profile}")
+    intents = build_intents(profile)
+    if profile == constants.CLIENT_PROFILE_FULL:
+        # 以前と同じ設定 (全メンバーを起動時に取得し、メッセージもキャッシュする)
+        return {
+            "intents": intents,
+            "member_cache_flags": discord.MemberCacheFlags.from_intents(intents),
+            "chunk_guilds_at_startup": True,
+            "max_messages": constants.CLIENT_MAX_MESSAGES_FULL,
+        }
+    if profile == constants.CLIENT_PROFILE_STANDARD:
+        # メンバーはイベントで届いたものだけをキャッシュし、起動時に全メンバーを取得しない
+        member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+    else:
+        # 通話中のメンバーだけをキャッシュする (それ以外のメンバーは必要な時に取得する)
+        member_cache_flags = discord.MemberCacheFlags.none()
+        member_cache_flags.voice = True
+    return {
+        "intents": intents,
+        "member_cache_flags": member_cache_flags,
+        "chunk_guilds_at_startup": False,
+        # メッセージのイベントを使わないため、メッセージはキャッシュしない
+        "max_messages": None,
+    }
+
+
+def get_client_profile() -> str:
+    """環境変数 CLIENT_PROFILE からプロファイル名を取得します。設定されていなければデフォルト値を返します。"""
+    return os.getenv("CLIENT_PROFILE", constants.CLIENT_PROFILE).lower()
@@ -0,0 +1,96 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+import discord
+from discord import app_commands
+
+import constants
+from database import get_command_sync_fingerprints, set_command_sync_fingerprints
+
+# ロガーを取得
+logger = logging.getLogger(__name__)
+
+
+def compute_command_tree_fingerprint(
+    tree: app_commands.CommandTree, guild: discord.abc.Snowflake
+) -> str:
+    """
+    ギルドのスラッシュコマンドのツリーを Discord に送信する形式でシリアライズし、そのハッシュを返します。
+    コマンドの名前・説明・引数・権限などが変わるとフィンガープリントも変わります。
+    """
+    payloads = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+    payloads.sort(key=lambda payload: (payload.get("type", 1), payload["name"]))
+    serialized = json.dumps(
+        payloads, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+async def sync_guild_commands(
+    tree: app_commands.CommandTree,
+    guilds: list[discord.Guild],
+    concurrency: int = constants.COMMAND_SYNC_CONCURRENCY,
+) -> dict:
+    """
+    グローバルコマンドを各ギルドにコピーし、前回の同期からコマンドのツリーが変わったギルドだけを同期します。
+    同期は最大 concurrency ギルドずつ並行して行い、成功したギルドのフィンガープリントを保存します。
+    同期・スキップ・失敗したギルド数と経過時間 (秒) を返します。
+    """
+    started = time.monotonic()
+    stored_fingerprints = await get_command_sync_fingerprints()
+
+    pending: list[tuple[discord.Guild, str]] = []
+    skipped = 0
+    for guild in guilds:
+        if guild is None:
+            continue
+        # グローバルコマンドをこのギルドにコピーして即座に反映させる
+        tree.copy_global_to(guild=guild)
+        fingerprint = compute_command_tree_fingerprint(tree, guild)
+        if stored_fingerprints.get(guild.id) == fingerprint:
+            logger.debug(
+                f"Commands for guild {guild.id} ({guild.name}) are unchanged. Skipping sync."
+            )
+            skipped += 1
+            continue
+        pending.append((guild, fingerprint))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    synced_fingerprints: dict[int, str] = {}
+
+    async def sync_guild(guild: discord.Guild, fingerprint: str) -> bool:
+        async with semaphore:
+            logger.info(f"Syncing commands for guild {guild.id} ({guild.name}).")
+            try:
+                synced_commands = await tree.sync(guild=guild)
+            except Exception as e:
+                logger.exception(
+                    f"Failed to sync commands for guild {guild.id} ({guild.name}): {e}"
+                )
+                return False
+        logger.info(
+            f"Successfully synced commands for guild {guild.id} ({guild.name}). Synced command count: {len(synced_commands)}"
+        )
+        synced_fingerprints[guild.id] = fingerprint
+        return True
+
+    results = await asyncio.gather(
+        *(sync_guild(guild, fingerprint) for guild, fingerprint in pending)
+    )
+    # 失敗したギルドはフィンガープリントを保存しないため、次回の起動時に再度同期される
+    await set_command_sync_fingerprints(synced_fingerprints)
+
+    elapsed = time.monotonic() - started
+    result = {
+        "synced": len(synced_fingerprints),
+        "skipped": skipped,
+        "failed": results.count(False),
+        "elapsed": elapsed,
+    }
+    logger.info(
+        f"Command synchronization completed in {elapsed:.2f}s. Synced: {result['synced']}, skipped (unchanged): {skipped}, failed: {result['failed']}."
+    )
+    return result
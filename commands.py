@@ -9,15 +9,18 @@ from database import (
     get_total_call_time,
     get_guild_settings,
     update_guild_settings,
-    get_monthly_voice_sessions,
-    get_monthly_member_stats,
-    get_annual_voice_sessions,
+    get_monthly_session_summary,
+    get_annual_session_summary,
     get_annual_member_total_stats,
     get_participants_by_session_ids,
-    get_total_call_time_for_guild_members,
     get_mute_count,
-    get_monthly_mute_counts,
-    get_total_mute_counts,
+    get_top_members_by_call_time,
+    get_member_call_time_rank,
+    get_top_members_by_mute_count,
+    set_notification_channel,
+    get_cached_report,
+    get_report_cache_generation,
+    cache_report,
 )
 import config
 import formatters
@@ -39,86 +42,152 @@ class BotCommands(commands.Cog):
     stats = app_commands.Group(name="stats", description="通話統計に関するコマンド")
 
     # --- メンバーIDリストから表示名リストを取得するヘルパー関数 ---
-    def _get_member_display_names(self, guild, member_ids):
+    async def _get_member_display_names(self, guild, member_ids):
         """
         メンバーIDのリストを受け取り、対応するメンバーの表示名のリストを返します。
+        メンバーキャッシュにないメンバー (通話中でないメンバーなど) は、
+        MEMBER_FETCH_CHUNK_SIZE 件ずつゲートウェイに問い合わせて取得します (キャッシュには追加しない)。
         メンバーが見つからない場合はIDを文字列として返します。
         """
-        member_lookup = {member.id: member for member in guild.members}
+        members = {}
+        missing_ids = []
+        for mid in dict.fromkeys(member_ids):
+            m_obj = guild.get_member(mid)
+            if m_obj:
+                members[mid] = m_obj
+            else:
+                missing_ids.append(mid)
+
+        chunk_size = constants.MEMBER_FETCH_CHUNK_SIZE
+        for i in range(0, len(missing_ids), chunk_size):
+            chunk = missing_ids[i : i + chunk_size]
+            try:
+                fetched = await guild.query_members(
+                    user_ids=chunk, limit=len(chunk), cache=False
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Failed to fetch {len(chunk)} members in guild {guild.id}: {e}"
+                )
+                continue
+            for m_obj in fetched:
+                members[m_obj.id] = m_obj
+        if missing_ids:
+            fetched_count = sum(1 for mid in missing_ids if mid in members)
+            logger.debug(
+                f"Fetched {fetched_count}/{len(missing_ids)} uncached members in guild {guild.id}."
+            )
+
         display_names = []
         for mid in member_ids:
-            m_obj = member_lookup.get(mid)
+            m_obj = members.get(mid)
             if m_obj:
                 display_names.append(m_obj.display_name)
             else:
                 display_names.append(str(mid))  # メンバーが見つからない場合はIDを表示
         return display_names
 
-    # --- 月間統計作成用ヘルパー関数 ---
-    # 指定された月の通話統計情報をデータベースから取得し、整形して返します。
-    # データベース操作、データ集計、最長通話やランキングの算出を含みます。
-    async def _get_monthly_statistics(self, guild, month: str):
-        logger.info(f"Fetching monthly statistics for guild {guild.id}, month {month}")
+    # --- 月間統計レポート取得用ヘルパー関数 ---
+    # 指定された月の統計表示に必要なデータをデータベースから取得します。
+    # 取得結果はギルド・月ごとにキャッシュされ、統計の書き込み時に破棄されます。
+    # (表示名はメンバーの変更を反映するため、キャッシュせずに表示のたびに解決します)
+    async def _get_monthly_report(self, guild_id: int, month: str) -> dict:
+        report = get_cached_report(guild_id, month, constants.REPORT_KIND_MONTHLY)
+        if report is not None:
+            return report
+        logger.info(f"Fetching monthly statistics for guild {guild_id}, month {month}")
+        generation = get_report_cache_generation()
+
+        # database.py から指定された月のセッションの集計 (日ごとの集計の合計) を取得
+        # データベースエラーはdatabase.py内で処理され、セッションなしの集計が返されます。
+        session_summary = await get_monthly_session_summary(guild_id, month)
+        logger.debug(
+            f"Found {session_summary['session_count']} sessions for month {month}"
+        )
 
-        # database.py から指定された月の全セッションを取得
+        # database.py から指定された月の通話時間の上位メンバーを取得
+        # (上位 RANKING_LIMIT 名より多いかどうかを判定するため、1人多く取得する)
         # データベースエラーはdatabase.py内で処理され、空のリストが返されます。
-        sessions_data = await get_monthly_voice_sessions(month)
-        logger.debug(f"Found {len(sessions_data)} sessions for month {month}")
+        top_members = await get_top_members_by_call_time(
+            guild_id, constants.RANKING_LIMIT + 1, month
+        )
+        logger.debug(f"Found {len(top_members)} top members for month {month}")
 
-        # database.py から指定された月のメンバー別累計通話時間を取得
-        # データベースエラーはdatabase.py内で処理され、空の辞書が返されます。
-        member_stats = await get_monthly_member_stats(month)
-        logger.debug(f"Found stats for {len(member_stats)} members for month {month}")
+        # 最長セッションの参加者を取得
+        longest_participants = []
+        if session_summary["session_count"]:
+            longest_session_id = session_summary["longest"]["id"]
+            # データベースエラーはdatabase.py内で処理され、空の辞書が返されます。
+            participants_map = await get_participants_by_session_ids(
+                [longest_session_id]
+            )
+            longest_participants = participants_map.get(longest_session_id, [])
+
+        # データベースから指定された月のミュート回数の上位メンバーを取得 (回数の多い順)
+        mute_counts = await get_top_members_by_mute_count(
+            guild_id, constants.RANKING_LIMIT + 1, month
+        )
+
+        report = {
+            "session_summary": session_summary,
+            "top_members": top_members,
+            "longest_participants": longest_participants,
+            "mute_counts": mute_counts,
+        }
+        # データベースエラー時も空の結果が返されるため、空の結果はキャッシュしない
+        if session_summary["session_count"] or top_members or mute_counts:
+            cache_report(
+                guild_id, month, constants.REPORT_KIND_MONTHLY, report, generation
+            )
+        return report
+
+    # --- 月間統計作成用ヘルパー関数 ---
+    # _get_monthly_report から取得した月間統計のデータを整形して返します。
+    # 最長通話やランキングの算出を含みます。
+    async def _get_monthly_statistics(self, guild, report: dict):
+        session_summary = report["session_summary"]
 
         # セッションデータがない場合は平均通話時間などを0に設定
-        if not sessions_data:
+        if not session_summary["session_count"]:
             monthly_avg = 0
             longest_info = "なし"
             logger.debug("No sessions found, monthly average is 0.")
         else:
             # 月間平均通話時間の計算
-            monthly_avg = sum(sess["duration"] for sess in sessions_data) / len(
-                sessions_data
+            monthly_avg = (
+                session_summary["total_duration"] / session_summary["session_count"]
             )
             logger.debug(f"Calculated monthly average: {monthly_avg}")
 
             # 最長通話の情報取得
-            longest_session = max(sessions_data, key=lambda s: s["duration"])
+            longest_session = session_summary["longest"]
             longest_duration = longest_session["duration"]
             # UTCのISO形式からJSTに変換して日付をフォーマット
             longest_date = formatters.convert_utc_to_jst(
                 datetime.datetime.fromisoformat(longest_session["start_time"])
             ).strftime("%Y/%m/%d")
 
-            # 最長セッションの参加者を取得
-            longest_session_id = longest_session["id"]  # セッションIDを取得
-            # データベースエラーはdatabase.py内で処理され、空の辞書が返されます。
-            participants_map = await get_participants_by_session_ids(
-                [longest_session_id]
-            )
-            longest_participants = participants_map.get(
-                longest_session_id, []
-            )  # 参加者リストを取得
-
-            longest_participants_names = self._get_member_display_names(
-                guild, longest_participants
+            longest_participants_names = await self._get_member_display_names(
+                guild, report["longest_participants"]
             )
             longest_info = f"{formatters.format_duration(longest_duration)}（{longest_date}）\n参加: {', '.join(longest_participants_names)}"
             logger.debug(f"Longest session: {longest_info}")
 
-        # メンバー別通話時間ランキングの作成
-        sorted_members = sorted(member_stats.items(), key=lambda x: x[1], reverse=True)
+        # メンバー別通話時間ランキングの作成 (データベースから通話時間の多い順に取得済み)
+        top_members = report["top_members"][: constants.RANKING_LIMIT]
         ranking_lines = []
-        member_ids_in_ranking = [member_id for member_id, duration in sorted_members]
-        ranking_display_names = self._get_member_display_names(
+        member_ids_in_ranking = [member_id for member_id, duration in top_members]
+        ranking_display_names = await self._get_member_display_names(
             guild, member_ids_in_ranking
         )
 
-        for i, (member_id, duration) in enumerate(sorted_members, start=1):
+        for i, (member_id, duration) in enumerate(top_members, start=1):
             name = ranking_display_names[i - 1]  # ヘルパー関数で取得した表示名を使用
             ranking_lines.append(
                 f"{i}.  {formatters.format_duration(duration)}  {name}"
             )
+        if len(report["top_members"]) > constants.RANKING_LIMIT:
+            ranking_lines.append(f"...\n(上位 {constants.RANKING_LIMIT} 名を表示)")
         ranking_text = "\n".join(ranking_lines) if ranking_lines else "なし"
         logger.debug(f"Ranking text generated:\n{ranking_text}")
 
@@ -137,12 +206,13 @@ class BotCommands(commands.Cog):
             logger.warning(f"Invalid month format: {month}")
 
         # 月間統計情報を取得
+        report = await self._get_monthly_report(guild.id, month)
         monthly_avg, longest_info, ranking_text = await self._get_monthly_statistics(
-            guild, month
+            guild, report
         )
 
         # 月間ミュート回数ランキングの取得
-        mute_ranking_text = await self._get_monthly_mute_ranking(guild, month)
+        mute_ranking_text = await self._get_monthly_mute_ranking(guild, report)
 
         # 統計情報が取得できたかチェックし、データがない場合はNoneを返す
         if (
@@ -181,21 +251,14 @@ class BotCommands(commands.Cog):
         return embed, month_display
 
     # --- 月間ミュート回数ランキング作成用ヘルパー関数 ---
-    async def _get_monthly_mute_ranking(self, guild, month: str):
-        logger.info(
-            f"Fetching monthly mute ranking for guild {guild.id}, month {month}"
-        )
-        mute_counts = await get_monthly_mute_counts(
-            month
-        )  # データベースから直接リストを取得
-
-        # get_monthly_mute_countsはリストのタプルを返すため、items()は不要
-        sorted_mutes = sorted(mute_counts, key=lambda x: x[1], reverse=True)
+    async def _get_monthly_mute_ranking(self, guild, report: dict):
+        # データベースから回数の多い順に取得済み (表示する上位のメンバーの名前だけを解決する)
+        sorted_mutes = report["mute_counts"][: constants.RANKING_LIMIT]
 
         mute_ranking_lines = []
         # member_ids_in_ranking はタプルの最初の要素 (user_id) を使用
         mute_member_ids_in_ranking = [user_id for user_id, count in sorted_mutes]
-        mute_ranking_display_names = self._get_member_display_names(
+        mute_ranking_display_names = await self._get_member_display_names(
             guild, mute_member_ids_in_ranking
         )
 
@@ -216,29 +279,31 @@ class BotCommands(commands.Cog):
             f"Fetching and processing annual statistics for guild {guild.id}, year {year}"
         )
 
-        # database.py から指定された年度の全セッションを取得
-        sessions_data = await get_annual_voice_sessions(year)
-        logger.debug(f"Found {len(sessions_data)} sessions for year {year}")
+        # database.py から指定された年度のセッションの集計 (日ごとの集計の合計) を取得
+        session_summary = await get_annual_session_summary(guild.id, year)
+        logger.debug(
+            f"Found {session_summary['session_count']} sessions for year {year}"
+        )
 
         # database.py から指定された年度のメンバー別累計通話時間を取得
-        members_total = await get_annual_member_total_stats(year)
+        members_total = await get_annual_member_total_stats(guild.id, year)
         logger.debug(f"Found stats for {len(members_total)} members for year {year}")
 
         year_display = f"{year}年"
 
-        if not sessions_data:
+        if not session_summary["session_count"]:
             avg_duration = 0
             longest_info = "なし"
             logger.debug("No sessions found for the year, annual average is 0.")
         else:
             # 年間平均通話時間の計算
-            avg_duration = sum(sess["duration"] for sess in sessions_data) / len(
-                sessions_data
+            avg_duration = (
+                session_summary["total_duration"] / session_summary["session_count"]
             )
             logger.debug(f"Calculated annual average: {avg_duration}")
 
             # 最長通話の情報取得
-            longest_session = max(sessions_data, key=lambda s: s["duration"])
+            longest_session = session_summary["longest"]
             longest_duration = longest_session["duration"]
             longest_date = formatters.convert_utc_to_jst(
                 datetime.datetime.fromisoformat(longest_session["start_time"])
@@ -250,7 +315,7 @@ class BotCommands(commands.Cog):
             )
             longest_participants = participants_map.get(longest_session_id, [])
 
-            longest_participants_names = self._get_member_display_names(
+            longest_participants_names = await self._get_member_display_names(
                 guild, longest_participants
             )
             longest_info = f"{formatters.format_duration(longest_duration)}（{longest_date}）\n参加: {', '.join(longest_participants_names)}"
@@ -260,7 +325,7 @@ class BotCommands(commands.Cog):
         sorted_members = sorted(members_total.items(), key=lambda x: x[1], reverse=True)
         ranking_lines = []
         member_ids_in_ranking = [member_id for member_id, duration in sorted_members]
-        ranking_display_names = self._get_member_display_names(
+        ranking_display_names = await self._get_member_display_names(
             guild, member_ids_in_ranking
         )
 
@@ -277,7 +342,7 @@ class BotCommands(commands.Cog):
             avg_duration,
             longest_info,
             ranking_text,
-            sessions_data,
+            session_summary,
             members_total,
         )
 
@@ -385,7 +450,7 @@ class BotCommands(commands.Cog):
         formatted_time = formatters.format_duration(total_seconds)
 
         # 累計ミュート回数の取得と表示 (既存の /get_mute_count ロジックを移植)
-        mute_count = await get_mute_count(member.id)
+        mute_count = await get_mute_count(interaction.guild.id, member.id)
 
         # 最終的なEmbedの送信
         embed = discord.Embed(color=constants.EMBED_COLOR_INFO)
@@ -422,6 +487,46 @@ class BotCommands(commands.Cog):
             f"/stats total command executed successfully for member {member.id}"
         )
 
+    # --- 累計ランキングのレポート取得用ヘルパー関数 ---
+    # ギルドでの累計通話時間と累計ミュート回数の上位メンバーを、多い順に取得して返します。
+    # (上位 RANKING_LIMIT 名より多いかどうかを判定するため、1人多く取得する)
+    # 取得結果はギルドごとにキャッシュされ、統計の書き込み時に破棄されます。
+    async def _get_ranking_report(self, guild) -> dict:
+        report = get_cached_report(
+            guild.id, constants.REPORT_PERIOD_TOTAL, constants.REPORT_KIND_RANKING
+        )
+        if report is not None:
+            return report
+        generation = get_report_cache_generation()
+
+        # 累計通話時間ランキングの取得
+        sorted_call_members = await get_top_members_by_call_time(
+            guild.id, constants.RANKING_LIMIT + 1
+        )
+        logger.debug(
+            f"Fetched {len(sorted_call_members)} top members for call ranking in guild {guild.id}."
+        )
+
+        # 累計ミュート回数ランキングの取得
+        sorted_mute_members = await get_top_members_by_mute_count(
+            guild.id, constants.RANKING_LIMIT + 1
+        )
+
+        report = {
+            "call_times": sorted_call_members,
+            "mute_counts": sorted_mute_members,
+        }
+        # データベースエラー時も空の結果が返されるため、空の結果はキャッシュしない
+        if sorted_call_members or sorted_mute_members:
+            cache_report(
+                guild.id,
+                constants.REPORT_PERIOD_TOTAL,
+                constants.REPORT_KIND_RANKING,
+                report,
+                generation,
+            )
+        return report
+
     # --- /stats ranking サブコマンド ---
     @stats.command(
         name="ranking",
@@ -436,64 +541,49 @@ class BotCommands(commands.Cog):
         )
         await interaction.response.defer(ephemeral=True)
         guild = interaction.guild
-        members = guild.members
-
-        # 総通話時間ランキングの取得と表示 (既存の /call_ranking ロジックを移植)
-        logger.debug(
-            f"Fetching total call times for {len(members)} members in guild {guild.id}"
-        )
-        member_ids = [member.id for member in members]
-        member_call_times = await get_total_call_time_for_guild_members(member_ids)
-        logger.debug(f"Fetched total call times for {len(member_call_times)} members.")
-
-        filtered_member_call_times = {
-            member_id: total_seconds
-            for member_id, total_seconds in member_call_times.items()
-            if total_seconds > 0
-        }
-        logger.debug(
-            f"Found call times for {len(filtered_member_call_times)} members with > 0 call time."
-        )
-
-        sorted_call_members = sorted(
-            filtered_member_call_times.items(), key=lambda x: x[1], reverse=True
-        )
-        logger.debug(f"Sorted {len(sorted_call_members)} members for call ranking.")
+        report = await self._get_ranking_report(guild)
+        sorted_call_members = report["call_times"]
 
         call_ranking_text = ""
         if not sorted_call_members:
             call_ranking_text = constants.MESSAGE_NO_RANKING_DATA
             logger.info("No call ranking data found.")
         else:
-            member_lookup = {member.id: member for member in guild.members}
-            for i, (member_id, total_seconds) in enumerate(
-                sorted_call_members[: constants.RANKING_LIMIT], start=1
-            ):
-                member = member_lookup.get(member_id)
-                if member:
-                    formatted_time = formatters.format_duration(total_seconds)
-                    call_ranking_text += (
-                        f"{i}. {formatted_time} {member.display_name}\n"
-                    )
+            top_call_members = sorted_call_members[: constants.RANKING_LIMIT]
+            call_display_names = await self._get_member_display_names(
+                guild, [member_id for member_id, _ in top_call_members]
+            )
+            for i, (member_id, total_seconds) in enumerate(top_call_members, start=1):
+                formatted_time = formatters.format_duration(total_seconds)
+                call_ranking_text += (
+                    f"{i}. {formatted_time} {call_display_names[i - 1]}\n"
+                )
             if len(sorted_call_members) > constants.RANKING_LIMIT:
                 call_ranking_text += f"...\n(上位 {constants.RANKING_LIMIT} 名を表示)"
             logger.info(
                 f"Call ranking text generated, showing top {min(len(sorted_call_members), constants.RANKING_LIMIT)}."
             )
 
-        # 累計ミュート回数ランキングの取得と表示
-        mute_counts = await get_total_mute_counts()
+        # 実行したメンバー自身の順位 (ランキング全体は取得せず、自分より多いメンバーの数から求める)
+        own_rank, own_total = await get_member_call_time_rank(
+            guild.id, interaction.user.id
+        )
+        if own_rank is None:
+            own_rank_text = constants.MESSAGE_NO_CALL_HISTORY
+        else:
+            own_rank_text = f"{own_rank} 位 {formatters.format_duration(own_total)}"
+
+        # 累計ミュート回数ランキングの表示
+        sorted_mute_members = report["mute_counts"]
         mute_ranking_text = ""
-        if mute_counts:
-            sorted_mute_members = sorted(mute_counts, key=lambda x: x[1], reverse=True)
-            mute_ranking_text = ""
-            member_lookup = {member.id: member for member in guild.members}
-            for i, (user_id, count) in enumerate(
-                sorted_mute_members[: constants.RANKING_LIMIT], start=1
-            ):
-                user = member_lookup.get(user_id) or await self.bot.fetch_user(user_id)
-                if user:
-                    mute_ranking_text += f"{i}. {count} 回 {user.display_name}\n"
+        if sorted_mute_members:
+            top_mute_members = sorted_mute_members[: constants.RANKING_LIMIT]
+            # キャッシュにないメンバーはまとめて問い合わせる (見つからない場合はIDを表示)
+            mute_display_names = await self._get_member_display_names(
+                guild, [user_id for user_id, _ in top_mute_members]
+            )
+            for i, (user_id, count) in enumerate(top_mute_members, start=1):
+                mute_ranking_text += f"{i}. {count} 回 {mute_display_names[i - 1]}\n"
             if len(sorted_mute_members) > constants.RANKING_LIMIT:
                 mute_ranking_text += f"...\n(上位 {constants.RANKING_LIMIT} 名を表示)"
             logger.info(
@@ -511,6 +601,11 @@ class BotCommands(commands.Cog):
         embed.add_field(
             name="総通話時間ランキング", value=call_ranking_text, inline=False
         )
+        embed.add_field(
+            name=constants.EMBED_FIELD_YOUR_CALL_RANK,
+            value=own_rank_text,
+            inline=False,
+        )
         embed.add_field(
             name="寝落ちミュート回数ランキング", value=mute_ranking_text, inline=False
         )
@@ -630,8 +725,12 @@ class BotCommands(commands.Cog):
                 ephemeral=True,
             )
         else:
-            # config を使用して通知チャンネルIDを更新
-            config.set_notification_channel_id(guild_id, channel.id)
+            # データベースに保存し、config の通知チャンネルIDも更新
+            if not await set_notification_channel(guild_id, channel.id):
+                await interaction.response.send_message(
+                    constants.MESSAGE_NOTIFICATION_CHANNEL_SET_FAILED, ephemeral=True
+                )
+                return
             logger.info(
                 f"Notification channel set to {channel.id} for guild {guild_id}"
             )
@@ -676,12 +775,12 @@ class BotCommands(commands.Cog):
             avg_duration,
             longest_info,
             ranking_text,
-            sessions_data,
+            session_summary,
             members_total,
         ) = await self.get_and_process_annual_stats_data(interaction.guild, year)
 
         # データが取得できたか確認し、結果を送信
-        if sessions_data:
+        if session_summary["session_count"]:
             # 年間統計Embedを作成
             embed = await self._create_annual_stats_embed(
                 year_display, avg_duration, longest_info, ranking_text
@@ -21,11 +21,99 @@ COLUMN_SESSION_ID = "session_id"
 COLUMN_MEMBER_ID = "member_id"
 TABLE_MEMBER_MONTHLY_STATS = "member_monthly_stats"
 COLUMN_TOTAL_DURATION = "total_duration"
+TABLE_MEMBER_LIFETIME_STATS = "member_lifetime_stats"
+TABLE_MEMBER_GUILD_LIFETIME_STATS = "member_guild_lifetime_stats"
+TABLE_DAILY_SESSION_ROLLUP = "daily_session_rollup"
+COLUMN_DAY = "day"
+TABLE_ACTIVE_SESSION_SNAPSHOTS = "active_session_snapshots"
+TABLE_ACTIVE_SESSION_SNAPSHOT_MEMBERS = "active_session_snapshot_members"
+TABLE_CALL_SESSION_SNAPSHOTS = "call_session_snapshots"
+COLUMN_CHANNEL_ID = "channel_id"
+COLUMN_SNAPSHOT_AT = "snapshot_at"
+TABLE_NOTIFICATION_CHANNELS = "notification_channels"
+TABLE_COMMAND_SYNC_FINGERPRINTS = "command_sync_fingerprints"
+COLUMN_FINGERPRINT = "fingerprint"
 TABLE_USER_MUTE_STATS = "user_mute_stats"
+TABLE_SCHEMA_MIGRATIONS = "schema_migrations"
+COLUMN_MIGRATION_NAME = "name"
+# 一度だけ実行するデータ移行の名前 (schema_migrations テーブルに実行済みとして記録する)
+MIGRATION_IMPORT_CHANNELS_FILE = "import_channels_file"
+MIGRATION_BACKFILL_DAILY_SESSION_ROLLUP = "backfill_daily_session_rollup"
+MIGRATION_BACKFILL_MEMBER_LIFETIME_STATS = "backfill_member_lifetime_stats"
+MIGRATION_BACKFILL_MEMBER_GUILD_LIFETIME_STATS = "backfill_member_guild_lifetime_stats"
 COLUMN_MUTE_COUNT = "mute_count"
 DEFAULT_TOTAL_DURATION = 0
+# ギルドIDを記録する前の既存データに割り当てるギルドID (どのギルドの統計にも含める)
+UNATTRIBUTED_GUILD_ID = 0
 DEFAULT_LONELY_TIMEOUT_MINUTES = 180  # 3 hours
 DEFAULT_REACTION_WAIT_MINUTES = 5
+DB_READER_POOL_SIZE = 4  # 接続プールの読み取り用接続数
+GUILD_SETTINGS_CACHE_MAX_SIZE = 1024  # ギルド設定キャッシュに保持するギルド数の上限
+GUILD_SETTINGS_CACHE_TTL_SECONDS = 3600  # ギルド設定キャッシュの有効期限
+SESSION_PARTICIPANTS_CHUNK_SIZE = (
+    500  # セッションの参加者を取得する IN 句の変数の数の上限 (この件数ずつ問い合わせる)
+)
+REPORT_CACHE_MAX_SIZE = 512  # /stats の集計結果キャッシュに保持するレポート数の上限
+REPORT_CACHE_TTL_SECONDS = (
+    600  # 今月分と累計の集計結果キャッシュの有効期限 (終わった月は期限なし)
+)
+REPORT_PERIOD_TOTAL = "total"  # 累計のレポートの期間
+REPORT_KIND_MONTHLY = "monthly"
+REPORT_KIND_RANKING = "ranking"
+
+# SQLite の PRAGMA プロファイル (環境変数 DB_PRAGMA_PROFILE で切り替え可能)
+# journal_mode はデータベースファイルに永続化され、それ以外は接続ごとに適用される
+DB_PRAGMA_PROFILE = "balanced"  # デフォルト値
+DB_PRAGMA_PROFILES = {
+    # WAL + synchronous=NORMAL: コミットごとの fsync を省き、読み取りが書き込みをブロックしない
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,  # 負の値は KiB 単位 (約16MB)
+        "mmap_size": 67108864,  # 64MB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,  # ミリ秒
+    },
+    # 電源断でも直前のコミットを失わないことを優先するプロファイル
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    # メモリ使用量を抑えるプロファイル
+    "low_memory": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "FILE",
+        "busy_timeout": 5000,
+    },
+}
+WRITE_BUFFER_MAX_PENDING = 50  # この件数が溜まったら統計書き込みをフラッシュする
+WRITE_BUFFER_FLUSH_INTERVAL_SECONDS = 5  # 統計書き込みをフラッシュする間隔
+WRITE_BUFFER_MAX_RETRIES = (
+    5  # この回数続けてフラッシュに失敗した書き込みは破棄する (ログに残す)
+)
+SESSION_SNAPSHOT_INTERVAL_SECONDS = (
+    60  # 進行中の通話セッションのスナップショットを保存する間隔
+)
+VOICE_EVENT_COALESCE_WINDOW_SECONDS = (
+    1.0  # 同じメンバーのボイスステート更新をまとめる窓の長さ (0 でまとめない)
+)
+VOICE_EVENT_DRAIN_TIMEOUT_SECONDS = (
+    10.0  # 終了時にキューに残ったボイスステート更新の処理を待つ最大秒数
+)
+SESSION_CONSISTENCY_CHECK_INTERVAL_MINUTES = (
+    15  # 通話セッションのメンバーと実際のチャンネルのメンバーを突き合わせる間隔
+)
+WAL_CHECKPOINT_INTERVAL_MINUTES = 30  # PASSIVE チェックポイントの実行間隔
+WAL_TRUNCATE_EVERY_N_CHECKPOINTS = (
+    48  # この回数ごとに TRUNCATE チェックポイントを実行 (約1日)
+)
 
 # Milestone related constants
 MILESTONE_THRESHOLD_SECONDS = 36000  # マイルストーン通知の閾値（秒）
@@ -49,9 +137,40 @@ MONTH_OF_YEAR_LAST = 12
 # Logging related constants
 LOGGING_LEVEL = "WARNING"  # デフォルト値
 LOGGING_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+LOG_BUFFER_MAX_SIZE = 100  # Discord に未送信のログを保持する最大件数
+LOG_DEDUP_CACHE_SIZE = 100  # 重複の除外のために保持する送信済みメッセージの件数
+LOG_WEBHOOK_MAX_EMBEDS = (
+    10  # 1回の Webhook 送信に含められる埋め込みの最大数 (Discord の上限)
+)
+LOG_WEBHOOK_MAX_EMBED_CHARS = (
+    6000  # 1回の送信に含められる埋め込みの合計文字数 (Discord の上限)
+)
+LOG_WEBHOOK_RATE_PER_SECOND = 0.5  # Webhook の送信レート (回/秒)
+LOG_WEBHOOK_BURST = 5  # 連続で送信できる Webhook の回数
+LOG_WEBHOOK_DEFAULT_RETRY_AFTER_SECONDS = 5.0  # Retry-After ヘッダがない 429 の待機秒数
+LOG_WEBHOOK_CLOSE_TIMEOUT_SECONDS = 5.0  # 終了時に残りのログの送信を待つ最大秒数
 
 # Bot related constants
 COMMAND_PREFIX = "!"
+# インテントとキャッシュのプロファイル (環境変数 CLIENT_PROFILE で切り替え可能)
+CLIENT_PROFILE_FULL = "full"  # 全てのインテント、全メンバーとメッセージをキャッシュ
+CLIENT_PROFILE_STANDARD = "standard"  # 必要なインテント + メンバー一覧のイベント
+CLIENT_PROFILE_MINIMAL = (
+    "minimal"  # 必要なインテントのみ、通話中のメンバーだけをキャッシュ
+)
+CLIENT_PROFILES = (CLIENT_PROFILE_FULL, CLIENT_PROFILE_STANDARD, CLIENT_PROFILE_MINIMAL)
+CLIENT_PROFILE = CLIENT_PROFILE_MINIMAL  # デフォルト値
+CLIENT_MAX_MESSAGES_FULL = (
+    1000  # full プロファイルでキャッシュするメッセージ数 (discord.py のデフォルト)
+)
+MEMBER_FETCH_CHUNK_SIZE = (
+    100  # キャッシュにないメンバーを1回に問い合わせる件数 (Discord の上限)
+)
+SHARD_MODE_NONE = "none"  # シャーディングしない (1つのゲートウェイ接続)
+SHARD_MODE_AUTO = (
+    "auto"  # AutoShardedBot で動作する (SHARD_IDS で担当するシャードを指定可能)
+)
+COMMAND_SYNC_CONCURRENCY = 4  # スラッシュコマンドを同時に同期するギルド数の上限
 
 # Embed related constants (Discord.py Follow the color standards of discord.Colour)
 EMBED_COLOR_ERROR = 0xFF0000  # Red(Exceptionally not following the standards)
@@ -82,6 +201,9 @@ MESSAGE_NOTIFICATION_CHANNEL_ALREADY_SET = (
     "通知チャンネルは既に {current_channel} に設定されています"
 )
 MESSAGE_NOTIFICATION_CHANNEL_SET = "通知チャンネルを {channel} に設定しました"
+MESSAGE_NOTIFICATION_CHANNEL_SET_FAILED = (
+    "通知チャンネルの設定に失敗しました。時間をおいて再度お試しください。"
+)
 MESSAGE_CURRENT_SLEEP_CHECK_SETTINGS = "現在の寝落ち確認設定:\n"
 MESSAGE_LONELY_TIMEOUT_MIN_ERROR = (
     "一人以下の状態が続く時間は1分以上の整数で指定してください。"
@@ -99,6 +221,7 @@ EMBED_FIELD_CALL_RANKING = "月間: 通話時間ランキング"
 EMBED_FIELD_MUTE_RANKING = "月間: 自動ミュート回数ランキング"
 EMBED_FIELD_TOTAL_CALL_TIME = "総通話時間"
 EMBED_FIELD_MUTE_COUNT = "寝落ちミュート回数"
+EMBED_FIELD_YOUR_CALL_RANK = "あなたの順位"
 EMBED_FIELD_LONELY_TIMEOUT = "一人以下の状態が続く時間"
 EMBED_FIELD_REACTION_WAIT = "反応を待つ時間"
 EMBED_FIELD_ACHIEVED_TIME = "達成時間"
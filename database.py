@@ -1,48 +1,559 @@
 import aiosqlite
+import asyncio
+import json
 import os
 import logging
+import time
 import constants
+import config
 import datetime
+from collections import OrderedDict
+from typing import Any
 
 # ロガーを取得
 logger = logging.getLogger(__name__)
 
 
+# 長寿命のデータベース接続プール
+# 書き込み用接続1本 (排他ロックで直列化) と読み取り用接続N本 (キューで貸し出し) を保持する
+class DatabasePool:
+    def __init__(self, reader_count: int = constants.DB_READER_POOL_SIZE):
+        self.reader_count = reader_count
+        self.db_file: str | None = None
+        self.pragmas: dict = {}
+        self.is_open = False
+        self._writer: aiosqlite.Connection | None = None
+        self._writer_lock: asyncio.Lock | None = None
+        self._readers: asyncio.Queue | None = None
+        self._all_readers: list[aiosqlite.Connection] = []
+
+        # プールの利用統計
+        # hits: 待ち時間なしで接続を取得できた回数
+        # misses: 他の利用者の解放を待って接続を取得した回数
+        # fallbacks: プールが開いていないため使い捨て接続を作成した回数
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        # コミットのレイテンシ統計 (PRAGMA プロファイルの効果測定用)
+        self.commit_count = 0
+        self.total_commit_seconds = 0.0
+        self.max_commit_seconds = 0.0
+
+    async def _connect(self, db_file: str) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(db_file)
+        conn.row_factory = aiosqlite.Row  # カラム名でアクセスできるようにする
+        await apply_connection_pragmas(conn, self.pragmas)
+        return conn
+
+    async def open(self, db_file: str, pragmas: dict | None = None):
+        """書き込み用接続と読み取り用接続を作成し、プールを開きます。"""
+        if self.is_open:
+            logger.debug("Database pool is already open.")
+            return
+        self.db_file = db_file
+        self.pragmas = pragmas or {}
+        self._writer_lock = asyncio.Lock()
+        self._readers = asyncio.Queue()
+        self._writer = await self._connect(db_file)
+        for _ in range(self.reader_count):
+            conn = await self._connect(db_file)
+            self._all_readers.append(conn)
+            self._readers.put_nowait(conn)
+        self.is_open = True
+        logger.info(
+            f"Database pool opened for '{db_file}' (1 writer, {self.reader_count} readers)."
+        )
+
+    async def close(self):
+        """
+        プールが保持する全ての接続を閉じます。
+        書き込み中の処理があれば完了を待ち、貸し出し中の読み取り用接続は返却されるまで待ちます。
+        """
+        if not self.is_open:
+            return
+        self.is_open = False
+        if self._writer_lock is not None:
+            async with self._writer_lock:
+                if self._writer is not None:
+                    await self._writer.close()
+                    self._writer = None
+        if self._readers is not None:
+            # 全ての読み取り用接続がキューに戻るまで待つ (貸し出し中の接続を閉じない)
+            for _ in self._all_readers:
+                await self._readers.get()
+        for conn in self._all_readers:
+            await conn.close()
+        self._all_readers = []
+        self._readers = None
+        logger.info(f"Database pool closed. Stats: {self.get_stats()}")
+
+    def _record_wait(self, waited: bool, wait_seconds: float):
+        if waited:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.total_wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    async def acquire_writer(self) -> aiosqlite.Connection:
+        if self._writer_lock is None:
+            raise RuntimeError("Database pool is not open.")
+        waited = self._writer_lock.locked()
+        started = time.perf_counter()
+        await self._writer_lock.acquire()
+        self._record_wait(waited, time.perf_counter() - started)
+        # ロックを待っている間にプールが閉じられた場合は、閉じた接続を渡さない
+        if not self.is_open or self._writer is None:
+            self._writer_lock.release()
+            raise RuntimeError("Database pool was closed while waiting for the writer.")
+        return self._writer
+
+    def release_writer(self):
+        if self._writer_lock is not None and self._writer_lock.locked():
+            self._writer_lock.release()
+
+    async def acquire_reader(self) -> aiosqlite.Connection:
+        assert self._readers is not None
+        waited = self._readers.empty()
+        started = time.perf_counter()
+        conn = await self._readers.get()
+        self._record_wait(waited, time.perf_counter() - started)
+        return conn
+
+    def release_reader(self, conn: aiosqlite.Connection):
+        # 閉じている途中のプールにも返却する (close が返却を待っている)
+        if self._readers is not None:
+            self._readers.put_nowait(conn)
+
+    async def connect_unpooled(self) -> aiosqlite.Connection:
+        self.fallbacks += 1
+        return await self._connect(DB_FILE)
+
+    def record_commit(self, seconds: float):
+        self.commit_count += 1
+        self.total_commit_seconds += seconds
+        self.max_commit_seconds = max(self.max_commit_seconds, seconds)
+
+    def get_stats(self) -> dict:
+        """プールの待ち時間、ヒット/ミス回数、コミットのレイテンシを返します。"""
+        acquired = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+            "total_wait_seconds": self.total_wait_seconds,
+            "avg_wait_seconds": self.total_wait_seconds / acquired if acquired else 0.0,
+            "max_wait_seconds": self.max_wait_seconds,
+            "commit_count": self.commit_count,
+            "avg_commit_seconds": (
+                self.total_commit_seconds / self.commit_count
+                if self.commit_count
+                else 0.0
+            ),
+            "max_commit_seconds": self.max_commit_seconds,
+        }
+
+
+def get_pragma_profile() -> dict:
+    """
+    環境変数 DB_PRAGMA_PROFILE (未設定時は constants.DB_PRAGMA_PROFILE) に対応する PRAGMA 設定を返します。
+    不明なプロファイル名の場合はデフォルトのプロファイルを使用します。
+    """
+    name = os.getenv("DB_PRAGMA_PROFILE", constants.DB_PRAGMA_PROFILE)
+    if name not in constants.DB_PRAGMA_PROFILES:
+        logger.warning(
+            f"Unknown database pragma profile '{name}'. Falling back to '{constants.DB_PRAGMA_PROFILE}'."
+        )
+        name = constants.DB_PRAGMA_PROFILE
+    return constants.DB_PRAGMA_PROFILES[name]
+
+
+async def apply_connection_pragmas(conn: aiosqlite.Connection, pragmas: dict):
+    """
+    接続ごとに有効な PRAGMA を適用します。
+    journal_mode はデータベースファイルに永続化されるため、init_db で一度だけ設定します。
+    """
+    for name, value in pragmas.items():
+        if name == "journal_mode":
+            continue
+        await conn.execute(f"PRAGMA {name} = {value}")
+
+
+async def _commit(conn: aiosqlite.Connection):
+    """コミットを実行し、そのレイテンシをプールの統計に記録します。"""
+    started = time.perf_counter()
+    await conn.commit()
+    _pool.record_commit(time.perf_counter() - started)
+
+
+# プロセス全体で共有する接続プール (init_db で開き、close_db で閉じる)
+_pool = DatabasePool()
+
+
 # データベース接続を管理する非同期コンテキストマネージャー
+# プールが開いている場合はプールから接続を借り、開いていない場合は使い捨ての接続を作成する
+# readonly=True の場合は読み取り用接続、それ以外は書き込み用接続を使用する
 class DatabaseConnection:
-    def __init__(self):
-        self.conn = None
+    def __init__(self, readonly: bool = False):
+        self.readonly = readonly
+        self.conn: aiosqlite.Connection | None = None
+        self._pooled = False
 
     async def __aenter__(self):
-        self.conn = await aiosqlite.connect(DB_FILE)
-        self.conn.row_factory = aiosqlite.Row  # カラム名でアクセスできるようにする
-        logger.debug("Database connection obtained.")
+        if _pool.is_open:
+            if self.readonly:
+                self.conn = await _pool.acquire_reader()
+            else:
+                self.conn = await _pool.acquire_writer()
+            self._pooled = True
+            logger.debug("Database connection acquired from pool.")
+        else:
+            self.conn = await _pool.connect_unpooled()
+            logger.debug("Database connection obtained.")
         return self.conn
 
     async def __aexit__(self, exc_type, exc, tb):
-        if self.conn:
+        if self.conn is None:
+            return False
+        if not self._pooled:
             await self.conn.close()
             logger.debug("Database connection closed.")
+            return False
+        try:
+            # 書き込み用接続は共有されるため、例外発生時は未コミットの変更を必ずロールバックする
+            if not self.readonly and exc_type is not None and self.conn.in_transaction:
+                await self.conn.rollback()
+                logger.warning("Rolled back database changes.")
+        finally:
+            if self.readonly:
+                _pool.release_reader(self.conn)
+            else:
+                _pool.release_writer()
+            logger.debug("Database connection returned to pool.")
         # 例外が発生した場合は、そのまま伝播させる (Noneを返さない)
         return False
 
 
+def get_pool_stats() -> dict:
+    """共有接続プールの待ち時間とヒット/ミス回数を返します。"""
+    return _pool.get_stats()
+
+
 # データベースファイル名
 DB_FILE = constants.DB_FILE_NAME
 
 
+# member_monthly_stats テーブルの作成クエリ (移行時のテーブル再作成でも使用する)
+# TODO: SQLクエリ構築の代替手段を検討 - f-stringを使用しているが、テーブル名/カラム名は定数由来のため直接的なSQLインジェクションリスクは低い。
+# より構造的なクエリビルダやライブラリの利用も検討可能。
+_SQL_CREATE_MEMBER_MONTHLY_STATS = f"""
+    CREATE TABLE IF NOT EXISTS {{table}} (
+        {constants.COLUMN_GUILD_ID} INTEGER NOT NULL DEFAULT {constants.UNATTRIBUTED_GUILD_ID},
+        {constants.COLUMN_MONTH_KEY} TEXT NOT NULL,
+        {constants.COLUMN_MEMBER_ID} INTEGER NOT NULL,
+        {constants.COLUMN_TOTAL_DURATION} INTEGER NOT NULL DEFAULT {constants.DEFAULT_TOTAL_DURATION},
+        PRIMARY KEY ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MONTH_KEY}, {constants.COLUMN_MEMBER_ID})
+    )
+"""
+
+
+# user_mute_stats テーブルの作成クエリ (移行時のテーブル再作成でも使用する)
+_SQL_CREATE_USER_MUTE_STATS = f"""
+    CREATE TABLE IF NOT EXISTS {{table}} (
+        {constants.COLUMN_GUILD_ID} INTEGER NOT NULL DEFAULT {constants.UNATTRIBUTED_GUILD_ID},
+        {constants.COLUMN_MEMBER_ID} INTEGER NOT NULL,
+        {constants.COLUMN_MUTE_COUNT} INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MEMBER_ID})
+    )
+"""
+
+
+async def _table_has_column(cursor, table: str, column: str) -> bool:
+    await cursor.execute(f"PRAGMA table_info({table})")
+    # PRAGMA table_info の2列目がカラム名
+    return any(row[1] == column for row in await cursor.fetchall())
+
+
+def _get_backfill_guild_id() -> int:
+    """
+    ギルドIDを持たない既存データに割り当てるギルドIDを返します。
+    通知チャンネルが設定されているギルドが1つだけの場合はそのギルドとみなし、
+    それ以外の場合は特定できないため UNATTRIBUTED_GUILD_ID を返します。
+    """
+    guild_ids = config.get_notification_guild_ids()
+    if len(guild_ids) == 1:
+        return guild_ids[0]
+    return constants.UNATTRIBUTED_GUILD_ID
+
+
+def _read_channels_file(path: str) -> dict[int, int]:
+    with open(path, "r") as f:
+        content = f.read().strip()
+    if not content:
+        return {}
+    return {
+        int(guild_id): int(channel_id)
+        for guild_id, channel_id in json.loads(content).items()
+    }
+
+
+async def _import_channels_file(cursor) -> bool:
+    """
+    以前の設定ファイル (config.CHANNELS_FILE) の通知チャンネル設定を notification_channels テーブルに取り込みます。
+    _run_migration_once から一度だけ呼び出されます。ファイルは変更しません。
+    コマンドで設定された値を上書きしないよう、設定済みのギルドは取り込みません。
+    ファイルを読み込めなかった場合は False を返し、次回の起動で再度取り込みます。
+    """
+    path = config.CHANNELS_FILE
+    if not os.path.exists(path):
+        logger.debug(f"Notification channel settings file '{path}' not found.")
+        return True
+    try:
+        # イベントループを止めないよう、ファイルの読み込みは別スレッドで行う
+        channels = await asyncio.to_thread(_read_channels_file, path)
+    except Exception as e:
+        logger.error(
+            f"An error occurred while importing notification channel settings from file '{path}': {e}"
+        )
+        return False
+    await cursor.executemany(
+        SQL_INSERT_NOTIFICATION_CHANNEL_IF_ABSENT, list(channels.items())
+    )
+    logger.info(
+        f"Imported {len(channels)} notification channel settings from file '{path}'. The file is no longer used."
+    )
+    return True
+
+
+async def _run_migration_once(cursor, name: str, migrate) -> bool:
+    """
+    name のデータ移行が schema_migrations テーブルに記録されていなければ migrate(cursor) を実行し、
+    実行済みとして記録します。記録は移行と同じトランザクションで書き込むため、
+    コミット前に起動が失敗した場合は次回の起動で再度実行されます。
+    migrate が False を返した場合は記録せず、次回の起動で再度実行します。
+    移行を実行して記録した場合は True を返します。
+    """
+    await cursor.execute(
+        f"SELECT 1 FROM {constants.TABLE_SCHEMA_MIGRATIONS} WHERE {constants.COLUMN_MIGRATION_NAME} = ?",
+        (name,),
+    )
+    if await cursor.fetchone() is not None:
+        return False
+    if await migrate(cursor) is False:
+        logger.warning(f"Migration '{name}' did not complete. It will be retried.")
+        return False
+    await cursor.execute(
+        f"INSERT INTO {constants.TABLE_SCHEMA_MIGRATIONS} ({constants.COLUMN_MIGRATION_NAME}, applied_at) VALUES (?, ?)",
+        (name, datetime.datetime.now(datetime.timezone.utc).isoformat()),
+    )
+    logger.info(f"Applied migration '{name}'.")
+    return True
+
+
+async def _backfill_daily_session_rollup(cursor):
+    """
+    daily_session_rollup テーブルを既存のセッションから集計し直します。
+    集計は sessions テーブルだけから求まるため、途中まで書き込まれていても作り直せば正しい値になります。
+    """
+    await cursor.execute(f"DELETE FROM {constants.TABLE_DAILY_SESSION_ROLLUP}")
+    await cursor.execute(f"""
+        INSERT INTO {constants.TABLE_DAILY_SESSION_ROLLUP}
+        SELECT
+            s.{constants.COLUMN_GUILD_ID},
+            substr(s.{constants.COLUMN_START_TIME}, 1, 10) AS day,
+            COUNT(*),
+            SUM(s.duration),
+            MAX(s.duration),
+            (
+                SELECT l.id FROM {constants.TABLE_SESSIONS} l
+                WHERE l.{constants.COLUMN_GUILD_ID} = s.{constants.COLUMN_GUILD_ID}
+                AND substr(l.{constants.COLUMN_START_TIME}, 1, 10) = substr(s.{constants.COLUMN_START_TIME}, 1, 10)
+                ORDER BY l.duration DESC, l.id
+                LIMIT 1
+            )
+        FROM {constants.TABLE_SESSIONS} s
+        GROUP BY s.{constants.COLUMN_GUILD_ID}, day
+    """)
+    logger.info(
+        f"Backfilled {cursor.rowcount} days into table '{constants.TABLE_DAILY_SESSION_ROLLUP}' from '{constants.TABLE_SESSIONS}'."
+    )
+
+
+async def _backfill_member_lifetime_stats(cursor):
+    """
+    member_lifetime_stats テーブルを既存の月間統計から集計し直します。
+    総通話時間は member_monthly_stats の合計と常に一致するため、作り直せば正しい値になります。
+    """
+    await cursor.execute(f"DELETE FROM {constants.TABLE_MEMBER_LIFETIME_STATS}")
+    await cursor.execute(f"""
+        INSERT INTO {constants.TABLE_MEMBER_LIFETIME_STATS} ({constants.COLUMN_MEMBER_ID}, {constants.COLUMN_TOTAL_DURATION})
+        SELECT {constants.COLUMN_MEMBER_ID}, SUM({constants.COLUMN_TOTAL_DURATION})
+        FROM {constants.TABLE_MEMBER_MONTHLY_STATS}
+        GROUP BY {constants.COLUMN_MEMBER_ID}
+    """)
+    logger.info(
+        f"Backfilled {cursor.rowcount} members into table '{constants.TABLE_MEMBER_LIFETIME_STATS}' from '{constants.TABLE_MEMBER_MONTHLY_STATS}'."
+    )
+
+
+async def _backfill_member_guild_lifetime_stats(cursor):
+    """
+    member_guild_lifetime_stats テーブルを既存の月間統計から集計し直します。
+    累計通話時間はギルドごとの member_monthly_stats の合計と常に一致するため、作り直せば正しい値になります。
+    """
+    await cursor.execute(f"DELETE FROM {constants.TABLE_MEMBER_GUILD_LIFETIME_STATS}")
+    await cursor.execute(f"""
+        INSERT INTO {constants.TABLE_MEMBER_GUILD_LIFETIME_STATS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_TOTAL_DURATION})
+        SELECT {constants.COLUMN_GUILD_ID}, {constants.COLUMN_MEMBER_ID}, SUM({constants.COLUMN_TOTAL_DURATION})
+        FROM {constants.TABLE_MEMBER_MONTHLY_STATS}
+        GROUP BY {constants.COLUMN_GUILD_ID}, {constants.COLUMN_MEMBER_ID}
+    """)
+    logger.info(
+        f"Backfilled {cursor.rowcount} rows into table '{constants.TABLE_MEMBER_GUILD_LIFETIME_STATS}' from '{constants.TABLE_MEMBER_MONTHLY_STATS}'."
+    )
+
+
+async def _migrate_guild_partitioning(cursor):
+    """
+    sessions / session_participants / member_monthly_stats テーブルに guild_id がない場合に追加します。
+    既存の行は _get_backfill_guild_id() のギルドに割り当てます。
+    member_monthly_stats は主キーに guild_id を含めるため、テーブルを再作成して移行します。
+    """
+    backfill_guild_id = None
+    for table in (constants.TABLE_SESSIONS, constants.TABLE_SESSION_PARTICIPANTS):
+        if await _table_has_column(cursor, table, constants.COLUMN_GUILD_ID):
+            continue
+        if backfill_guild_id is None:
+            backfill_guild_id = _get_backfill_guild_id()
+        await cursor.execute(
+            f"ALTER TABLE {table} ADD COLUMN {constants.COLUMN_GUILD_ID} INTEGER NOT NULL DEFAULT {constants.UNATTRIBUTED_GUILD_ID}"
+        )
+        await cursor.execute(
+            f"UPDATE {table} SET {constants.COLUMN_GUILD_ID} = ?", (backfill_guild_id,)
+        )
+        logger.info(
+            f"Added column '{constants.COLUMN_GUILD_ID}' to table '{table}' and assigned {cursor.rowcount} rows to guild {backfill_guild_id}."
+        )
+
+    if not await _table_has_column(
+        cursor, constants.TABLE_MEMBER_MONTHLY_STATS, constants.COLUMN_GUILD_ID
+    ):
+        if backfill_guild_id is None:
+            backfill_guild_id = _get_backfill_guild_id()
+        new_table = f"{constants.TABLE_MEMBER_MONTHLY_STATS}_new"
+        await cursor.execute(f"DROP TABLE IF EXISTS {new_table}")
+        await cursor.execute(_SQL_CREATE_MEMBER_MONTHLY_STATS.format(table=new_table))
+        await cursor.execute(
+            f"""
+            INSERT INTO {new_table} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MONTH_KEY}, {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_TOTAL_DURATION})
+            SELECT ?, {constants.COLUMN_MONTH_KEY}, {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_TOTAL_DURATION}
+            FROM {constants.TABLE_MEMBER_MONTHLY_STATS}
+        """,
+            (backfill_guild_id,),
+        )
+        migrated_rows = cursor.rowcount
+        await cursor.execute(f"DROP TABLE {constants.TABLE_MEMBER_MONTHLY_STATS}")
+        await cursor.execute(
+            f"ALTER TABLE {new_table} RENAME TO {constants.TABLE_MEMBER_MONTHLY_STATS}"
+        )
+        logger.info(
+            f"Rebuilt table '{constants.TABLE_MEMBER_MONTHLY_STATS}' with '{constants.COLUMN_GUILD_ID}' and assigned {migrated_rows} rows to guild {backfill_guild_id}."
+        )
+
+
+async def _migrate_mute_guild_partitioning(cursor):
+    """
+    mute_events / user_mute_stats テーブルに guild_id がない場合に追加します。
+    既存の行は _get_backfill_guild_id() のギルドに割り当てます。
+    user_mute_stats は主キーに guild_id を含めるため、テーブルを再作成して移行します。
+    """
+    backfill_guild_id = None
+    if not await _table_has_column(cursor, "mute_events", constants.COLUMN_GUILD_ID):
+        backfill_guild_id = _get_backfill_guild_id()
+        await cursor.execute(
+            f"ALTER TABLE mute_events ADD COLUMN {constants.COLUMN_GUILD_ID} INTEGER NOT NULL DEFAULT {constants.UNATTRIBUTED_GUILD_ID}"
+        )
+        await cursor.execute(
+            f"UPDATE mute_events SET {constants.COLUMN_GUILD_ID} = ?",
+            (backfill_guild_id,),
+        )
+        logger.info(
+            f"Added column '{constants.COLUMN_GUILD_ID}' to table 'mute_events' and assigned {cursor.rowcount} rows to guild {backfill_guild_id}."
+        )
+
+    if not await _table_has_column(
+        cursor, constants.TABLE_USER_MUTE_STATS, constants.COLUMN_GUILD_ID
+    ):
+        if backfill_guild_id is None:
+            backfill_guild_id = _get_backfill_guild_id()
+        new_table = f"{constants.TABLE_USER_MUTE_STATS}_new"
+        await cursor.execute(f"DROP TABLE IF EXISTS {new_table}")
+        await cursor.execute(_SQL_CREATE_USER_MUTE_STATS.format(table=new_table))
+        await cursor.execute(
+            f"""
+            INSERT INTO {new_table} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_MUTE_COUNT})
+            SELECT ?, {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_MUTE_COUNT}
+            FROM {constants.TABLE_USER_MUTE_STATS}
+        """,
+            (backfill_guild_id,),
+        )
+        migrated_rows = cursor.rowcount
+        # 旧スキーマのランキング用インデックスはテーブルと一緒に削除される
+        await cursor.execute(f"DROP TABLE {constants.TABLE_USER_MUTE_STATS}")
+        await cursor.execute(
+            f"ALTER TABLE {new_table} RENAME TO {constants.TABLE_USER_MUTE_STATS}"
+        )
+        logger.info(
+            f"Rebuilt table '{constants.TABLE_USER_MUTE_STATS}' with '{constants.COLUMN_GUILD_ID}' and assigned {migrated_rows} rows to guild {backfill_guild_id}."
+        )
+
+
+# member_monthly_stats にギルドIDを持たない既存データがあるかどうか (init_db で設定する)
+_has_unattributed_stats = False
+# user_mute_stats にギルドIDを持たない既存データがあるかどうか (init_db で設定する)
+_has_unattributed_mute_stats = False
+
+
 async def init_db():
     logger.info(f"Starting database '{DB_FILE}' initialization.")
     # データベースファイルが存在しない場合にメッセージを出力
     if not os.path.exists(DB_FILE):
         logger.info(f"Database file '{DB_FILE}' not found. Creating a new one.")
 
+    pragmas = get_pragma_profile()
+    conn = None
     try:
         conn = await aiosqlite.connect(DB_FILE)
         cursor = await conn.cursor()
 
-        # sessions テーブル: 通話セッションの基本情報を記録 (月キー、開始時刻、期間)
+        # ジャーナルモードの設定 (データベースファイルに永続化される)
+        # WAL モードでは読み取りが書き込みをブロックせず、コミットごとの fsync も減る
+        journal_mode = pragmas.get("journal_mode")
+        if journal_mode:
+            await cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+            row = await cursor.fetchone()
+            logger.info(f"Database journal mode set to '{row[0] if row else None}'.")
+
+        # テーブルの作成とデータ移行を1つのトランザクションで行う
+        # (途中で失敗した場合は何も反映されず、次回の起動で最初からやり直す)
+        await cursor.execute("BEGIN")
+
+        # schema_migrations テーブル: 一度だけ実行するデータ移行の実行済みの記録
+        # name: 移行の名前 (主キー)
+        # applied_at: 実行した日時 (ISO 8601 形式、UTC)
+        await cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {constants.TABLE_SCHEMA_MIGRATIONS} (
+                {constants.COLUMN_MIGRATION_NAME} TEXT PRIMARY KEY,
+                applied_at TEXT NOT NULL
+            )
+        """)
+        logger.debug(f"Checked or created table '{constants.TABLE_SCHEMA_MIGRATIONS}'.")
+
+        # sessions テーブル: 通話セッションの基本情報を記録 (ギルド、月キー、開始時刻、期間)
         # id: セッションID (主キー、自動採番)
+        # guild_id: セッションが行われたギルドのID
         # month_key: 年月 (YYYY-MM 形式)
         # start_time: セッション開始時刻 (ISO 8601 形式)
         # duration: セッション期間 (秒単位)
@@ -51,6 +562,7 @@ async def init_db():
         await cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS {constants.TABLE_SESSIONS} (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                {constants.COLUMN_GUILD_ID} INTEGER NOT NULL DEFAULT {constants.UNATTRIBUTED_GUILD_ID},
                 {constants.COLUMN_MONTH_KEY} TEXT NOT NULL,
                 {constants.COLUMN_START_TIME} TEXT NOT NULL,
                 duration INTEGER NOT NULL
@@ -61,6 +573,7 @@ async def init_db():
         # session_participants テーブル: 各セッションの参加メンバーを記録 (sessions テーブルへの外部キーあり)
         # session_id: セッションID (sessions テーブルの id を参照)
         # member_id: メンバーID
+        # guild_id: セッションが行われたギルドのID (sessions テーブルと同じ値)
         # PRIMARY KEY (session_id, member_id): セッションとメンバーの組み合わせで一意
         # FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE: sessions のレコード削除時に連動して削除
         # TODO: SQLクエリ構築の代替手段を検討 - f-stringを使用しているが、テーブル名/カラム名は定数由来のため直接的なSQLインジェクションリスクは低い。
@@ -69,6 +582,7 @@ async def init_db():
             CREATE TABLE IF NOT EXISTS {constants.TABLE_SESSION_PARTICIPANTS} (
                 {constants.COLUMN_SESSION_ID} INTEGER,
                 {constants.COLUMN_MEMBER_ID} INTEGER NOT NULL,
+                {constants.COLUMN_GUILD_ID} INTEGER NOT NULL DEFAULT {constants.UNATTRIBUTED_GUILD_ID},
                 PRIMARY KEY ({constants.COLUMN_SESSION_ID}, {constants.COLUMN_MEMBER_ID}),
                 FOREIGN KEY ({constants.COLUMN_SESSION_ID}) REFERENCES {constants.TABLE_SESSIONS}(id) ON DELETE CASCADE
             )
@@ -77,23 +591,132 @@ async def init_db():
             f"Checked or created table '{constants.TABLE_SESSION_PARTICIPANTS}'."
         )
 
-        # member_monthly_stats テーブル: メンバーごとの月間累計通話時間を記録
+        # member_monthly_stats テーブル: ギルド・メンバーごとの月間累計通話時間を記録
+        # guild_id: ギルドID
         # month_key: 年月 (YYYY-MM 形式)
         # member_id: メンバーID
         # total_duration: 月間累計通話時間 (秒単位)
-        # PRIMARY KEY (month_key, member_id): 年月とメンバーの組み合わせで一意
-        # TODO: SQLクエリ構築の代替手段を検討 - f-stringを使用しているが、テーブル名/カラム名は定数由来のため直接的なSQLインジェクションリスクは低い。
-        # より構造的なクエリビルダやライブラリの利用も検討可能。
+        # PRIMARY KEY (guild_id, month_key, member_id): ギルド・年月・メンバーの組み合わせで一意
+        # (主キーのインデックスが (guild_id, month_key) の複合インデックスを兼ねる)
+        await cursor.execute(
+            _SQL_CREATE_MEMBER_MONTHLY_STATS.format(
+                table=constants.TABLE_MEMBER_MONTHLY_STATS
+            )
+        )
+        logger.debug(
+            f"Checked or created table '{constants.TABLE_MEMBER_MONTHLY_STATS}'."
+        )
+
+        # notification_channels テーブル: ギルドごとの通知チャンネルを記録
+        # guild_id: ギルドID (主キー)
+        # channel_id: 通知チャンネルのID
         await cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {constants.TABLE_MEMBER_MONTHLY_STATS} (
-                {constants.COLUMN_MONTH_KEY} TEXT NOT NULL,
+            CREATE TABLE IF NOT EXISTS {constants.TABLE_NOTIFICATION_CHANNELS} (
+                {constants.COLUMN_GUILD_ID} INTEGER PRIMARY KEY,
+                {constants.COLUMN_CHANNEL_ID} INTEGER NOT NULL
+            )
+        """)
+        logger.debug(
+            f"Checked or created table '{constants.TABLE_NOTIFICATION_CHANNELS}'."
+        )
+        # 以前の設定ファイル (channels.json) の内容を一度だけ取り込む
+        await _run_migration_once(
+            cursor, constants.MIGRATION_IMPORT_CHANNELS_FILE, _import_channels_file
+        )
+        # 通知チャンネルを config のメモリ上の辞書に読み込む (旧スキーマの移行でも参照する)
+        await cursor.execute(SQL_GET_NOTIFICATION_CHANNELS)
+        config.load_notification_channels(
+            {row[0]: row[1] for row in await cursor.fetchall()}
+        )
+
+        # command_sync_fingerprints テーブル: ギルドごとに最後に同期したスラッシュコマンドのツリーのフィンガープリントを記録
+        # guild_id: ギルドID (主キー)
+        # fingerprint: コマンドツリーをシリアライズした内容のハッシュ
+        # synced_at: 同期した日時 (ISO 8601 形式、UTC)
+        await cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {constants.TABLE_COMMAND_SYNC_FINGERPRINTS} (
+                {constants.COLUMN_GUILD_ID} INTEGER PRIMARY KEY,
+                {constants.COLUMN_FINGERPRINT} TEXT NOT NULL,
+                synced_at TEXT NOT NULL
+            )
+        """)
+        logger.debug(
+            f"Checked or created table '{constants.TABLE_COMMAND_SYNC_FINGERPRINTS}'."
+        )
+
+        # ギルドIDを持たない旧スキーマのテーブルを移行する
+        await _migrate_guild_partitioning(cursor)
+
+        # daily_session_rollup テーブル: ギルド・日 (UTC) ごとの通話セッションの集計を記録
+        # guild_id: ギルドID
+        # day: 日付 (YYYY-MM-DD 形式、UTC)
+        # session_count: セッション数
+        # total_duration: セッション期間の合計 (秒単位)
+        # max_duration: 最長セッションの期間 (秒単位)
+        # longest_session_id: 最長セッションのID (sessions テーブルの id)
+        # sessions テーブルへの INSERT と同じトランザクションで更新される
+        await cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {constants.TABLE_DAILY_SESSION_ROLLUP} (
+                {constants.COLUMN_GUILD_ID} INTEGER NOT NULL,
+                {constants.COLUMN_DAY} TEXT NOT NULL,
+                session_count INTEGER NOT NULL DEFAULT 0,
+                {constants.COLUMN_TOTAL_DURATION} INTEGER NOT NULL DEFAULT {constants.DEFAULT_TOTAL_DURATION},
+                max_duration INTEGER NOT NULL DEFAULT 0,
+                longest_session_id INTEGER,
+                PRIMARY KEY ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_DAY})
+            )
+        """)
+        # 既存のセッションから一度だけ集計を埋める
+        await _run_migration_once(
+            cursor,
+            constants.MIGRATION_BACKFILL_DAILY_SESSION_ROLLUP,
+            _backfill_daily_session_rollup,
+        )
+        logger.debug(
+            f"Checked or created table '{constants.TABLE_DAILY_SESSION_ROLLUP}'."
+        )
+
+        # member_lifetime_stats テーブル: メンバーごとの総通話時間を記録 (member_monthly_stats の合計を実体化したもの)
+        # member_id: メンバーID (主キー)
+        # total_duration: 総通話時間 (秒単位)
+        # member_monthly_stats の UPSERT と同じトランザクションで加算される
+        await cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {constants.TABLE_MEMBER_LIFETIME_STATS} (
+                {constants.COLUMN_MEMBER_ID} INTEGER PRIMARY KEY,
+                {constants.COLUMN_TOTAL_DURATION} INTEGER NOT NULL DEFAULT {constants.DEFAULT_TOTAL_DURATION}
+            )
+        """)
+        # 既存の月間統計から一度だけ総通話時間を埋める
+        await _run_migration_once(
+            cursor,
+            constants.MIGRATION_BACKFILL_MEMBER_LIFETIME_STATS,
+            _backfill_member_lifetime_stats,
+        )
+        logger.debug(
+            f"Checked or created table '{constants.TABLE_MEMBER_LIFETIME_STATS}'."
+        )
+
+        # member_guild_lifetime_stats テーブル: ギルド・メンバーごとの累計通話時間を記録 (ギルドごとの member_monthly_stats の合計を実体化したもの)
+        # guild_id: ギルドID
+        # member_id: メンバーID
+        # total_duration: ギルドでの累計通話時間 (秒単位)
+        # member_monthly_stats の UPSERT と同じトランザクションで加算される (累計ランキングの上位K件の取得用)
+        await cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {constants.TABLE_MEMBER_GUILD_LIFETIME_STATS} (
+                {constants.COLUMN_GUILD_ID} INTEGER NOT NULL,
                 {constants.COLUMN_MEMBER_ID} INTEGER NOT NULL,
                 {constants.COLUMN_TOTAL_DURATION} INTEGER NOT NULL DEFAULT {constants.DEFAULT_TOTAL_DURATION},
-                PRIMARY KEY ({constants.COLUMN_MONTH_KEY}, {constants.COLUMN_MEMBER_ID})
+                PRIMARY KEY ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MEMBER_ID})
             )
         """)
+        # 既存の月間統計から一度だけ累計通話時間を埋める
+        await _run_migration_once(
+            cursor,
+            constants.MIGRATION_BACKFILL_MEMBER_GUILD_LIFETIME_STATS,
+            _backfill_member_guild_lifetime_stats,
+        )
         logger.debug(
-            f"Checked or created table '{constants.TABLE_MEMBER_MONTHLY_STATS}'."
+            f"Checked or created table '{constants.TABLE_MEMBER_GUILD_LIFETIME_STATS}'."
         )
 
         # settings テーブル: ギルドごとの設定情報を記録 (寝落ち確認のタイムアウト時間など)
@@ -111,30 +734,33 @@ async def init_db():
         """)
         logger.debug(f"Checked or created table '{constants.TABLE_SETTINGS}'.")
 
-        # user_mute_stats テーブル: ユーザーごとのミュート回数を記録
-        # user_id: ユーザーID (主キー)
+        # user_mute_stats テーブル: ギルド・ユーザーごとのミュート回数を記録
+        # guild_id: ギルドID (主キーの一部)
+        # member_id: ユーザーID (主キーの一部)
         # mute_count: ミュート回数 (デフォルト0)
-        await cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {constants.TABLE_USER_MUTE_STATS} (
-                {constants.COLUMN_MEMBER_ID} INTEGER PRIMARY KEY,
-                {constants.COLUMN_MUTE_COUNT} INTEGER NOT NULL DEFAULT 0
-            )
-        """)
+        await cursor.execute(
+            _SQL_CREATE_USER_MUTE_STATS.format(table=constants.TABLE_USER_MUTE_STATS)
+        )
         logger.debug(f"Checked or created table '{constants.TABLE_USER_MUTE_STATS}'.")
 
         # mute_events テーブル: ミュートイベントの履歴を記録
         # id: イベントID (主キー、自動採番)
         # user_id: ミュートされたユーザーのID
         # timestamp: イベント発生時刻 (ISO 8601 形式)
-        await cursor.execute("""
+        # guild_id: ミュートされたギルドのID
+        await cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS mute_events (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
-                timestamp TEXT NOT NULL
+                timestamp TEXT NOT NULL,
+                {constants.COLUMN_GUILD_ID} INTEGER NOT NULL DEFAULT {constants.UNATTRIBUTED_GUILD_ID}
             )
         """)
         logger.debug("Checked or created table 'mute_events'.")
 
+        # ギルドIDを持たない旧スキーマのミュートのテーブルを移行する
+        await _migrate_mute_guild_partitioning(cursor)
+
         # active_muted_members テーブル: 現在寝落ちミュート状態にあるメンバーを記録
         # member_id: メンバーID (主キー)
         # muted_at: ミュートされた時刻 (ISO 8601 形式)
@@ -146,6 +772,40 @@ async def init_db():
         """)
         logger.debug("Checked or created table 'active_muted_members'.")
 
+        # 進行中の通話セッションのスナップショット (再起動・クラッシュ時の復元用)
+        # active_session_snapshots: 2人以上通話セッション (guild_id, channel_id ごとに開始時刻とスナップショット時刻)
+        # active_session_snapshot_members: セッションの参加者 (join_time が NULL のメンバーは退出済みの参加者)
+        # call_session_snapshots: 通話通知用の通話セッション (開始時刻と最初のメンバー)
+        await cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {constants.TABLE_ACTIVE_SESSION_SNAPSHOTS} (
+                {constants.COLUMN_GUILD_ID} INTEGER NOT NULL,
+                {constants.COLUMN_CHANNEL_ID} INTEGER NOT NULL,
+                session_start TEXT NOT NULL,
+                {constants.COLUMN_SNAPSHOT_AT} TEXT NOT NULL,
+                PRIMARY KEY ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID})
+            )
+        """)
+        await cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {constants.TABLE_ACTIVE_SESSION_SNAPSHOT_MEMBERS} (
+                {constants.COLUMN_GUILD_ID} INTEGER NOT NULL,
+                {constants.COLUMN_CHANNEL_ID} INTEGER NOT NULL,
+                {constants.COLUMN_MEMBER_ID} INTEGER NOT NULL,
+                join_time TEXT,
+                PRIMARY KEY ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID}, {constants.COLUMN_MEMBER_ID})
+            )
+        """)
+        await cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {constants.TABLE_CALL_SESSION_SNAPSHOTS} (
+                {constants.COLUMN_GUILD_ID} INTEGER NOT NULL,
+                {constants.COLUMN_CHANNEL_ID} INTEGER NOT NULL,
+                {constants.COLUMN_START_TIME} TEXT NOT NULL,
+                first_member_id INTEGER,
+                {constants.COLUMN_SNAPSHOT_AT} TEXT NOT NULL,
+                PRIMARY KEY ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID})
+            )
+        """)
+        logger.debug("Checked or created session snapshot tables.")
+
         # インデックスの作成 (クエリパフォーマンス向上のため)
         # TODO: SQLクエリ構築の代替手段を検討 - f-stringを使用しているが、テーブル名/カラム名は定数由来のため直接的なSQLインジェクションリスクは低い。
         # より構造的なクエリビルダやライブラリの利用も検討可能。
@@ -172,9 +832,60 @@ async def init_db():
         await cursor.execute(
             f"CREATE INDEX IF NOT EXISTS idx_member_monthly_stats_member_id ON {constants.TABLE_MEMBER_MONTHLY_STATS} ({constants.COLUMN_MEMBER_ID})"
         )
-        # user_mute_stats テーブルのインデックス (member_id は主キーなので自動的にインデックスが作成される)
+        # 年間レポートの範囲検索 (start_time >= ? AND start_time < ?) 用
+        await cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_sessions_start_time ON {constants.TABLE_SESSIONS} ({constants.COLUMN_START_TIME})"
+        )
+        # 月間ミュート回数の範囲検索用
+        await cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mute_events_timestamp ON mute_events (timestamp)"
+        )
+        # ユーザーごとのミュート履歴の範囲検索用
+        await cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mute_events_user_id_timestamp ON mute_events (user_id, timestamp)"
+        )
+        # ギルド単位の月間ミュート回数の範囲検索用
+        await cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_mute_events_guild_id_timestamp ON mute_events ({constants.COLUMN_GUILD_ID}, timestamp)"
+        )
+        # ギルド単位の統計クエリ用 (1つのギルドの行だけを検索する)
+        await cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_sessions_guild_id_month_key ON {constants.TABLE_SESSIONS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MONTH_KEY})"
+        )
+        await cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_sessions_guild_id_start_time ON {constants.TABLE_SESSIONS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_START_TIME})"
+        )
+        await cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_session_participants_guild_id_member_id ON {constants.TABLE_SESSION_PARTICIPANTS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MEMBER_ID})"
+        )
+        # ランキングの上位K件の取得用 (通話時間・回数の多い順にインデックスを読み、K件で打ち切る)
+        # 自分の順位 (自分より多いメンバーの数) の COUNT もインデックスの範囲検索で行う
+        await cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_member_monthly_stats_ranking ON {constants.TABLE_MEMBER_MONTHLY_STATS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MONTH_KEY}, {constants.COLUMN_TOTAL_DURATION} DESC, {constants.COLUMN_MEMBER_ID})"
+        )
+        await cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_member_guild_lifetime_stats_ranking ON {constants.TABLE_MEMBER_GUILD_LIFETIME_STATS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_TOTAL_DURATION} DESC, {constants.COLUMN_MEMBER_ID})"
+        )
+        await cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_user_mute_stats_ranking ON {constants.TABLE_USER_MUTE_STATS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MUTE_COUNT} DESC, {constants.COLUMN_MEMBER_ID})"
+        )
         logger.debug("Checked or created indexes.")
 
+        # ギルドIDを持たない既存データ (どのギルドの統計にも含める) があるかどうか
+        # ない場合はランキングをギルドの行だけでインデックスから取得できる
+        global _has_unattributed_stats
+        await cursor.execute(
+            f"SELECT 1 FROM {constants.TABLE_MEMBER_MONTHLY_STATS} WHERE {constants.COLUMN_GUILD_ID} = ? LIMIT 1",
+            (constants.UNATTRIBUTED_GUILD_ID,),
+        )
+        _has_unattributed_stats = await cursor.fetchone() is not None
+        global _has_unattributed_mute_stats
+        await cursor.execute(
+            f"SELECT 1 FROM {constants.TABLE_USER_MUTE_STATS} WHERE {constants.COLUMN_GUILD_ID} = ? LIMIT 1",
+            (constants.UNATTRIBUTED_GUILD_ID,),
+        )
+        _has_unattributed_mute_stats = await cursor.fetchone() is not None
+
         await conn.commit()
         logger.debug("Committed database changes.")
     except Exception as e:
@@ -185,10 +896,49 @@ async def init_db():
             await conn.close()
             logger.debug("Database connection closed.")
 
+    # 以降のデータベース操作で使い回す接続プールを開く
+    await _pool.open(DB_FILE, pragmas)
+    # ギルド設定をキャッシュに読み込む (以降、設定の参照ではデータベースにアクセスしない)
+    _settings_cache.clear()
+    _report_cache.clear()
+    await load_guild_settings_cache()
+    # 統計書き込みのライトビハインドバッファを開始する
+    _write_buffer.start()
+
     # データベースの初期化が完了したことを通知
     logger.info(f"Database '{DB_FILE}' initialization complete.")
 
 
+async def checkpoint_wal(mode: str = "PASSIVE"):
+    """
+    WAL ファイルの内容をデータベース本体に書き戻します (チェックポイント)。
+    mode: "PASSIVE" (他の接続を待たない) または "TRUNCATE" (完了後に WAL ファイルを切り詰める)。
+    戻り値は (busy, log, checkpointed) のタプルです。
+    """
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Invalid checkpoint mode: {mode}")
+    started = time.perf_counter()
+    async with DatabaseConnection() as conn:
+        cursor = await conn.execute(f"PRAGMA wal_checkpoint({mode})")
+        row = await cursor.fetchone()
+    result = (row[0], row[1], row[2]) if row else (0, 0, 0)
+    logger.info(
+        f"WAL checkpoint ({mode}) finished in {time.perf_counter() - started:.3f}s. busy={result[0]}, log={result[1]}, checkpointed={result[2]}"
+    )
+    return result
+
+
+async def close_db():
+    """
+    ライトビハインドバッファをフラッシュしてから共有接続プールを閉じます。ボットの終了時に呼び出されます。
+    """
+    try:
+        await _write_buffer.stop()
+    except Exception as e:
+        logger.error(f"An error occurred while flushing write buffer on shutdown: {e}")
+    await _pool.close()
+
+
 async def get_db_connection():
     """
     データベース接続を取得し、aiosqlite.Row ファクトリを設定します。
@@ -203,41 +953,52 @@ async def get_db_connection():
         raise  # エラーを再送出
 
 
-async def update_member_monthly_stats(month_key, member_id, duration):
+async def update_member_monthly_stats(guild_id, month_key, member_id, duration):
     """
-    指定された月のメンバーの累計通話時間を更新または挿入します。
-    指定された月とメンバーの組み合わせが既に存在する場合は、total_duration を加算して更新します (ON CONFLICT)。
+    指定されたギルド・月のメンバーの累計通話時間を更新または挿入します。
+    指定されたギルド・月・メンバーの組み合わせが既に存在する場合は、total_duration を加算して更新します (ON CONFLICT)。
     存在しない場合は、新しいレコードを挿入します。
     """
     try:
         async with DatabaseConnection() as conn:
             cursor = await conn.cursor()
             await cursor.execute(
-                SQL_UPSERT_MEMBER_MONTHLY_STATS, (month_key, member_id, duration)
+                SQL_UPSERT_MEMBER_MONTHLY_STATS,
+                (guild_id, month_key, member_id, duration),
+            )
+            # 総通話時間も同じトランザクションで加算する
+            await cursor.execute(
+                SQL_UPSERT_MEMBER_LIFETIME_STATS, (member_id, duration)
+            )
+            await cursor.execute(
+                SQL_UPSERT_MEMBER_GUILD_LIFETIME_STATS, (guild_id, member_id, duration)
             )
-            await conn.commit()
+            await _commit(conn)
+            _report_cache.invalidate_call_stats([(guild_id, month_key)])
             # 更新後の total_duration を取得して返す
             await cursor.execute(
-                "SELECT total_duration FROM member_monthly_stats WHERE month_key = ? AND member_id = ?",
-                (month_key, member_id),
+                "SELECT total_duration FROM member_monthly_stats WHERE guild_id = ? AND month_key = ? AND member_id = ?",
+                (guild_id, month_key, member_id),
             )
             result = await cursor.fetchone()
             updated_total_duration = (
                 result["total_duration"] if result else constants.DEFAULT_TOTAL_DURATION
             )
             logger.info(
-                f"Updated monthly stats for member {member_id} (Month: {month_key}, Duration: {duration}). New total: {updated_total_duration}"
+                f"Updated monthly stats for member {member_id} (Guild: {guild_id}, Month: {month_key}, Duration: {duration}). New total: {updated_total_duration}"
             )
             return updated_total_duration
     except Exception as e:
         logger.error(
-            f"An error occurred while updating member monthly stats (Month: {month_key}, Member ID: {member_id}, Duration: {duration}): {e}"
+            f"An error occurred while updating member monthly stats (Guild: {guild_id}, Month: {month_key}, Member ID: {member_id}, Duration: {duration}): {e}"
         )
         # エラー発生時もロールバックは不要 (ON CONFLICT のため)
         return constants.DEFAULT_TOTAL_DURATION  # エラー時はデフォルト値を返す
 
 
-async def record_voice_session_to_db(session_start, session_duration, participants):
+async def record_voice_session_to_db(
+    guild_id, session_start, session_duration, participants
+):
     """
     通話セッションの情報をデータベースに記録します。
     sessions テーブルにセッション情報を挿入し、そのセッションに参加したメンバーを session_participants テーブルに挿入します。
@@ -251,16 +1012,24 @@ async def record_voice_session_to_db(session_start, session_duration, participan
 
             # sessions テーブルにセッションを挿入
             await cursor.execute(
-                SQL_INSERT_SESSION, (month_key, start_time_iso, session_duration)
+                SQL_INSERT_SESSION,
+                (guild_id, month_key, start_time_iso, session_duration),
             )
             session_id = cursor.lastrowid  # 挿入されたセッションのIDを取得
+            # 日ごとの集計も同じトランザクションで更新する
+            await cursor.execute(
+                SQL_UPSERT_DAILY_SESSION_ROLLUP,
+                _daily_rollup_params(
+                    guild_id, session_start, session_duration, session_id
+                ),
+            )
             logger.info(
                 f"Recorded new session. Session ID: {session_id}, Start time: {start_time_iso}, Duration: {session_duration}"
             )
 
             # session_participants テーブルに参加者を挿入
             if participants:
-                participant_data = [(session_id, p) for p in participants]
+                participant_data = [(session_id, p, guild_id) for p in participants]
                 await cursor.executemany(
                     SQL_INSERT_SESSION_PARTICIPANTS, participant_data
                 )
@@ -270,29 +1039,391 @@ async def record_voice_session_to_db(session_start, session_duration, participan
             else:
                 logger.debug(f"No participants in session {session_id}.")
 
-            await conn.commit()
+            await _commit(conn)
             logger.debug("Committed database changes.")
+            _report_cache.invalidate_call_stats([(guild_id, month_key)])
     except Exception as e:
         logger.error(
-            f"An error occurred while recording voice session (Start time: {session_start}, Duration: {session_duration}, Participants: {participants}): {e}"
+            f"An error occurred while recording voice session (Guild: {guild_id}, Start time: {session_start}, Duration: {session_duration}, Participants: {participants}): {e}"
         )
-        # aiosqliteのwith構文はデフォルトで例外発生時にロールバックしないため、必要に応じてtry/except内でrollback()を呼び出す
-        try:
-            async with DatabaseConnection() as conn_rollback:
-                await conn_rollback.rollback()
-                logger.warning("Rolled back database changes.")
-        except Exception as rollback_e:
-            logger.error(f"An error occurred during rollback: {rollback_e}")
+        # 未コミットの変更は DatabaseConnection の終了時にロールバック済み
         raise  # エラーを再送出
 
 
+# /stats コマンドの集計結果 (レポート) のキャッシュ
+# キーは (guild_id, 期間, 種類)。期間は月キー (YYYY-MM) または REPORT_PERIOD_TOTAL
+# 統計の書き込み (セッションの記録、ミュート回数の加算) で影響を受けるキーを破棄する
+# 終わった月の集計は変わらないため期限なしで保持し、それ以外は念のため一定時間で期限切れにする
+class ReportCache:
+    def __init__(
+        self,
+        max_size: int = constants.REPORT_CACHE_MAX_SIZE,
+        ttl_seconds: float = constants.REPORT_CACHE_TTL_SECONDS,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # (guild_id, 期間, 種類) -> (期限 (None は期限なし), レポート)
+        self._entries: OrderedDict[tuple[int, str, str], tuple[float | None, Any]] = (
+            OrderedDict()
+        )
+        # 破棄が行われるたびに増える世代番号
+        # 集計中に書き込みがあった場合、古い集計結果をキャッシュしないために使う
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, guild_id: int, period: str, kind: str):
+        key = (guild_id, period, kind)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        logger.info(f"Report cache hit: guild {guild_id}, period {period}, {kind}.")
+        return entry[1]
+
+    def put(self, guild_id: int, period: str, kind: str, report, generation: int):
+        """
+        集計結果をキャッシュします。集計を始めた時点の世代番号 (generation) から
+        破棄が行われていた場合は、集計結果が古い可能性があるためキャッシュしません。
+        """
+        if generation != self.generation:
+            logger.debug(
+                f"Report for guild {guild_id}, period {period}, {kind} was invalidated while computing. Not caching."
+            )
+            return
+        current_month = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m")
+        if period != constants.REPORT_PERIOD_TOTAL and period < current_month:
+            expires_at = None
+        else:
+            expires_at = time.monotonic() + self.ttl_seconds
+        key = (guild_id, period, kind)
+        self._entries[key] = (expires_at, report)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(
+        self,
+        guild_id: int | None = None,
+        period: str | None = None,
+        kind: str | None = None,
+    ):
+        """条件 (None はすべて) に一致するキーを破棄します。"""
+        self.generation += 1
+        for key in list(self._entries):
+            if (
+                (guild_id is None or key[0] == guild_id)
+                and (period is None or key[1] == period)
+                and (kind is None or key[2] == kind)
+            ):
+                del self._entries[key]
+                self.invalidations += 1
+
+    def invalidate_call_stats(self, guild_month_keys):
+        """
+        通話時間の書き込みで変わるレポート (そのギルドの月間統計と累計ランキング) を破棄します。
+        guild_month_keys は書き込んだ (guild_id, month_key) の組です。
+        """
+        guild_month_keys = set(guild_month_keys)
+        for guild_id, month_key in guild_month_keys:
+            self.invalidate(guild_id, month_key, constants.REPORT_KIND_MONTHLY)
+        for guild_id in {guild_id for guild_id, _ in guild_month_keys}:
+            self.invalidate(
+                guild_id, constants.REPORT_PERIOD_TOTAL, constants.REPORT_KIND_RANKING
+            )
+
+    def invalidate_mute_stats(self, guild_id: int, month_key: str):
+        """ミュート回数の書き込みで変わるギルドのレポート (その月の月間統計とランキング) を破棄します。"""
+        self.invalidate(guild_id, month_key, constants.REPORT_KIND_MONTHLY)
+        self.invalidate(
+            guild_id, constants.REPORT_PERIOD_TOTAL, constants.REPORT_KIND_RANKING
+        )
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """キャッシュの件数とヒット率を返します。"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_report_cache = ReportCache()
+
+
+def get_cached_report(guild_id: int, period: str, kind: str):
+    """キャッシュされたレポートを返します。ない場合は None を返します。"""
+    return _report_cache.get(guild_id, period, kind)
+
+
+def get_report_cache_generation() -> int:
+    """レポートの集計を始める前に取得し、cache_report に渡す世代番号を返します。"""
+    return _report_cache.generation
+
+
+def cache_report(guild_id: int, period: str, kind: str, report, generation: int):
+    """集計したレポートをキャッシュします。"""
+    _report_cache.put(guild_id, period, kind, report, generation)
+
+
+def get_report_cache_stats() -> dict:
+    """レポートキャッシュのヒット率を返します。"""
+    return _report_cache.get_stats()
+
+
+# セッション終了時の統計書き込みをまとめて行うライトビハインドバッファ
+# 月間統計の UPSERT と通話セッションの INSERT を溜めておき、件数または時間の閾値で1トランザクションにまとめて書き込む
+class StatsWriteBuffer:
+    def __init__(
+        self,
+        max_pending: int = constants.WRITE_BUFFER_MAX_PENDING,
+        flush_interval_seconds: float = constants.WRITE_BUFFER_FLUSH_INTERVAL_SECONDS,
+        max_retries: int = constants.WRITE_BUFFER_MAX_RETRIES,
+    ):
+        self.max_pending = max_pending
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_retries = max_retries
+        # 続けてフラッシュに失敗した回数 (max_retries に達したら書き込み内容を破棄する)
+        self.consecutive_failures = 0
+        # 書き込めずに破棄した月間統計と通話セッションの件数
+        self.dropped_count = 0
+        # 未書き込みの月間統計: [(guild_id, month_key, member_id, duration)]
+        self._monthly_stats: list[tuple[int, str, int, float]] = []
+        # 未書き込みの通話セッション: [(guild_id, session_start, duration, participants)]
+        self._sessions: list[tuple[int, datetime.datetime, float, list[int]]] = []
+        # 書き込み中の月間統計 (コミットされるまでは未反映の値として扱う)
+        self._in_flight_monthly_stats: list[tuple[int, str, int, float]] = []
+        # フラッシュと総通話時間の読み取りを直列化するロック
+        # (コミット直後に同じ値を二重に数えたり、取りこぼしたりしないようにする)
+        self.lock = asyncio.Lock()
+        self._timer_task: asyncio.Task | None = None
+
+    def pending_count(self) -> int:
+        return len(self._monthly_stats) + len(self._sessions)
+
+    def pending_totals(self) -> dict[int, float]:
+        """まだデータベースに反映されていない通話時間の合計をメンバーIDごとに返します。"""
+        totals: dict[int, float] = {}
+        for _, _, member_id, duration in (
+            self._in_flight_monthly_stats + self._monthly_stats
+        ):
+            totals[member_id] = totals.get(member_id, 0) + duration
+        return totals
+
+    def start(self):
+        """時間の閾値でフラッシュするバックグラウンドタスクを開始します。"""
+        if self._timer_task is None or self._timer_task.done():
+            self._timer_task = asyncio.create_task(self._flush_periodically())
+            logger.debug(
+                f"Started write buffer flush task (interval: {self.flush_interval_seconds}s, max pending: {self.max_pending})."
+            )
+
+    async def stop(self):
+        """バックグラウンドタスクを停止し、残っている書き込みを全てフラッシュします。"""
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            try:
+                await self._timer_task
+            except asyncio.CancelledError:
+                pass
+            self._timer_task = None
+        await self.flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                # 書き込めなかった分はバッファに戻されているため、次回のフラッシュで再試行する
+                logger.error(f"An error occurred while flushing write buffer: {e}")
+
+    async def add_monthly_stats(
+        self, guild_id: int, month_key: str, member_id: int, duration: float
+    ):
+        self._monthly_stats.append((guild_id, month_key, member_id, duration))
+        await self._flush_if_full()
+
+    async def add_session(
+        self,
+        guild_id: int,
+        session_start: datetime.datetime,
+        duration: float,
+        participants: list[int],
+    ):
+        self._sessions.append((guild_id, session_start, duration, list(participants)))
+        await self._flush_if_full()
+
+    def _requeue(
+        self,
+        monthly_stats: list[tuple[int, str, int, float]],
+        sessions: list[tuple[int, datetime.datetime, float, list[int]]],
+    ):
+        # 書き込めなかった分を先頭に戻す (後から追加された分より前に書き込まれるようにする)
+        self._monthly_stats = monthly_stats + self._monthly_stats
+        self._sessions = sessions + self._sessions
+
+    async def _flush_if_full(self):
+        if self.pending_count() >= self.max_pending:
+            await self.flush()
+
+    async def flush(self):
+        """
+        溜まっている書き込みを1トランザクションでデータベースに反映します。
+        失敗した場合は書き込み内容をバッファに戻し、例外を再送出します。
+        max_retries 回続けて失敗した場合は、書き込み内容をログに残して破棄します
+        (書き込めない行がバッファに残り続け、バッファが際限なく大きくならないようにする)。
+        """
+        async with self.lock:
+            if not self._monthly_stats and not self._sessions:
+                return
+            monthly_stats, self._monthly_stats = self._monthly_stats, []
+            sessions, self._sessions = self._sessions, []
+            self._in_flight_monthly_stats = monthly_stats
+            started = time.perf_counter()
+            try:
+                async with DatabaseConnection() as conn:
+                    cursor = await conn.cursor()
+                    # 同じギルド・月・メンバーへの UPSERT は1行にまとめる
+                    merged: dict[tuple[int, str, int], float] = {}
+                    for guild_id, month_key, member_id, duration in monthly_stats:
+                        key = (guild_id, month_key, member_id)
+                        merged[key] = merged.get(key, 0) + duration
+                    await cursor.executemany(
+                        SQL_UPSERT_MEMBER_MONTHLY_STATS,
+                        [key + (duration,) for key, duration in merged.items()],
+                    )
+                    # 総通話時間も同じトランザクションで加算する
+                    lifetime: dict[int, float] = {}
+                    for (_, _, member_id), duration in merged.items():
+                        lifetime[member_id] = lifetime.get(member_id, 0) + duration
+                    await cursor.executemany(
+                        SQL_UPSERT_MEMBER_LIFETIME_STATS, list(lifetime.items())
+                    )
+                    guild_lifetime: dict[tuple[int, int], float] = {}
+                    for (guild_id, _, member_id), duration in merged.items():
+                        key2 = (guild_id, member_id)
+                        guild_lifetime[key2] = guild_lifetime.get(key2, 0) + duration
+                    await cursor.executemany(
+                        SQL_UPSERT_MEMBER_GUILD_LIFETIME_STATS,
+                        [
+                            key2 + (duration,)
+                            for key2, duration in guild_lifetime.items()
+                        ],
+                    )
+                    for (
+                        guild_id,
+                        session_start,
+                        session_duration,
+                        participants,
+                    ) in sessions:
+                        await cursor.execute(
+                            SQL_INSERT_SESSION,
+                            (
+                                guild_id,
+                                session_start.strftime("%Y-%m"),
+                                session_start.isoformat(),
+                                session_duration,
+                            ),
+                        )
+                        session_id = cursor.lastrowid
+                        # 日ごとの集計も同じトランザクションで更新する
+                        await cursor.execute(
+                            SQL_UPSERT_DAILY_SESSION_ROLLUP,
+                            _daily_rollup_params(
+                                guild_id, session_start, session_duration, session_id
+                            ),
+                        )
+                        if participants:
+                            await cursor.executemany(
+                                SQL_INSERT_SESSION_PARTICIPANTS,
+                                [(session_id, p, guild_id) for p in participants],
+                            )
+                    await _commit(conn)
+                # コミットした統計に関係するレポートを破棄する
+                _report_cache.invalidate_call_stats(
+                    [key[:2] for key in merged]
+                    + [
+                        (guild_id, session_start.strftime("%Y-%m"))
+                        for guild_id, session_start, _, _ in sessions
+                    ]
+                )
+            except Exception:
+                self.consecutive_failures += 1
+                if self.consecutive_failures < self.max_retries:
+                    self._requeue(monthly_stats, sessions)
+                else:
+                    self.consecutive_failures = 0
+                    self.dropped_count += len(monthly_stats) + len(sessions)
+                    logger.error(
+                        f"Dropped write buffer batch after {self.max_retries} failed flushes: {len(monthly_stats)} monthly stats, {len(sessions)} sessions. Monthly stats: {monthly_stats}. Sessions: {sessions}"
+                    )
+                raise
+            except BaseException:
+                # キャンセルされた場合は失敗として数えずに戻す
+                self._requeue(monthly_stats, sessions)
+                raise
+            finally:
+                self._in_flight_monthly_stats = []
+            self.consecutive_failures = 0
+            logger.info(
+                f"Flushed write buffer: {len(merged)} monthly stats upserts, {len(sessions)} sessions in {time.perf_counter() - started:.3f}s."
+            )
+
+
+# プロセス全体で共有するライトビハインドバッファ (init_db で開始し、close_db でフラッシュする)
+_write_buffer = StatsWriteBuffer()
+
+
+async def queue_member_monthly_stats(guild_id, month_key, member_id, duration):
+    """
+    ギルドごとのメンバーの月間累計通話時間への加算をバッファに追加します。
+    書き込みは件数または時間の閾値に達した時点でまとめて行われます。
+    """
+    await _write_buffer.add_monthly_stats(guild_id, month_key, member_id, duration)
+    logger.debug(
+        f"Queued monthly stats update for member {member_id} (Guild: {guild_id}, Month: {month_key}, Duration: {duration})."
+    )
+
+
+async def queue_voice_session(guild_id, session_start, session_duration, participants):
+    """
+    通話セッションの記録をバッファに追加します。
+    書き込みは件数または時間の閾値に達した時点でまとめて行われます。
+    """
+    await _write_buffer.add_session(
+        guild_id, session_start, session_duration, participants
+    )
+    logger.debug(
+        f"Queued voice session (Guild: {guild_id}, Start time: {session_start}, Duration: {session_duration}, Participants: {participants})."
+    )
+
+
+async def flush_write_buffer():
+    """バッファに溜まっている書き込みを即座にデータベースへ反映します。"""
+    await _write_buffer.flush()
+
+
 # SQL Queries
 # メンバーの総通話時間を取得するクエリ
 # TODO: SQLクエリ構築の代替手段を検討 - f-stringを使用しているが、テーブル名/カラム名は定数由来のため直接的なSQLインジェクションリスクは低い。
 # より構造的なクエリビルダやライブラリの利用も検討可能。
 SQL_GET_TOTAL_CALL_TIME = f"""
-    SELECT SUM({constants.COLUMN_TOTAL_DURATION}) as total
-    FROM {constants.TABLE_MEMBER_MONTHLY_STATS}
+    SELECT {constants.COLUMN_TOTAL_DURATION} as total
+    FROM {constants.TABLE_MEMBER_LIFETIME_STATS}
     WHERE {constants.COLUMN_MEMBER_ID} = ?
 """
 
@@ -328,90 +1459,238 @@ SQL_UPSERT_SETTINGS_ON_CONFLICT = (
 # TODO: SQLクエリ構築の代替手段を検討 - f-stringを使用しているが、テーブル名/カラム名は定数由来のため直接的なSQLインジェクションリスクは低い。
 # より構造的なクエリビルダやライブラリの利用も検討可能。
 SQL_INSERT_SESSION = f"""
-    INSERT INTO {constants.TABLE_SESSIONS} ({constants.COLUMN_MONTH_KEY}, {constants.COLUMN_START_TIME}, duration)
-    VALUES (?, ?, ?)
+    INSERT INTO {constants.TABLE_SESSIONS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MONTH_KEY}, {constants.COLUMN_START_TIME}, duration)
+    VALUES (?, ?, ?, ?)
 """
 
 # session_participants テーブルへの挿入クエリ
 # TODO: SQLクエリ構築の代替手段を検討 - f-stringを使用しているが、テーブル名/カラム名は定数由来のため直接的なSQLインジェクションリスクは低い。
 # より構造的なクエリビルダやライブラリの利用も検討可能。
 SQL_INSERT_SESSION_PARTICIPANTS = f"""
-    INSERT INTO {constants.TABLE_SESSION_PARTICIPANTS} ({constants.COLUMN_SESSION_ID}, {constants.COLUMN_MEMBER_ID})
+    INSERT INTO {constants.TABLE_SESSION_PARTICIPANTS} ({constants.COLUMN_SESSION_ID}, {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_GUILD_ID})
+    VALUES (?, ?, ?)
+"""
+
+# daily_session_rollup テーブルへの UPSERT (INSERT or UPDATE) クエリ
+# 指定されたギルド・日の行が存在する場合はセッション数と合計を加算し、最長セッションを更新
+# (同じ期間のセッションは先に記録されたものを最長とする)
+SQL_UPSERT_DAILY_SESSION_ROLLUP = f"""
+    INSERT INTO {constants.TABLE_DAILY_SESSION_ROLLUP} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_DAY}, session_count, {constants.COLUMN_TOTAL_DURATION}, max_duration, longest_session_id)
+    VALUES (?, ?, 1, ?, ?, ?)
+    ON CONFLICT({constants.COLUMN_GUILD_ID}, {constants.COLUMN_DAY}) DO UPDATE SET
+    session_count = session_count + 1,
+    {constants.COLUMN_TOTAL_DURATION} = {constants.COLUMN_TOTAL_DURATION} + excluded.{constants.COLUMN_TOTAL_DURATION},
+    longest_session_id = CASE WHEN excluded.max_duration > max_duration THEN excluded.longest_session_id ELSE longest_session_id END,
+    max_duration = MAX(max_duration, excluded.max_duration)
+"""
+
+
+def _daily_rollup_params(guild_id, session_start, session_duration, session_id):
+    """SQL_UPSERT_DAILY_SESSION_ROLLUP に渡すパラメータを作成します。"""
+    return (
+        guild_id,
+        session_start.strftime("%Y-%m-%d"),
+        session_duration,
+        session_duration,
+        session_id,
+    )
+
+
+# member_monthly_stats テーブルへの UPSERT (INSERT or UPDATE) クエリ
+# 指定されたギルド・月・メンバーの組み合わせが存在する場合は total_duration を加算して更新
+# TODO: SQLクエリ構築の代替手段を検討 - f-stringを使用しているが、テーブル名/カラム名は定数由来のため直接的なSQLインジェクションリスクは低い。
+# より構造的なクエリビルダやライブラリの利用も検討可能。
+SQL_UPSERT_MEMBER_MONTHLY_STATS = f"""
+    INSERT INTO {constants.TABLE_MEMBER_MONTHLY_STATS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MONTH_KEY}, {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_TOTAL_DURATION})
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MONTH_KEY}, {constants.COLUMN_MEMBER_ID}) DO UPDATE SET
+    {constants.COLUMN_TOTAL_DURATION} = {constants.COLUMN_TOTAL_DURATION} + excluded.{constants.COLUMN_TOTAL_DURATION}
+"""
+
+# member_lifetime_stats テーブルへの UPSERT (INSERT or UPDATE) クエリ
+# 指定されたメンバーが存在する場合は total_duration を加算して更新
+SQL_UPSERT_MEMBER_LIFETIME_STATS = f"""
+    INSERT INTO {constants.TABLE_MEMBER_LIFETIME_STATS} ({constants.COLUMN_MEMBER_ID}, {constants.COLUMN_TOTAL_DURATION})
     VALUES (?, ?)
+    ON CONFLICT({constants.COLUMN_MEMBER_ID}) DO UPDATE SET
+    {constants.COLUMN_TOTAL_DURATION} = {constants.COLUMN_TOTAL_DURATION} + excluded.{constants.COLUMN_TOTAL_DURATION}
+"""
+
+# member_guild_lifetime_stats テーブルへの UPSERT (INSERT or UPDATE) クエリ
+# 指定されたギルド・メンバーが存在する場合は total_duration を加算して更新
+SQL_UPSERT_MEMBER_GUILD_LIFETIME_STATS = f"""
+    INSERT INTO {constants.TABLE_MEMBER_GUILD_LIFETIME_STATS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_TOTAL_DURATION})
+    VALUES (?, ?, ?)
+    ON CONFLICT({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MEMBER_ID}) DO UPDATE SET
+    {constants.COLUMN_TOTAL_DURATION} = {constants.COLUMN_TOTAL_DURATION} + excluded.{constants.COLUMN_TOTAL_DURATION}
+"""
+
+# ギルドで絞り込む条件 (ギルドIDを記録する前の既存データはどのギルドの統計にも含める)
+# (guild_id, ...) の複合インデックスで対象ギルドの行だけを検索できる
+_SQL_GUILD_FILTER = (
+    f"{constants.COLUMN_GUILD_ID} IN (?, {constants.UNATTRIBUTED_GUILD_ID})"
+)
+
+# user_mute_stats テーブルへの UPSERT (INSERT or UPDATE) クエリ
+# 指定されたギルド・ユーザーIDが存在する場合は mute_count をインクリメントし、存在しない場合は新しいレコードを挿入
+SQL_UPSERT_MUTE_COUNT = f"""
+    INSERT INTO {constants.TABLE_USER_MUTE_STATS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_MUTE_COUNT})
+    VALUES (?, ?, 1)
+    ON CONFLICT({constants.COLUMN_GUILD_ID}, {constants.COLUMN_MEMBER_ID}) DO UPDATE SET
+    {constants.COLUMN_MUTE_COUNT} = {constants.COLUMN_MUTE_COUNT} + 1
+"""
+
+# user_mute_stats テーブルから指定されたギルドでのユーザーのミュート回数を取得するクエリ
+SQL_GET_MUTE_COUNT = f"""
+    SELECT SUM({constants.COLUMN_MUTE_COUNT}) AS {constants.COLUMN_MUTE_COUNT}
+    FROM {constants.TABLE_USER_MUTE_STATS}
+    WHERE {_SQL_GUILD_FILTER} AND {constants.COLUMN_MEMBER_ID} = ?
+"""
+
+# mute_events テーブルから指定されたギルド・期間のユーザー別ミュート回数を取得するクエリ
+# インデックスを使用できるよう、timestamp の範囲 (開始 <= timestamp < 終了) で絞り込む
+SQL_GET_MONTHLY_MUTE_COUNTS = f"""
+    SELECT user_id, COUNT(*)
+    FROM mute_events
+    WHERE {_SQL_GUILD_FILTER} AND timestamp >= ? AND timestamp < ?
+    GROUP BY user_id
+    ORDER BY COUNT(*) DESC
+"""
+
+# 指定されたギルド・月のセッションを取得するクエリ
+SQL_GET_MONTHLY_SESSIONS = f"""
+    SELECT {constants.COLUMN_START_TIME}, duration, id FROM {constants.TABLE_SESSIONS}
+    WHERE {_SQL_GUILD_FILTER} AND {constants.COLUMN_MONTH_KEY} = ?
+"""
+
+# 指定されたギルド・月のメンバー別累計通話時間を取得するクエリ
+SQL_GET_MONTHLY_MEMBER_STATS = f"""
+    SELECT {constants.COLUMN_MEMBER_ID}, SUM({constants.COLUMN_TOTAL_DURATION}) as total_duration
+    FROM {constants.TABLE_MEMBER_MONTHLY_STATS}
+    WHERE {_SQL_GUILD_FILTER} AND {constants.COLUMN_MONTH_KEY} = ?
+    GROUP BY {constants.COLUMN_MEMBER_ID}
+"""
+
+# 指定されたギルドで指定された期間に開始したセッションを取得するクエリ
+# インデックスを使用できるよう、start_time の範囲 (開始 <= start_time < 終了) で絞り込む
+SQL_GET_SESSIONS_IN_RANGE = f"""
+    SELECT {constants.COLUMN_START_TIME}, duration, id FROM {constants.TABLE_SESSIONS}
+    WHERE {_SQL_GUILD_FILTER}
+    AND {constants.COLUMN_START_TIME} >= ? AND {constants.COLUMN_START_TIME} < ?
+"""
+
+# 指定されたギルド・月キーの範囲のメンバー別累計通話時間を取得するクエリ
+SQL_GET_MEMBER_TOTAL_STATS_IN_MONTH_RANGE = f"""
+    SELECT {constants.COLUMN_MEMBER_ID}, SUM({constants.COLUMN_TOTAL_DURATION}) as total_duration
+    FROM {constants.TABLE_MEMBER_MONTHLY_STATS}
+    WHERE {_SQL_GUILD_FILTER}
+    AND {constants.COLUMN_MONTH_KEY} >= ? AND {constants.COLUMN_MONTH_KEY} < ?
+    GROUP BY {constants.COLUMN_MEMBER_ID}
 """
 
-# member_monthly_stats テーブルへの UPSERT (INSERT or UPDATE) クエリ
-# 指定された月とメンバーの組み合わせが存在する場合は total_duration を加算して更新
-# TODO: SQLクエリ構築の代替手段を検討 - f-stringを使用しているが、テーブル名/カラム名は定数由来のため直接的なSQLインジェクションリスクは低い。
-# より構造的なクエリビルダやライブラリの利用も検討可能。
-SQL_UPSERT_MEMBER_MONTHLY_STATS = f"""
-    INSERT INTO {constants.TABLE_MEMBER_MONTHLY_STATS} ({constants.COLUMN_MONTH_KEY}, {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_TOTAL_DURATION})
-    VALUES (?, ?, ?)
-    ON CONFLICT({constants.COLUMN_MONTH_KEY}, {constants.COLUMN_MEMBER_ID}) DO UPDATE SET
-    {constants.COLUMN_TOTAL_DURATION} = {constants.COLUMN_TOTAL_DURATION} + excluded.{constants.COLUMN_TOTAL_DURATION}
+# 指定されたギルド・期間 (日付の範囲) のセッション数と合計期間を日ごとの集計から取得するクエリ
+SQL_GET_SESSION_ROLLUP_TOTALS = f"""
+    SELECT SUM(session_count) AS session_count, SUM({constants.COLUMN_TOTAL_DURATION}) AS total_duration
+    FROM {constants.TABLE_DAILY_SESSION_ROLLUP}
+    WHERE {_SQL_GUILD_FILTER}
+    AND {constants.COLUMN_DAY} >= ? AND {constants.COLUMN_DAY} < ?
 """
 
-# user_mute_stats テーブルへの UPSERT (INSERT or UPDATE) クエリ
-# 指定されたユーザーIDが存在する場合は mute_count をインクリメントし、存在しない場合は新しいレコードを挿入
-SQL_UPSERT_MUTE_COUNT = f"""
-    INSERT INTO {constants.TABLE_USER_MUTE_STATS} ({constants.COLUMN_MEMBER_ID}, {constants.COLUMN_MUTE_COUNT})
-    VALUES (?, 1)
-    ON CONFLICT({constants.COLUMN_MEMBER_ID}) DO UPDATE SET
-    {constants.COLUMN_MUTE_COUNT} = {constants.COLUMN_MUTE_COUNT} + 1
+# 指定されたギルド・期間 (日付の範囲) の最長セッションを日ごとの集計から取得するクエリ
+SQL_GET_SESSION_ROLLUP_LONGEST = f"""
+    SELECT s.id, s.{constants.COLUMN_START_TIME}, s.duration
+    FROM {constants.TABLE_DAILY_SESSION_ROLLUP} r
+    JOIN {constants.TABLE_SESSIONS} s ON s.id = r.longest_session_id
+    WHERE r.{_SQL_GUILD_FILTER}
+    AND r.{constants.COLUMN_DAY} >= ? AND r.{constants.COLUMN_DAY} < ?
+    ORDER BY r.max_duration DESC, r.{constants.COLUMN_DAY}
+    LIMIT 1
 """
 
-# user_mute_stats テーブルから指定されたユーザーIDのミュート回数を取得するクエリ
-SQL_GET_MUTE_COUNT = f"""
-    SELECT {constants.COLUMN_MUTE_COUNT}
+
+def _year_range(year: str) -> tuple[str, str]:
+    """
+    年 (YYYY) を ISO 8601 文字列の半開区間 [開始, 終了) に変換します。
+    start_time や timestamp は UTC の ISO 8601 形式で保存されているため、文字列の大小比較で範囲検索できます。
+    """
+    year_int = int(year)
+    return f"{year_int:04d}-01-01", f"{year_int + 1:04d}-01-01"
+
+
+def _month_range(month_key: str) -> tuple[str, str]:
+    """月キー (YYYY-MM) を ISO 8601 文字列の半開区間 [開始, 終了) に変換します。"""
+    year_str, month_str = month_key.split("-")
+    year_int, month_int = int(year_str), int(month_str)
+    if not 1 <= month_int <= 12:
+        raise ValueError(f"Invalid month key: {month_key}")
+    if month_int == 12:
+        next_year, next_month = year_int + 1, 1
+    else:
+        next_year, next_month = year_int, month_int + 1
+    return (
+        f"{year_int:04d}-{month_int:02d}-01",
+        f"{next_year:04d}-{next_month:02d}-01",
+    )
+
+
+# user_mute_stats テーブルから指定されたギルドの累計のミュート回数の上位K件を取得するクエリ
+# (guild_id, mute_count DESC, member_id) のインデックスを順に読み、K件で打ち切る
+SQL_GET_TOP_TOTAL_MUTE_COUNTS = f"""
+    SELECT {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_MUTE_COUNT}
     FROM {constants.TABLE_USER_MUTE_STATS}
-    WHERE {constants.COLUMN_MEMBER_ID} = ?
+    WHERE {constants.COLUMN_GUILD_ID} = ?
+    ORDER BY {constants.COLUMN_MUTE_COUNT} DESC, {constants.COLUMN_MEMBER_ID}
+    LIMIT ?
 """
 
-# user_mute_stats テーブルから月ごとのミュート回数を取得するクエリ
-SQL_GET_MONTHLY_MUTE_COUNTS = f"""
-    SELECT
-        strftime('%Y-%m', start_time) AS month_key,
-        p.member_id,
-        COUNT(DISTINCT s.id) AS mute_count
-    FROM {constants.TABLE_SESSIONS} s
-    JOIN {constants.TABLE_SESSION_PARTICIPANTS} p ON s.id = p.session_id
-    WHERE strftime('%Y-%m', start_time) = ?
-    AND p.member_id IN (SELECT member_id FROM {constants.TABLE_USER_MUTE_STATS})
-    GROUP BY month_key, p.member_id
-    ORDER BY mute_count DESC
+# ギルドIDを持たない既存データがある場合の累計の上位K件 (メンバーごとに行をまとめる)
+SQL_GET_TOP_TOTAL_MUTE_COUNTS_UNATTRIBUTED = f"""
+    SELECT {constants.COLUMN_MEMBER_ID}, SUM({constants.COLUMN_MUTE_COUNT}) AS total
+    FROM {constants.TABLE_USER_MUTE_STATS}
+    WHERE {_SQL_GUILD_FILTER}
+    GROUP BY {constants.COLUMN_MEMBER_ID}
+    ORDER BY total DESC, {constants.COLUMN_MEMBER_ID}
+    LIMIT ?
 """
 
-# user_mute_stats テーブルから累計のミュート回数を取得するクエリ
-SQL_GET_TOTAL_MUTE_COUNTS = f"""
-    SELECT {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_MUTE_COUNT}
-    FROM {constants.TABLE_USER_MUTE_STATS}
-    ORDER BY {constants.COLUMN_MUTE_COUNT} DESC
+# 指定されたギルド・期間のミュート回数の上位K件を取得するクエリ
+SQL_GET_TOP_MONTHLY_MUTE_COUNTS = f"""
+    SELECT user_id, COUNT(*) AS mute_count
+    FROM mute_events
+    WHERE {_SQL_GUILD_FILTER} AND timestamp >= ? AND timestamp < ?
+    GROUP BY user_id
+    ORDER BY mute_count DESC, user_id
+    LIMIT ?
 """
 
 
-async def increment_mute_count(user_id: int):
+async def increment_mute_count(guild_id: int, user_id: int):
     """
-    指定されたユーザーのミュート回数をインクリメントし、ミュートイベントを記録します。
+    指定されたギルドでのユーザーのミュート回数をインクリメントし、ミュートイベントを記録します。
     ユーザーが存在しない場合は、新しいレコードを作成します。
     """
     try:
         async with DatabaseConnection() as conn:
             cursor = await conn.cursor()
             # user_mute_stats テーブルのミュートカウントをインクリメント
-            await cursor.execute(SQL_UPSERT_MUTE_COUNT, (user_id,))
+            await cursor.execute(SQL_UPSERT_MUTE_COUNT, (guild_id, user_id))
             logger.debug(
-                f"Incremented mute count in user_mute_stats for user {user_id}."
+                f"Incremented mute count in user_mute_stats for user {user_id} in guild {guild_id}."
             )
 
             # mute_events テーブルにイベントを記録
-            timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            now = datetime.datetime.now(datetime.timezone.utc)
+            timestamp = now.isoformat()
             await cursor.execute(
-                "INSERT INTO mute_events (user_id, timestamp) VALUES (?, ?)",
-                (user_id, timestamp),
+                f"INSERT INTO mute_events (user_id, timestamp, {constants.COLUMN_GUILD_ID}) VALUES (?, ?, ?)",
+                (user_id, timestamp, guild_id),
+            )
+            logger.info(
+                f"Recorded mute event for user {user_id} in guild {guild_id} at {timestamp}."
             )
-            logger.info(f"Recorded mute event for user {user_id} at {timestamp}.")
 
-            await conn.commit()
+            await _commit(conn)
+            _report_cache.invalidate_mute_stats(guild_id, now.strftime("%Y-%m"))
             logger.info(
                 f"Incremented mute count and recorded event for user {user_id}. Changes committed."
             )
@@ -419,30 +1698,21 @@ async def increment_mute_count(user_id: int):
         logger.error(
             f"An error occurred while incrementing mute count for user {user_id}: {e}"
         )
-        try:
-            async with DatabaseConnection() as conn_rollback:
-                await conn_rollback.rollback()
-                logger.warning(
-                    "Rolled back database changes due to error in increment_mute_count."
-                )
-        except Exception as rollback_e:
-            logger.error(
-                f"An error occurred during rollback in increment_mute_count: {rollback_e}"
-            )
+        # 未コミットの変更は DatabaseConnection の終了時にロールバック済み
         raise
 
 
-async def get_mute_count(user_id: int) -> int:
+async def get_mute_count(guild_id: int, user_id: int) -> int:
     """
-    指定されたユーザーのミュート回数を取得します。
+    指定されたギルドでのユーザーのミュート回数を取得します。
     ユーザーが存在しない場合は0を返します。
     """
     try:
-        async with DatabaseConnection() as conn:
+        async with DatabaseConnection(readonly=True) as conn:
             cursor = await conn.cursor()
-            await cursor.execute(SQL_GET_MUTE_COUNT, (user_id,))
+            await cursor.execute(SQL_GET_MUTE_COUNT, (guild_id, user_id))
             result = await cursor.fetchone()
-            if result:
+            if result and result[constants.COLUMN_MUTE_COUNT] is not None:
                 mute_count = result[constants.COLUMN_MUTE_COUNT]
                 logger.info(f"Fetched mute count for user {user_id}: {mute_count}")
                 return mute_count
@@ -458,37 +1728,49 @@ async def get_mute_count(user_id: int) -> int:
         return 0  # エラー発生時は0を返す
 
 
-async def get_monthly_mute_counts(month_key: str) -> list[tuple[int, int]]:
-    """指定された月のメンバー別ミュート回数を取得する。"""
-    async with aiosqlite.connect(DB_FILE) as db:
+async def get_monthly_mute_counts(
+    guild_id: int, month_key: str
+) -> list[tuple[int, int]]:
+    """指定されたギルド・月のメンバー別ミュート回数を取得する。"""
+    async with DatabaseConnection(readonly=True) as db:
         cursor = await db.execute(
-            """
-            SELECT user_id, COUNT(*)
-            FROM mute_events
-            WHERE STRFTIME('%Y-%m', timestamp) = ?
-            GROUP BY user_id
-            ORDER BY COUNT(*) DESC
-            """,
-            (month_key,),
+            SQL_GET_MONTHLY_MUTE_COUNTS, (guild_id, *_month_range(month_key))
         )
         rows = await cursor.fetchall()
         return [(row[0], row[1]) for row in rows]
 
 
-async def get_total_mute_counts() -> list[tuple[int, int]]:
-    """全メンバーの累計ミュート回数を取得する。"""
+async def get_top_members_by_mute_count(
+    guild_id: int, limit: int, month_key: str | None = None
+) -> list[tuple[int, int]]:
+    """
+    指定されたギルドでミュート回数の多い順に上位 limit 人の (メンバーID, 回数) を取得する。
+    month_key (YYYY-MM) を指定した場合はその月の回数、指定しない場合は累計の回数で並べる。
+    """
     try:
-        async with DatabaseConnection() as conn:
-            cursor = await conn.cursor()
-            await cursor.execute(SQL_GET_TOTAL_MUTE_COUNTS)
+        async with DatabaseConnection(readonly=True) as conn:
+            if month_key is not None:
+                cursor = await conn.execute(
+                    SQL_GET_TOP_MONTHLY_MUTE_COUNTS,
+                    (guild_id, *_month_range(month_key), limit),
+                )
+            elif _has_unattributed_mute_stats:
+                cursor = await conn.execute(
+                    SQL_GET_TOP_TOTAL_MUTE_COUNTS_UNATTRIBUTED, (guild_id, limit)
+                )
+            else:
+                cursor = await conn.execute(
+                    SQL_GET_TOP_TOTAL_MUTE_COUNTS, (guild_id, limit)
+                )
             results = await cursor.fetchall()
-            logger.info(f"Fetched total mute counts for {len(results)} users.")
-            return [
-                (row[constants.COLUMN_MEMBER_ID], row[constants.COLUMN_MUTE_COUNT])
-                for row in results
-            ]
+            logger.info(
+                f"Fetched top {len(results)} mute counts for guild {guild_id} (month: {month_key})."
+            )
+            return [(row[0], row[1]) for row in results]
     except Exception as e:
-        logger.error(f"An error occurred while fetching total mute counts: {e}")
+        logger.error(
+            f"An error occurred while fetching top mute counts for guild {guild_id} (month: {month_key}): {e}"
+        )
         return []
 
 
@@ -504,7 +1786,7 @@ async def add_active_muted_member(member_id: int):
                 "INSERT OR REPLACE INTO active_muted_members (member_id, muted_at) VALUES (?, ?)",
                 (member_id, timestamp),
             )
-            await conn.commit()
+            await _commit(conn)
             logger.debug(f"Added member {member_id} to active_muted_members in DB.")
     except Exception as e:
         logger.error(
@@ -522,7 +1804,7 @@ async def remove_active_muted_member(member_id: int):
             await cursor.execute(
                 "DELETE FROM active_muted_members WHERE member_id = ?", (member_id,)
             )
-            await conn.commit()
+            await _commit(conn)
             logger.debug(f"Removed member {member_id} from active_muted_members in DB.")
     except Exception as e:
         logger.error(
@@ -535,7 +1817,7 @@ async def get_all_active_muted_members() -> list[int]:
     現在寝落ちミュート状態として記録されているすべてのメンバーIDを取得します。
     """
     try:
-        async with DatabaseConnection() as conn:
+        async with DatabaseConnection(readonly=True) as conn:
             cursor = await conn.cursor()
             await cursor.execute("SELECT member_id FROM active_muted_members")
             results = await cursor.fetchall()
@@ -545,40 +1827,191 @@ async def get_all_active_muted_members() -> list[int]:
         return []
 
 
-async def get_participants_by_session_ids(session_ids: list):
+SQL_INSERT_ACTIVE_SESSION_SNAPSHOT = f"""
+    INSERT INTO {constants.TABLE_ACTIVE_SESSION_SNAPSHOTS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID}, session_start, {constants.COLUMN_SNAPSHOT_AT})
+    VALUES (?, ?, ?, ?)
+"""
+
+SQL_INSERT_ACTIVE_SESSION_SNAPSHOT_MEMBER = f"""
+    INSERT INTO {constants.TABLE_ACTIVE_SESSION_SNAPSHOT_MEMBERS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID}, {constants.COLUMN_MEMBER_ID}, join_time)
+    VALUES (?, ?, ?, ?)
+"""
+
+SQL_INSERT_CALL_SESSION_SNAPSHOT = f"""
+    INSERT INTO {constants.TABLE_CALL_SESSION_SNAPSHOTS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID}, {constants.COLUMN_START_TIME}, first_member_id, {constants.COLUMN_SNAPSHOT_AT})
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+SQL_GET_NOTIFICATION_CHANNELS = f"""
+    SELECT {constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID}
+    FROM {constants.TABLE_NOTIFICATION_CHANNELS}
+"""
+SQL_UPSERT_NOTIFICATION_CHANNEL = f"""
+    INSERT INTO {constants.TABLE_NOTIFICATION_CHANNELS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID})
+    VALUES (?, ?)
+    ON CONFLICT({constants.COLUMN_GUILD_ID}) DO UPDATE SET {constants.COLUMN_CHANNEL_ID} = excluded.{constants.COLUMN_CHANNEL_ID}
+"""
+
+SQL_INSERT_NOTIFICATION_CHANNEL_IF_ABSENT = f"""
+    INSERT INTO {constants.TABLE_NOTIFICATION_CHANNELS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID})
+    VALUES (?, ?)
+    ON CONFLICT({constants.COLUMN_GUILD_ID}) DO NOTHING
+"""
+
+SQL_GET_COMMAND_SYNC_FINGERPRINTS = f"""
+    SELECT {constants.COLUMN_GUILD_ID}, {constants.COLUMN_FINGERPRINT}
+    FROM {constants.TABLE_COMMAND_SYNC_FINGERPRINTS}
+"""
+SQL_UPSERT_COMMAND_SYNC_FINGERPRINT = f"""
+    INSERT INTO {constants.TABLE_COMMAND_SYNC_FINGERPRINTS} ({constants.COLUMN_GUILD_ID}, {constants.COLUMN_FINGERPRINT}, synced_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT({constants.COLUMN_GUILD_ID}) DO UPDATE SET
+        {constants.COLUMN_FINGERPRINT} = excluded.{constants.COLUMN_FINGERPRINT},
+        synced_at = excluded.synced_at
+"""
+
+_SESSION_SNAPSHOT_TABLES = (
+    constants.TABLE_ACTIVE_SESSION_SNAPSHOTS,
+    constants.TABLE_ACTIVE_SESSION_SNAPSHOT_MEMBERS,
+    constants.TABLE_CALL_SESSION_SNAPSHOTS,
+)
+
+
+def _shard_filter(shard_scope: tuple[list[int], int] | None) -> tuple[str, tuple]:
     """
-    指定されたセッションIDリストに含まれるセッションの参加者を取得し、セッションIDごとにグループ化して返します。
+    guild_id が指定されたシャードのギルドである行に絞り込む WHERE 句とパラメータを返します。
+    shard_scope が None の場合は全ての行を対象にします (空の WHERE 句)。
     """
-    if not session_ids:
-        return {}
-
+    if shard_scope is None:
+        return "", ()
+    shard_ids, shard_count = shard_scope
+    placeholders = ", ".join("?" for _ in shard_ids)
+    # シャードIDは (guild_id >> 22) % shard_count で決まる
+    return (
+        f" WHERE (({constants.COLUMN_GUILD_ID} >> 22) % ?) IN ({placeholders})",
+        (shard_count, *shard_ids),
+    )
+
+
+async def save_session_snapshot(
+    sessions: list,
+    members: list,
+    calls: list,
+    snapshot_at: str,
+    shard_scope: tuple[list[int], int] | None = None,
+) -> bool:
+    """
+    進行中の通話セッションのスナップショットを保存します。
+    以前のスナップショットは1つのトランザクション内で置き換えられるため、途中でクラッシュしても前回の状態が残ります。
+    shard_scope を指定した場合は、そのシャードのギルドのスナップショットだけを置き換えます
+    (他のプロセスが担当するシャードのスナップショットは残す)。
+
+    Args:
+        sessions: (guild_id, channel_id, session_start) のリスト。
+        members: (guild_id, channel_id, member_id, join_time または None) のリスト。
+        calls: (guild_id, channel_id, start_time, first_member_id) のリスト。
+        snapshot_at: スナップショットの時刻 (ISO 8601 形式)。
+        shard_scope: (シャードIDのリスト, シャード数)。None の場合は全てのギルドが対象。
+
+    Returns:
+        保存に成功した場合は True。
+    """
+    where, params = _shard_filter(shard_scope)
     try:
         async with DatabaseConnection() as conn:
-            cursor = await conn.cursor()
+            for table in _SESSION_SNAPSHOT_TABLES:
+                await conn.execute(f"DELETE FROM {table}{where}", params)
+            await conn.executemany(
+                SQL_INSERT_ACTIVE_SESSION_SNAPSHOT,
+                [(*row, snapshot_at) for row in sessions],
+            )
+            await conn.executemany(SQL_INSERT_ACTIVE_SESSION_SNAPSHOT_MEMBER, members)
+            await conn.executemany(
+                SQL_INSERT_CALL_SESSION_SNAPSHOT,
+                [(*row, snapshot_at) for row in calls],
+            )
+            await _commit(conn)
+        logger.debug(
+            f"Saved session snapshot: {len(sessions)} sessions, {len(members)} participants, {len(calls)} calls."
+        )
+        return True
+    except Exception as e:
+        logger.error(f"An error occurred while saving session snapshot: {e}")
+        return False
 
-            # 全セッションの参加者を一度に取得
-            placeholders = ",".join("?" for _ in session_ids)
-            # TODO: SQLクエリ構築の代替手段を検討 - f-stringを使用しているが、テーブル名/カラム名は定数由来のため直接的なSQLインジェクションリスクは低い。
-            # より構造的なクエリビルダやライブラリの利用も検討可能。
-            await cursor.execute(
-                f"""
-                SELECT session_id, member_id FROM session_participants
-                WHERE session_id IN ({placeholders})
-            """,
-                session_ids,
+
+async def load_session_snapshot(
+    shard_scope: tuple[list[int], int] | None = None,
+) -> dict:
+    """
+    保存されている通話セッションのスナップショットを読み込みます。
+    shard_scope (シャードIDのリスト, シャード数) を指定した場合は、そのシャードのギルドのスナップショットだけを読み込みます。
+
+    Returns:
+        {"sessions": [(guild_id, channel_id, session_start, snapshot_at)],
+         "members": [(guild_id, channel_id, member_id, join_time)],
+         "calls": [(guild_id, channel_id, start_time, first_member_id, snapshot_at)]}
+        エラー時は空のリストを持つ辞書を返します。
+    """
+    snapshot: dict = {"sessions": [], "members": [], "calls": []}
+    where, params = _shard_filter(shard_scope)
+    try:
+        async with DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.execute(
+                f"SELECT {constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID}, session_start, {constants.COLUMN_SNAPSHOT_AT} FROM {constants.TABLE_ACTIVE_SESSION_SNAPSHOTS}{where}",
+                params,
+            )
+            snapshot["sessions"] = [tuple(row) for row in await cursor.fetchall()]
+            cursor = await conn.execute(
+                f"SELECT {constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID}, {constants.COLUMN_MEMBER_ID}, join_time FROM {constants.TABLE_ACTIVE_SESSION_SNAPSHOT_MEMBERS}{where}",
+                params,
+            )
+            snapshot["members"] = [tuple(row) for row in await cursor.fetchall()]
+            cursor = await conn.execute(
+                f"SELECT {constants.COLUMN_GUILD_ID}, {constants.COLUMN_CHANNEL_ID}, {constants.COLUMN_START_TIME}, first_member_id, {constants.COLUMN_SNAPSHOT_AT} FROM {constants.TABLE_CALL_SESSION_SNAPSHOTS}{where}",
+                params,
             )
-            all_participants_data = await cursor.fetchall()
+            snapshot["calls"] = [tuple(row) for row in await cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"An error occurred while loading session snapshot: {e}")
+        return {"sessions": [], "members": [], "calls": []}
+    return snapshot
+
+
+async def _fetch_participants_map(conn, session_ids: list) -> dict[int, list[int]]:
+    """
+    指定されたセッションの参加者を取得し、セッションIDごとにグループ化して返します。
+    IN 句の変数の数が SQLite の上限を超えないよう、SESSION_PARTICIPANTS_CHUNK_SIZE 件ずつ問い合わせます。
+    """
+    session_participants_map: dict[int, list[int]] = {}
+    chunk_size = constants.SESSION_PARTICIPANTS_CHUNK_SIZE
+    for i in range(0, len(session_ids), chunk_size):
+        chunk = session_ids[i : i + chunk_size]
+        placeholders = ",".join("?" for _ in chunk)
+        # TODO: SQLクエリ構築の代替手段を検討 - f-stringを使用しているが、テーブル名/カラム名は定数由来のため直接的なSQLインジェクションリスクは低い。
+        # より構造的なクエリビルダやライブラリの利用も検討可能。
+        cursor = await conn.execute(
+            f"""
+            SELECT {constants.COLUMN_SESSION_ID}, {constants.COLUMN_MEMBER_ID} FROM {constants.TABLE_SESSION_PARTICIPANTS}
+            WHERE {constants.COLUMN_SESSION_ID} IN ({placeholders})
+        """,
+            chunk,
+        )
+        for session_id, member_id in await cursor.fetchall():
+            session_participants_map.setdefault(session_id, []).append(member_id)
+    return session_participants_map
 
-            # セッションIDごとに参加者をグループ化
-            session_participants_map: dict[int, list[int]] = {}
 
-            for participant_row in all_participants_data:
-                session_id = participant_row["session_id"]
-                member_id = participant_row["member_id"]
-                if session_id not in session_participants_map:
-                    session_participants_map[session_id] = []
-                session_participants_map[session_id].append(member_id)
+async def get_participants_by_session_ids(session_ids: list):
+    """
+    指定されたセッションIDリストに含まれるセッションの参加者を取得し、セッションIDごとにグループ化して返します。
+    """
+    if not session_ids:
+        return {}
 
+    try:
+        async with DatabaseConnection(readonly=True) as conn:
+            session_participants_map = await _fetch_participants_map(conn, session_ids)
             logger.debug(f"Fetched participants for {len(session_ids)} sessions.")
             return session_participants_map
     except Exception as e:
@@ -594,7 +2027,8 @@ async def get_total_call_time(member_id):
     通話履歴がない場合はデフォルト値 (0) を返します。
     """
     try:
-        async with DatabaseConnection() as conn:
+        # ライトビハインドバッファのフラッシュと直列化し、未反映の通話時間も加算する
+        async with _write_buffer.lock, DatabaseConnection(readonly=True) as conn:
             cursor = await conn.cursor()
             logger.debug(f"Fetching total call time for member {member_id}.")
             await cursor.execute(SQL_GET_TOTAL_CALL_TIME, (member_id,))
@@ -605,6 +2039,7 @@ async def get_total_call_time(member_id):
                 if result and result["total"] is not None
                 else constants.DEFAULT_TOTAL_DURATION
             )
+            total_time += _write_buffer.pending_totals().get(member_id, 0)
             logger.debug(f"Total call time for member {member_id}: {total_time}")
             return total_time
     except Exception as e:
@@ -614,201 +2049,282 @@ async def get_total_call_time(member_id):
         return constants.DEFAULT_TOTAL_DURATION  # エラー発生時はデフォルト値を返す
 
 
-async def get_monthly_voice_sessions(month_key: str):
-    """
-    指定された月の全セッションと参加者を取得します。
-    """
+async def _fetch_sessions(query: str, params: tuple, description: str) -> list[dict]:
+    """セッションを取得するクエリを実行し、各セッションに参加者を結合して返します。"""
     try:
-        async with DatabaseConnection() as conn:
-            cursor = await conn.cursor()
-
-            # 指定された月の全セッションを取得
-            await cursor.execute(
-                """
-                SELECT start_time, duration, id FROM sessions
-                WHERE month_key = ?
-            """,
-                (month_key,),
-            )
+        async with DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.execute(query, params)
             sessions_data = await cursor.fetchall()
-            logger.debug(f"Found {len(sessions_data)} sessions for month {month_key}")
-
-            sessions = []
-            session_ids = [session_row["id"] for session_row in sessions_data]
-
+            logger.debug(f"Found {len(sessions_data)} sessions for {description}")
             # 取得したセッションに参加したメンバーをまとめて取得し、セッションIDごとにグループ化
-            if session_ids:
-                placeholders = ",".join("?" for _ in session_ids)
-                await cursor.execute(
-                    f"""
-                    SELECT session_id, member_id FROM session_participants
-                    WHERE session_id IN ({placeholders})
-                """,
-                    session_ids,
-                )
-                all_participants_data = await cursor.fetchall()
-
-                session_participants_map: dict[int, list[int]] = {}
-
-                for participant_row in all_participants_data:
-                    session_id = participant_row["session_id"]
-                    member_id = participant_row["member_id"]
-                    if session_id not in session_participants_map:
-                        session_participants_map[session_id] = []
-                    session_participants_map[session_id].append(member_id)
-
-                # セッションデータにメンバー情報を結合
-                for session_row in sessions_data:
-                    sessions.append(
-                        {
-                            "id": session_row["id"],
-                            "start_time": session_row["start_time"],
-                            "duration": session_row["duration"],
-                            "participants": session_participants_map.get(
-                                session_row["id"], []
-                            ),
-                        }
-                    )
-            logger.debug(
-                f"Prepared {len(sessions)} sessions with participants for month {month_key}"
+            participants_map = await _fetch_participants_map(
+                conn, [row["id"] for row in sessions_data]
             )
-            return sessions
+            return [
+                {
+                    "id": row["id"],
+                    "start_time": row["start_time"],
+                    "duration": row["duration"],
+                    "participants": participants_map.get(row["id"], []),
+                }
+                for row in sessions_data
+            ]
     except Exception as e:
         logger.error(
-            f"An error occurred while fetching monthly voice sessions for month {month_key}: {e}"
+            f"An error occurred while fetching voice sessions for {description}: {e}"
         )
         return []  # エラー発生時は空のリストを返す
 
 
-async def get_monthly_member_stats(month_key: str):
+async def get_monthly_voice_sessions(guild_id: int, month_key: str):
+    """
+    指定されたギルド・月の全セッションと参加者を取得します。
+    """
+    return await _fetch_sessions(
+        SQL_GET_MONTHLY_SESSIONS,
+        (guild_id, month_key),
+        f"guild {guild_id}, month {month_key}",
+    )
+
+
+async def get_monthly_member_stats(guild_id: int, month_key: str):
     """
-    指定された月のメンバー別累計通話時間を取得します。
+    指定されたギルド・月のメンバー別累計通話時間を取得します。
     """
     try:
-        async with DatabaseConnection() as conn:
+        async with DatabaseConnection(readonly=True) as conn:
             cursor = await conn.cursor()
-            # 指定された月のメンバー別累計通話時間を取得
-            await cursor.execute(
-                """
-                SELECT member_id, total_duration FROM member_monthly_stats
-                WHERE month_key = ?
-            """,
-                (month_key,),
-            )
+            # 指定されたギルド・月のメンバー別累計通話時間を取得
+            await cursor.execute(SQL_GET_MONTHLY_MEMBER_STATS, (guild_id, month_key))
             member_stats_data = await cursor.fetchall()
             # メンバーIDをキーとした辞書に変換
             member_stats = {
                 m["member_id"]: m["total_duration"] for m in member_stats_data
             }
             logger.debug(
-                f"Found stats for {len(member_stats)} members for month {month_key}"
+                f"Found stats for {len(member_stats)} members for guild {guild_id}, month {month_key}"
             )
             return member_stats
     except Exception as e:
         logger.error(
-            f"An error occurred while fetching monthly member stats for month {month_key}: {e}"
+            f"An error occurred while fetching monthly member stats for guild {guild_id}, month {month_key}: {e}"
         )
         return {}  # エラー発生時は空の辞書を返す
 
 
-async def get_annual_voice_sessions(year: str):
+async def get_annual_voice_sessions(guild_id: int, year: str):
+    """
+    指定されたギルド・年度の全セッションと参加者を取得します。
+    """
+    return await _fetch_sessions(
+        SQL_GET_SESSIONS_IN_RANGE,
+        (guild_id, *_year_range(year)),
+        f"guild {guild_id}, year {year}",
+    )
+
+
+async def get_annual_member_total_stats(guild_id: int, year: str):
     """
-    指定された年度の全セッションと参加者を取得します。
+    指定されたギルド・年度のメンバー別累計通話時間を取得します。
     """
     try:
-        async with DatabaseConnection() as conn:
+        async with DatabaseConnection(readonly=True) as conn:
             cursor = await conn.cursor()
-
-            # 対象年度の全セッションを取得
+            # 対象年度のメンバー別累計時間を全て取得
+            year_int = int(year)
             await cursor.execute(
-                """
-                SELECT start_time, duration, id FROM sessions
-                WHERE strftime('%Y', start_time) = ?
-            """,
-                (year,),
+                SQL_GET_MEMBER_TOTAL_STATS_IN_MONTH_RANGE,
+                (guild_id, f"{year_int:04d}-01", f"{year_int + 1:04d}-01"),
             )
-            sessions_data = await cursor.fetchall()
-            logger.debug(f"Found {len(sessions_data)} sessions for year {year}")
-
-            sessions_all = []
-            session_ids = [session_row["id"] for session_row in sessions_data]
-
-            if session_ids:
-                # 全セッションの参加者を一度に取得
-                placeholders = ",".join("?" for _ in session_ids)
-                await cursor.execute(
-                    f"""
-                    SELECT session_id, member_id FROM session_participants
-                    WHERE session_id IN ({placeholders})
-                """,
-                    session_ids,
+            members_total_data = await cursor.fetchall()
+            # メンバーIDをキーとした辞書に変換
+            members_total = {
+                m["member_id"]: m["total_duration"] for m in members_total_data
+            }
+            logger.debug(
+                f"Found stats for {len(members_total)} members for guild {guild_id}, year {year}"
+            )
+            return members_total
+    except Exception as e:
+        logger.error(
+            f"An error occurred while fetching annual member total stats for guild {guild_id}, year {year}: {e}"
+        )
+        return {}  # エラー発生時は空の辞書を返す
+
+
+async def get_session_summary(guild_id: int, start_day: str, end_day: str):
+    """
+    指定されたギルド・期間 (start_day <= 日付 < end_day、YYYY-MM-DD 形式) のセッションの集計を
+    日ごとの集計テーブルから取得します。
+    戻り値は session_count, total_duration, longest (最長セッションの id, start_time, duration を持つ辞書、ない場合は None) を持つ辞書です。
+    """
+    summary: dict = {
+        "session_count": 0,
+        "total_duration": constants.DEFAULT_TOTAL_DURATION,
+        "longest": None,
+    }
+    try:
+        async with DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.cursor()
+            params = (guild_id, start_day, end_day)
+            await cursor.execute(SQL_GET_SESSION_ROLLUP_TOTALS, params)
+            totals = await cursor.fetchone()
+            if not totals or not totals["session_count"]:
+                logger.debug(
+                    f"No sessions found for guild {guild_id} between {start_day} and {end_day}"
                 )
-                all_participants_data = await cursor.fetchall()
-
-                # セッションIDごとに参加者をグループ化
-                session_participants_map: dict[int, list[int]] = {}
-
-                for participant_row in all_participants_data:
-                    session_id = participant_row["session_id"]
-                    member_id = participant_row["member_id"]
-                    if session_id not in session_participants_map:
-                        session_participants_map[session_id] = []
-                    session_participants_map[session_id].append(member_id)
-
-                # セッションデータにメンバー情報を結合
-                for session_row in sessions_data:
-                    sessions_all.append(
-                        {
-                            "id": session_row["id"],
-                            "start_time": session_row["start_time"],
-                            "duration": session_row["duration"],
-                            "participants": session_participants_map.get(
-                                session_row["id"], []
-                            ),
-                        }
-                    )
+                return summary
+            summary["session_count"] = totals["session_count"]
+            summary["total_duration"] = totals["total_duration"]
+
+            await cursor.execute(SQL_GET_SESSION_ROLLUP_LONGEST, params)
+            longest = await cursor.fetchone()
+            if longest:
+                summary["longest"] = {
+                    "id": longest["id"],
+                    "start_time": longest["start_time"],
+                    "duration": longest["duration"],
+                }
             logger.debug(
-                f"Prepared {len(sessions_all)} sessions with participants for year {year}"
+                f"Fetched session summary for guild {guild_id} between {start_day} and {end_day}: {summary}"
             )
-            return sessions_all
+            return summary
     except Exception as e:
         logger.error(
-            f"An error occurred while fetching annual voice sessions for year {year}: {e}"
+            f"An error occurred while fetching session summary for guild {guild_id} between {start_day} and {end_day}: {e}"
+        )
+        return summary  # エラー発生時はセッションなしの集計を返す
+
+
+async def get_monthly_session_summary(guild_id: int, month_key: str):
+    """指定されたギルド・月のセッションの集計を取得します。"""
+    return await get_session_summary(guild_id, *_month_range(month_key))
+
+
+async def get_annual_session_summary(guild_id: int, year: str):
+    """指定されたギルド・年度のセッションの集計を取得します。"""
+    return await get_session_summary(guild_id, *_year_range(year))
+
+
+def _build_call_time_ranking_sql(table: str, period_filter: str) -> dict[str, str]:
+    """
+    通話時間ランキング用のクエリを作成します。
+    period_filter は期間で絞り込む条件 (例: "AND month_key = ?") で、ギルドIDのパラメータの直後に期間のパラメータを渡します。
+    "_unattributed" が付くクエリはギルドIDを持たない既存データも合計に含めます (メンバーごとに行をまとめるため、インデックスだけでは並べられない)。
+    """
+    grouped = f"""
+        SELECT {constants.COLUMN_MEMBER_ID}, SUM({constants.COLUMN_TOTAL_DURATION}) AS total
+        FROM {table}
+        WHERE {_SQL_GUILD_FILTER} {period_filter}
+        GROUP BY {constants.COLUMN_MEMBER_ID}
+    """
+    return {
+        # 上位K件: (guild_id, [期間,] limit)
+        "top": f"""
+            SELECT {constants.COLUMN_MEMBER_ID}, {constants.COLUMN_TOTAL_DURATION} AS total
+            FROM {table}
+            WHERE {constants.COLUMN_GUILD_ID} = ? {period_filter}
+            ORDER BY {constants.COLUMN_TOTAL_DURATION} DESC, {constants.COLUMN_MEMBER_ID}
+            LIMIT ?
+        """,
+        "top_unattributed": f"{grouped} ORDER BY total DESC, {constants.COLUMN_MEMBER_ID} LIMIT ?",
+        # メンバーの通話時間: (guild_id, [期間,] member_id)
+        "member": f"""
+            SELECT {constants.COLUMN_TOTAL_DURATION} AS total
+            FROM {table}
+            WHERE {constants.COLUMN_GUILD_ID} = ? {period_filter} AND {constants.COLUMN_MEMBER_ID} = ?
+        """,
+        "member_unattributed": f"""
+            SELECT SUM({constants.COLUMN_TOTAL_DURATION}) AS total
+            FROM {table}
+            WHERE {_SQL_GUILD_FILTER} {period_filter} AND {constants.COLUMN_MEMBER_ID} = ?
+        """,
+        # 指定された通話時間より多いメンバーの数: (guild_id, [期間,] total)
+        "above": f"""
+            SELECT COUNT(*)
+            FROM {table}
+            WHERE {constants.COLUMN_GUILD_ID} = ? {period_filter} AND {constants.COLUMN_TOTAL_DURATION} > ?
+        """,
+        "above_unattributed": f"SELECT COUNT(*) FROM ({grouped}) WHERE total > ?",
+    }
+
+
+SQL_MONTHLY_CALL_TIME_RANKING = _build_call_time_ranking_sql(
+    constants.TABLE_MEMBER_MONTHLY_STATS, f"AND {constants.COLUMN_MONTH_KEY} = ?"
+)
+SQL_TOTAL_CALL_TIME_RANKING = _build_call_time_ranking_sql(
+    constants.TABLE_MEMBER_GUILD_LIFETIME_STATS, ""
+)
+
+
+def _call_time_ranking_query(
+    name: str, guild_id: int, month_key: str | None, *params
+) -> tuple[str, tuple]:
+    """期間とギルドIDを持たない既存データの有無に応じて、ランキングのクエリとパラメータを選びます。"""
+    period_params: tuple
+    if month_key is None:
+        queries, period_params = SQL_TOTAL_CALL_TIME_RANKING, ()
+    else:
+        queries, period_params = SQL_MONTHLY_CALL_TIME_RANKING, (month_key,)
+    if _has_unattributed_stats:
+        name += "_unattributed"
+    return queries[name], (guild_id, *period_params, *params)
+
+
+async def get_top_members_by_call_time(
+    guild_id: int, limit: int, month_key: str | None = None
+) -> list[tuple[int, int]]:
+    """
+    指定されたギルドで通話時間の多い順に上位 limit 人の (メンバーID, 通話時間) を取得します。
+    month_key (YYYY-MM) を指定した場合はその月の通話時間、指定しない場合はギルドでの累計通話時間で並べます。
+    """
+    try:
+        async with DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.execute(
+                *_call_time_ranking_query("top", guild_id, month_key, limit)
+            )
+            results = await cursor.fetchall()
+            logger.debug(
+                f"Fetched top {len(results)} members by call time for guild {guild_id} (month: {month_key})."
+            )
+            return [(row[0], row[1]) for row in results]
+    except Exception as e:
+        logger.error(
+            f"An error occurred while fetching top members by call time for guild {guild_id} (month: {month_key}): {e}"
         )
         return []  # エラー発生時は空のリストを返す
 
 
-async def get_annual_member_total_stats(year: str):
+async def get_member_call_time_rank(
+    guild_id: int, member_id: int, month_key: str | None = None
+) -> tuple[int | None, int]:
     """
-    指定された年度のメンバー別累計通話時間を取得します。
+    指定されたギルドでのメンバーの通話時間ランキングの順位と通話時間を返します。
+    順位は自分より通話時間の多いメンバーの数 + 1 で、ランキング全体は取得しません。
+    通話時間がない場合は (None, 0) を返します。
     """
     try:
-        async with DatabaseConnection() as conn:
-            cursor = await conn.cursor()
-            # 対象年度のメンバー別累計時間を全て取得
-            await cursor.execute(
-                """
-                SELECT member_id, SUM(total_duration) as total_duration
-                FROM member_monthly_stats
-                WHERE substr(month_key, 1, 4) = ?
-                GROUP BY member_id
-            """,
-                (year,),
+        async with DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.execute(
+                *_call_time_ranking_query("member", guild_id, month_key, member_id)
             )
-            members_total_data = await cursor.fetchall()
-            # メンバーIDをキーとした辞書に変換
-            members_total = {
-                m["member_id"]: m["total_duration"] for m in members_total_data
-            }
+            row = await cursor.fetchone()
+            total = row[0] if row and row[0] else 0
+            if not total:
+                return None, 0
+            cursor = await conn.execute(
+                *_call_time_ranking_query("above", guild_id, month_key, total)
+            )
+            above = (await cursor.fetchone())[0]
             logger.debug(
-                f"Found stats for {len(members_total)} members for year {year}"
+                f"Member {member_id} is ranked {above + 1} in guild {guild_id} (month: {month_key}) with {total} seconds."
             )
-            return members_total
+            return above + 1, total
     except Exception as e:
         logger.error(
-            f"An error occurred while fetching annual member total stats for year {year}: {e}"
+            f"An error occurred while fetching call time rank for member {member_id} in guild {guild_id} (month: {month_key}): {e}"
         )
-        return {}  # エラー発生時は空の辞書を返す
+        return None, 0
 
 
 async def get_total_call_time_for_guild_members(member_ids: list):
@@ -819,7 +2335,8 @@ async def get_total_call_time_for_guild_members(member_ids: list):
         return {}
 
     try:
-        async with DatabaseConnection() as conn:
+        # ライトビハインドバッファのフラッシュと直列化し、未反映の通話時間も加算する
+        async with _write_buffer.lock, DatabaseConnection(readonly=True) as conn:
             cursor = await conn.cursor()
             logger.debug(f"Fetching total call time for {len(member_ids)} members.")
 
@@ -829,10 +2346,9 @@ async def get_total_call_time_for_guild_members(member_ids: list):
             # より構造的なクエリビルダやライブラリの利用も検討可能。
             await cursor.execute(
                 f"""
-                SELECT member_id, SUM({constants.COLUMN_TOTAL_DURATION}) as total
-                FROM {constants.TABLE_MEMBER_MONTHLY_STATS}
+                SELECT member_id, {constants.COLUMN_TOTAL_DURATION} as total
+                FROM {constants.TABLE_MEMBER_LIFETIME_STATS}
                 WHERE {constants.COLUMN_MEMBER_ID} IN ({placeholders})
-                GROUP BY {constants.COLUMN_MEMBER_ID}
             """,
                 member_ids,
             )
@@ -842,9 +2358,11 @@ async def get_total_call_time_for_guild_members(member_ids: list):
             member_call_times = {row["member_id"]: row["total"] for row in results}
 
             # 通話時間が0のメンバーも結果に含める（辞書に存在しない場合は0とする）
+            pending_totals = _write_buffer.pending_totals()
             for member_id in member_ids:
-                if member_id not in member_call_times:
-                    member_call_times[member_id] = constants.DEFAULT_TOTAL_DURATION
+                member_call_times[member_id] = member_call_times.get(
+                    member_id, constants.DEFAULT_TOTAL_DURATION
+                ) + pending_totals.get(member_id, 0)
 
             logger.debug(
                 f"Fetched total call times for {len(member_call_times)} members."
@@ -857,40 +2375,207 @@ async def get_total_call_time_for_guild_members(member_ids: list):
         return {}  # エラー発生時は空の辞書を返す
 
 
+# ギルド設定のプロセス内キャッシュ
+# 起動時に settings テーブルから読み込み、update_guild_settings で書き込みと同時に更新する (ライトスルー)
+# 件数の上限を超えた場合は最も長く使われていないギルドから破棄し (LRU)、念のため一定時間で期限切れにする
+class GuildSettingsCache:
+    def __init__(
+        self,
+        max_size: int = constants.GUILD_SETTINGS_CACHE_MAX_SIZE,
+        ttl_seconds: float = constants.GUILD_SETTINGS_CACHE_TTL_SECONDS,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # guild_id (str) -> (期限, 設定の辞書)
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        # 設定の書き込み (ライトスルー) や破棄が行われるたびに増える世代番号
+        # 読み込み中に設定が更新された場合、古い読み込み結果で上書きしないために使う
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, guild_id) -> dict | None:
+        key = str(guild_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # 呼び出し元が変更してもキャッシュに影響しないようにコピーを返す
+        return dict(entry[1])
+
+    def put(self, guild_id, settings: dict, generation: int | None = None):
+        """
+        設定をキャッシュします。generation を指定しない場合は設定の書き込みとみなし、世代番号を進めます。
+        データベースから読み込んだ結果は、読み込みを始めた時点の世代番号 (generation) を指定します。
+        その後に書き込みや破棄が行われていた場合は、読み込み結果が古い可能性があるためキャッシュしません。
+        """
+        if generation is None:
+            self.generation += 1
+        elif generation != self.generation:
+            logger.debug(
+                f"Settings for guild {guild_id} were updated while loading. Not caching."
+            )
+            return
+        key = str(guild_id)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(settings))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, guild_id):
+        self.generation += 1
+        self._entries.pop(str(guild_id), None)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """キャッシュの件数とヒット率を返します。"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_settings_cache = GuildSettingsCache()
+
+
+def get_settings_cache_stats() -> dict:
+    """ギルド設定キャッシュのヒット率を返します。"""
+    return _settings_cache.get_stats()
+
+
+def _default_guild_settings(guild_id) -> dict:
+    # 設定がない場合のデフォルト値 (単位:分)
+    return {
+        constants.COLUMN_GUILD_ID: str(guild_id),
+        constants.COLUMN_LONELY_TIMEOUT_MINUTES: constants.DEFAULT_LONELY_TIMEOUT_MINUTES,
+        constants.COLUMN_REACTION_WAIT_MINUTES: constants.DEFAULT_REACTION_WAIT_MINUTES,
+    }
+
+
+async def load_guild_settings_cache() -> int:
+    """
+    settings テーブルの内容をギルド設定キャッシュに読み込みます。起動時に呼び出されます。
+    読み込んだギルドの数を返します。
+    """
+    try:
+        async with DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.execute(
+                f"SELECT * FROM {constants.TABLE_SETTINGS} LIMIT ?",
+                (_settings_cache.max_size,),
+            )
+            rows = await cursor.fetchall()
+        for row in rows:
+            _settings_cache.put(row[constants.COLUMN_GUILD_ID], dict(row))
+        logger.info(f"Loaded settings for {len(rows)} guilds into settings cache.")
+        return len(rows)
+    except Exception as e:
+        logger.error(f"An error occurred while loading guild settings cache: {e}")
+        return 0
+
+
 async def get_guild_settings(guild_id):
     """
-    指定されたギルドの設定情報をデータベースから取得します。
+    指定されたギルドの設定情報を取得します。
+    ギルド設定キャッシュにあればデータベースにはアクセスせず、なければデータベースから取得してキャッシュします。
     設定が存在しない場合はデフォルト値を返します。
     """
+    cached = _settings_cache.get(guild_id)
+    if cached is not None:
+        return cached
+    # 読み込み中に update_guild_settings で書き込まれた設定を古い値で上書きしないよう、世代番号を記録する
+    generation = _settings_cache.generation
     try:
-        async with DatabaseConnection() as conn:
+        async with DatabaseConnection(readonly=True) as conn:
             cursor = await conn.cursor()
             logger.debug(f"Fetching settings for guild {guild_id}.")
             await cursor.execute(SQL_GET_GUILD_SETTINGS, (str(guild_id),))
-            settings = await cursor.fetchone()
-            if settings:
-                logger.debug(f"Settings found for guild {guild_id}: {dict(settings)}")
-                return settings
+            row = await cursor.fetchone()
+            if row:
+                settings = dict(row)
+                logger.debug(f"Settings found for guild {guild_id}: {settings}")
             else:
                 logger.debug(
                     f"Settings not found for guild {guild_id}. Returning default values."
                 )
-                # 設定がない場合はデフォルト値を返す (単位:分)
-                return {
-                    constants.COLUMN_GUILD_ID: str(guild_id),
-                    constants.COLUMN_LONELY_TIMEOUT_MINUTES: constants.DEFAULT_LONELY_TIMEOUT_MINUTES,
-                    constants.COLUMN_REACTION_WAIT_MINUTES: constants.DEFAULT_REACTION_WAIT_MINUTES,
-                }
+                settings = _default_guild_settings(guild_id)
+            # 設定がないギルドもデフォルト値をキャッシュする (更新時にライトスルーで置き換わる)
+            _settings_cache.put(guild_id, settings, generation)
+            return dict(settings)
     except Exception as e:
         logger.error(
             f"An error occurred while fetching settings for guild {guild_id}: {e}"
         )
-        # エラー発生時はデフォルト値を返す
-        return {
-            constants.COLUMN_GUILD_ID: str(guild_id),
-            constants.COLUMN_LONELY_TIMEOUT_MINUTES: constants.DEFAULT_LONELY_TIMEOUT_MINUTES,
-            constants.COLUMN_REACTION_WAIT_MINUTES: constants.DEFAULT_REACTION_WAIT_MINUTES,
-        }
+        # エラー発生時はデフォルト値を返す (キャッシュはしない)
+        return _default_guild_settings(guild_id)
+
+
+async def set_notification_channel(guild_id: int, channel_id: int) -> bool:
+    """
+    指定されたギルドの通知チャンネルを notification_channels テーブルに保存し、
+    コミットが成功したら config のメモリ上の辞書も更新します。成功した場合は True を返します。
+    """
+    try:
+        async with DatabaseConnection() as conn:
+            await conn.execute(SQL_UPSERT_NOTIFICATION_CHANNEL, (guild_id, channel_id))
+            await _commit(conn)
+    except Exception as e:
+        logger.error(
+            f"An error occurred while saving notification channel for guild {guild_id}: {e}"
+        )
+        return False
+    config.set_notification_channel_id(guild_id, channel_id)
+    return True
+
+
+async def get_command_sync_fingerprints() -> dict[int, str]:
+    """
+    ギルドごとに最後に同期したスラッシュコマンドのツリーのフィンガープリントを返します。
+    エラーが発生した場合は空の辞書を返します (全てのギルドが同期される)。
+    """
+    try:
+        async with DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.cursor()
+            await cursor.execute(SQL_GET_COMMAND_SYNC_FINGERPRINTS)
+            return {row[0]: row[1] for row in await cursor.fetchall()}
+    except Exception as e:
+        logger.error(f"An error occurred while fetching command sync fingerprints: {e}")
+        return {}
+
+
+async def set_command_sync_fingerprints(fingerprints: dict[int, str]) -> bool:
+    """
+    同期したギルドのスラッシュコマンドのツリーのフィンガープリントをまとめて保存します。成功した場合は True を返します。
+    """
+    if not fingerprints:
+        return True
+    synced_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    try:
+        async with DatabaseConnection() as conn:
+            await conn.executemany(
+                SQL_UPSERT_COMMAND_SYNC_FINGERPRINT,
+                [
+                    (guild_id, fingerprint, synced_at)
+                    for guild_id, fingerprint in fingerprints.items()
+                ],
+            )
+            await _commit(conn)
+        return True
+    except Exception as e:
+        logger.error(f"An error occurred while saving command sync fingerprints: {e}")
+        return False
 
 
 async def update_guild_settings(
@@ -908,11 +2593,7 @@ async def update_guild_settings(
             )
 
             # 現在の設定を取得して、更新されないパラメータのデフォルト値を決定
-            # update_guild_settings内で確立した接続をget_guild_settingsに渡すことで
-            # データベース接続の効率化を目指したが、接続のライフサイクル管理の問題から
-            # Connection closedエラーが発生した。
-            # 今後の改善策として、get_guild_settingsが必須で接続を受け取るようにし、
-            # 呼び出し元が接続の確立・クローズを責任持つようにするリファクタリングが必要。
+            # 通常はギルド設定キャッシュから取得されるため、データベースへの追加の問い合わせは発生しない
             settings = await get_guild_settings(guild_id)
 
             set_clauses = []
@@ -946,19 +2627,23 @@ async def update_guild_settings(
 
             logger.debug(f"Executing SQL: {update_sql}, Parameters: {final_params}")
             await cursor.execute(update_sql, final_params)
-            await conn.commit()
+            await _commit(conn)
+            # コミットが成功したらキャッシュも更新する (ライトスルー)
+            # insert_params には指定された値と、指定されなかった項目の現在の値が入っている
+            _settings_cache.put(
+                guild_id,
+                {
+                    constants.COLUMN_GUILD_ID: str(guild_id),
+                    constants.COLUMN_LONELY_TIMEOUT_MINUTES: insert_params[1],
+                    constants.COLUMN_REACTION_WAIT_MINUTES: insert_params[2],
+                },
+            )
             logger.info(f"Settings updated for guild {guild_id}.")
     except Exception as e:
+        # 書き込みに失敗した場合は、次回データベースから読み直すようにキャッシュを破棄する
+        _settings_cache.invalidate(guild_id)
         logger.error(
             f"An error occurred while updating settings for guild {guild_id}: {e}"
         )
-        try:
-            async with DatabaseConnection() as conn_rollback:
-                await conn_rollback.rollback()
-                logger.warning("Rolled back database changes.")
-        except Exception as rollback_e:
-            logger.error(f"An error occurred during rollback: {rollback_e}")
+        # 未コミットの変更は DatabaseConnection の終了時にロールバック済み
         raise  # エラーを再送出
-
-
-# close_db 関数は、DatabaseConnection コンテキストマネージャーや init_db 関数内で接続が閉じられるため、不要と判断し削除しました。
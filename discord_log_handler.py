@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import os
+import queue
+import time
+from collections import OrderedDict, deque
+from logging.handlers import QueueHandler, QueueListener
+
+import aiohttp
+import discord
+
+import constants
+from formatters import create_log_embed
+
+# 内部ログ出力用のロガー (main.py で Discord に送信されないよう設定される)
+internal_logger = logging.getLogger("bot.internal")
+
+
+# トークンバケット方式のレートリミッタ
+# rate 個/秒でトークンが補充され、最大 capacity 個まで溜まる (capacity 件までは連続で送信できる)
+# レート制限 (429) を受けた場合は pause で Retry-After の間すべての送信を止める
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self):
+        """トークンを1つ取得します。トークンがない場合や停止中は取得できるまで待機します。"""
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """指定された秒数の間、トークンの取得を止めます。"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        # 停止が明けた直後にまとめて送信しないよう、溜まっていたトークンも捨てる
+        self._tokens = 0.0
+        self._updated = self._paused_until
+
+
+def _get_retry_after(error: discord.HTTPException) -> float:
+    """429 レスポンスの Retry-After ヘッダの秒数を返します。取得できない場合はデフォルト値を返します。"""
+    headers = getattr(error.response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After", ""))
+    except (TypeError, ValueError):
+        return constants.LOG_WEBHOOK_DEFAULT_RETRY_AFTER_SECONDS
+
+
+# ログレコードを整形せずにそのままキューに入れる QueueHandler
+# 標準の QueueHandler は prepare でメッセージと例外のトレースバックを整形するため、
+# ログを出力したスレッド (イベントループ) で整形が行われてしまう
+class _RecordQueueHandler(QueueHandler):
+    def prepare(self, record):
+        return record
+
+
+# WARNING 以上のログを Discord の Webhook に送信するロギングハンドラ
+# start でロガーに QueueHandler を追加し、ログの整形・重複の除外・埋め込みの作成はリスナースレッドで行う
+# 作成した埋め込みだけをイベントループに渡してバッファに溜め、
+# 1つのフラッシュタスクが最大 LOG_WEBHOOK_MAX_EMBEDS 件ずつ1回の Webhook 送信にまとめて送る
+# Webhook の HTTP セッションは使い回し、送信間隔はトークンバケットで制限する
+class DiscordHandler(logging.Handler):
+    def __init__(self, bot_instance):
+        super().__init__()
+        self.bot = bot_instance
+        self.setFormatter(logging.Formatter(constants.LOGGING_FORMAT))
+        # 送信済みのメッセージのハッシュ (LRU で最大 max_messages 件を保持する)
+        self.sent_messages: OrderedDict[int, None] = OrderedDict()
+        self.max_messages = constants.LOG_DEDUP_CACHE_SIZE
+        # 未送信の埋め込みのバッファ (最大件数を超えた場合は最も古いものから破棄される)
+        self.buffer: deque[discord.Embed] = deque(maxlen=constants.LOG_BUFFER_MAX_SIZE)
+        self.webhook_url = os.getenv("DISCORD_WEBHOOK_URL")
+        self.rate_limiter = TokenBucket(
+            constants.LOG_WEBHOOK_RATE_PER_SECOND, constants.LOG_WEBHOOK_BURST
+        )
+        self._session: aiohttp.ClientSession | None = None
+        self._webhook: discord.Webhook | None = None
+        self._flush_task: asyncio.Task | None = None
+        self._logger: logging.Logger | None = None
+        self._queue_handler: QueueHandler | None = None
+        self._listener: QueueListener | None = None
+
+        # 送信の統計
+        self.webhook_calls = 0  # Webhook の送信回数
+        self.records_sent = 0  # 送信したログの件数
+        self.rate_limited = 0  # レート制限 (429) を受けた回数
+        self.dropped = 0  # バッファあふれや送信できない内容のため破棄したログの件数
+
+    def start(self, logger: logging.Logger):
+        """ロガーに QueueHandler を追加し、このハンドラでログを処理するリスナースレッドを開始します。"""
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._queue_handler = _RecordQueueHandler(log_queue)
+        # WARNING 未満のログはキューにも入れない
+        self._queue_handler.setLevel(logging.WARNING)
+        self._listener = QueueListener(log_queue, self, respect_handler_level=True)
+        self._listener.start()
+        logger.addHandler(self._queue_handler)
+        self._logger = logger
+
+    async def _stop_listener(self):
+        # ロガーから QueueHandler を外し、キューに残ったログを処理し終えるまでリスナースレッドを待つ
+        if self._listener is None:
+            return
+        if self._logger is not None and self._queue_handler is not None:
+            self._logger.removeHandler(self._queue_handler)
+        await asyncio.to_thread(self._listener.stop)
+        self._listener = None
+        self._queue_handler = None
+        # リスナースレッドから渡された埋め込みをバッファに追加させる
+        await asyncio.sleep(0)
+
+    def _is_duplicate(self, message: str) -> bool:
+        # 最近送信したメッセージと同じであれば True を返す (リスナースレッドからのみ呼ばれる)
+        key = hash(message)
+        if key in self.sent_messages:
+            self.sent_messages.move_to_end(key)
+            return True
+        self.sent_messages[key] = None
+        if len(self.sent_messages) > self.max_messages:
+            self.sent_messages.popitem(last=False)  # 古いメッセージを削除
+        return False
+
+    def emit(self, record):
+        # リスナースレッドで呼ばれる (start を使わずにロガーに追加した場合はログを出力したスレッド)
+        # 内部ロガー自身のログはDiscordに送信しない（無限ループ防止）
+        if record.name == "bot.internal":
+            return
+
+        if record.levelno < logging.WARNING:
+            return  # WARNING未満のログはDiscordに送信しない
+
+        message = record.getMessage()
+        # 「Bot is ready.」メッセージはDiscordに送信しない
+        if message == "Bot is ready.":
+            return
+
+        if self._is_duplicate(message):
+            return  # 同じメッセージが既に送信されている場合は送信しない
+
+        # Webhook URLが設定されていない場合は何もしない
+        if not self.webhook_url:
+            return
+
+        try:
+            embed = create_log_embed(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        # Webhookでの送信はBot自体の接続状況に依存しないため、
+        # イベントループが動いていれば埋め込みを渡してフラッシュタスクを開始する (イベントループが稼働していない場合はバッファに残る)
+        loop = self.bot.loop
+        if loop and loop.is_running():
+            try:
+                loop.call_soon_threadsafe(self._enqueue, embed)
+                return
+            except RuntimeError:
+                pass  # イベントループが閉じられた
+        self.add_to_buffer(embed)
+
+    def _enqueue(self, embed: discord.Embed):
+        # イベントループのスレッドで、埋め込みをバッファに追加してフラッシュタスクを開始する
+        self.add_to_buffer(embed)
+        self._schedule_flush()
+
+    def add_to_buffer(self, embed: discord.Embed):
+        # バッファに埋め込みを追加する（最大件数を超えた場合は最も古いものが破棄される）
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(embed)
+
+    def _schedule_flush(self):
+        # フラッシュタスクは常に1つだけ動かす (実行中のタスクが新しく追加されたログも送信する)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(
+                self.flush_buffer()
+            )
+
+    def _get_webhook(self, webhook_url: str) -> discord.Webhook:
+        # HTTP セッションと Webhook は最初の送信時に作成し、以降は使い回す
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+            self._webhook = None
+        if self._webhook is None:
+            self._webhook = discord.Webhook.from_url(webhook_url, session=self._session)
+        return self._webhook
+
+    def _take_batch(self) -> list[discord.Embed]:
+        # バッファの先頭から、1回の Webhook 送信に収まる件数の埋め込みを取り出す
+        # (埋め込みは最大 LOG_WEBHOOK_MAX_EMBEDS 件、合計 LOG_WEBHOOK_MAX_EMBED_CHARS 文字まで)
+        embeds: list[discord.Embed] = []
+        total_chars = 0
+        while self.buffer and len(embeds) < constants.LOG_WEBHOOK_MAX_EMBEDS:
+            chars = len(self.buffer[0])
+            if embeds and total_chars + chars > constants.LOG_WEBHOOK_MAX_EMBED_CHARS:
+                break
+            embeds.append(self.buffer.popleft())
+            total_chars += chars
+        return embeds
+
+    async def flush_buffer(self):
+        # バッファに溜まったログのフラッシュを試みる
+        webhook_url = self.webhook_url
+        if not webhook_url or not self.buffer:
+            return
+        if not (self.bot.loop and self.bot.loop.is_running()):
+            return
+        internal_logger.info(
+            f"Flushing {len(self.buffer)} buffered logs to Discord Webhook..."
+        )
+        while self.buffer:
+            embeds = self._take_batch()
+            await self.rate_limiter.acquire()
+            try:
+                await self._get_webhook(webhook_url).send(embeds=embeds)
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    # Retry-After の間は送信を止め、同じログを再送する
+                    retry_after = _get_retry_after(e)
+                    self.rate_limited += 1
+                    self.rate_limiter.pause(retry_after)
+                    self.buffer.extendleft(reversed(embeds))
+                    internal_logger.warning(
+                        f"Discord Webhook rate limited. Retrying {len(embeds)} logs after {retry_after:.1f}s."
+                    )
+                    continue
+                if 400 <= e.status < 500:
+                    # 内容が不正などの理由で拒否された場合は、再送しても成功しないため破棄する
+                    self.dropped += len(embeds)
+                    internal_logger.error(
+                        f"Discord Webhook rejected {len(embeds)} log embeds, dropping them: {e}"
+                    )
+                    continue
+                self.buffer.extendleft(reversed(embeds))
+                internal_logger.warning(
+                    f"Failed to flush buffer log via Webhook, pausing flush process: {e}"
+                )
+                break
+            except Exception as e:
+                # 送信に失敗した場合は一旦終了（ネットワーク未接続など）
+                # 残ったログは次のログが追加されたときに再送を試みる
+                self.buffer.extendleft(reversed(embeds))
+                internal_logger.warning(
+                    f"Failed to flush buffer log via Webhook, pausing flush process: {e}"
+                )
+                break
+            self.webhook_calls += 1
+            self.records_sent += len(embeds)
+
+    def get_stats(self) -> dict:
+        """Webhook の送信回数、送信したログの件数、レート制限と破棄の回数を返します。"""
+        return {
+            "webhook_calls": self.webhook_calls,
+            "records_sent": self.records_sent,
+            "rate_limited": self.rate_limited,
+            "dropped": self.dropped,
+            "buffered": len(self.buffer),
+        }
+
+    async def aclose(self):
+        """
+        リスナースレッドを止め、残っているログの送信を待ってから (最大 LOG_WEBHOOK_CLOSE_TIMEOUT_SECONDS 秒)、
+        HTTP セッションを閉じます。
+        """
+        await self._stop_listener()
+        if self.buffer:
+            self._schedule_flush()
+        if self._flush_task is not None and not self._flush_task.done():
+            try:
+                await asyncio.wait_for(
+                    self._flush_task, constants.LOG_WEBHOOK_CLOSE_TIMEOUT_SECONDS
+                )
+            except Exception as e:
+                internal_logger.warning(
+                    f"Gave up flushing logs to Discord Webhook: {e}"
+                )
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._webhook = None
+        internal_logger.info(f"DiscordHandler closed. Stats: {self.get_stats()}")
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+# ロガーを取得
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class GuildActorStats:
+    """1つのギルドのキューの計測値。時間は秒。"""
+
+    processed: int = 0
+    failed: int = 0
+    max_depth: int = 0
+    total_wait: float = 0.0
+    total_processing: float = 0.0
+    max_latency: float = 0.0
+
+    def as_dict(self, depth: int) -> dict:
+        count = self.processed or 1
+        return {
+            "depth": depth,
+            "max_depth": self.max_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_wait": self.total_wait / count,
+            "avg_processing": self.total_processing / count,
+            "max_latency": self.max_latency,
+        }
+
+
+# ギルドごとに1つのキューとワーカーを持ち、イベントをギルド単位で順番に処理する (アクター)
+# 同じギルドのイベントは届いた順に1つずつ処理され、別のギルドのイベントは並行して処理される
+# キューが空のまま IDLE_TIMEOUT_SECONDS が経過したワーカーは終了し、次のイベントで再び開始する
+# (退出したギルドや活動のないギルドのワーカーとキューが残り続けないようにする)
+class GuildActors:
+    # 1件の処理 (待ち時間を含む) がこの秒数を超えたら警告を出す
+    SLOW_EVENT_SECONDS = 5.0
+    # キューが空のままこの秒数が経過したらワーカーを終了する
+    IDLE_TIMEOUT_SECONDS = 300.0
+
+    def __init__(self, name: str = "guild"):
+        self.name = name
+        self._queues: dict[int, asyncio.Queue] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        self._stats: dict[int, GuildActorStats] = {}
+
+    def submit(
+        self, guild_id: int, handler: Callable[..., Awaitable[Any]], *args
+    ) -> int:
+        """
+        ギルドのキューに handler(*args) を追加します。ワーカーがなければ開始します。
+        追加後のキューの長さを返します。
+        """
+        queue = self._queues.get(guild_id)
+        if queue is None:
+            queue = asyncio.Queue()
+            self._queues[guild_id] = queue
+            # 計測値はワーカーの再開後も引き継ぐ
+            self._stats.setdefault(guild_id, GuildActorStats())
+            self._workers[guild_id] = asyncio.create_task(
+                self._run(guild_id, queue), name=f"{self.name}-actor-{guild_id}"
+            )
+            logger.debug(f"Started {self.name} actor for guild {guild_id}.")
+        loop = asyncio.get_running_loop()
+        queue.put_nowait((loop.time(), handler, args))
+        depth = queue.qsize()
+        stats = self._stats[guild_id]
+        stats.max_depth = max(stats.max_depth, depth)
+        return depth
+
+    async def run(self, guild_id: int, handler: Callable[..., Awaitable[Any]], *args):
+        """
+        ギルドのキューに handler(*args) を追加し、処理が完了するまで待機して結果を返します。
+        handler で例外が発生した場合は、その例外を送出します。
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        async def invoke():
+            try:
+                result = await handler(*args)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+            if not future.done():
+                future.set_result(result)
+
+        self.submit(guild_id, invoke)
+        return await future
+
+    def queue_depth(self, guild_id: int) -> int:
+        queue = self._queues.get(guild_id)
+        return queue.qsize() if queue is not None else 0
+
+    def get_stats(self) -> dict[int, dict]:
+        """ギルドごとのキューの長さ、処理件数、待ち時間・処理時間の計測値を返します。"""
+        return {
+            guild_id: stats.as_dict(self.queue_depth(guild_id))
+            for guild_id, stats in self._stats.items()
+        }
+
+    async def join(self):
+        """全てのギルドのキューが空になり、処理が完了するまで待機します。"""
+        for queue in list(self._queues.values()):
+            await queue.join()
+
+    async def stop(self):
+        """全てのワーカーを停止します。キューに残ったイベントは破棄されます。"""
+        # 待機中にアイドルのワーカーが自身を削除することがあるため、コピーを使う
+        workers = list(self._workers.values())
+        for task in workers:
+            task.cancel()
+        for task in workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        discarded = sum(queue.qsize() for queue in self._queues.values())
+        logger.info(
+            f"Stopped {len(workers)} {self.name} actors. Discarded {discarded} queued events."
+        )
+        self._workers.clear()
+        self._queues.clear()
+
+    async def _run(self, guild_id: int, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        stats = self._stats[guild_id]
+        while True:
+            try:
+                enqueued_at, handler, args = await asyncio.wait_for(
+                    queue.get(), self.IDLE_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                # submit は await を挟まずにキューへ追加するため、空であればこの時点で削除しても取りこぼさない
+                if not queue.empty():
+                    continue
+                self._queues.pop(guild_id, None)
+                self._workers.pop(guild_id, None)
+                logger.debug(f"Stopped idle {self.name} actor for guild {guild_id}.")
+                return
+            started = loop.time()
+            try:
+                await handler(*args)
+            except Exception as e:
+                stats.failed += 1
+                logger.exception(
+                    f"An error occurred while processing {self.name} event for guild {guild_id}: {e}"
+                )
+            finally:
+                finished = loop.time()
+                wait = started - enqueued_at
+                latency = finished - enqueued_at
+                stats.processed += 1
+                stats.total_wait += wait
+                stats.total_processing += finished - started
+                stats.max_latency = max(stats.max_latency, latency)
+                if latency > self.SLOW_EVENT_SECONDS:
+                    logger.warning(
+                        f"Slow {self.name} event for guild {guild_id}: waited {wait:.3f}s, processed in {finished - started:.3f}s. Queue depth: {queue.qsize()}"
+                    )
+                queue.task_done()
@@ -4,13 +4,15 @@ import os
 import logging
 import sys
 from dotenv import load_dotenv
-import aiohttp
 
 import constants
-from database import init_db
-from formatters import create_log_embed
+from database import init_db, close_db
+from discord_log_handler import DiscordHandler
+from sharding import ShardConfig
+from client_profile import build_client_options, get_client_profile
 
 # 他のモジュールのインポート
+from command_sync import sync_guild_commands
 from commands import BotCommands
 from tasks import BotTasks
 from voice_events import VoiceEvents, SleepCheckManager
@@ -37,106 +39,6 @@ internal_logger.addHandler(internal_console_handler)
 internal_logger.setLevel(logging.INFO)
 
 
-# カスタムロギングハンドラ
-class DiscordHandler(logging.Handler):
-    def __init__(self, bot_instance):
-        super().__init__()
-        self.bot = bot_instance
-        self.setFormatter(logging.Formatter(constants.LOGGING_FORMAT))
-        self.sent_messages = []  # 送信済みのメッセージを保存するリスト
-        self.max_messages = 10  # 保存するメッセージの最大数
-        self.buffer = []  # 未送信ログのバッファ
-        self.max_buffer_size = 100  # バッファの最大件数
-        self.is_flushing = False  # フラッシュ処理の排他フラグ
-        self.webhook_url = os.getenv("DISCORD_WEBHOOK_URL")
-
-    def emit(self, record):
-        # 内部ロガー自身のログはDiscordに送信しない（無限ループ防止）
-        if record.name == "bot.internal":
-            return
-
-        message = record.getMessage()
-        if message in self.sent_messages:
-            return  # 同じメッセージが既に送信されている場合は送信しない
-
-        if record.levelno < logging.WARNING:
-            return  # WARNING未満のログはDiscordに送信しない
-
-        # 「Bot is ready.」メッセージはDiscordに送信しない
-        if message == "Bot is ready.":
-            return
-
-        # メッセージを送信済みのリストに追加
-        self.sent_messages.append(message)
-        if len(self.sent_messages) > self.max_messages:
-            self.sent_messages.pop(0)  # 古いメッセージを削除
-
-        # Webhook URLが設定されていない場合は何もしない
-        if not self.webhook_url:
-            return
-
-        # Webhookでの送信はBot自体の接続状況に依存しないため、
-        # イベントループが動いていれば即座に非同期タスクとして送信を試みる
-        if self.bot.loop and self.bot.loop.is_running():
-            self.bot.loop.create_task(self.send_log_to_discord(record))
-        else:
-            # イベントループが稼働していない場合はバッファに保存する
-            self.add_to_buffer(record)
-
-    def add_to_buffer(self, record):
-        # バッファにログを追加する（最大件数制限あり）
-        self.buffer.append(record)
-        if len(self.buffer) > self.max_buffer_size:
-            self.buffer.pop(0)  # 最も古いログを破棄
-
-    async def flush_buffer(self):
-        # バッファに溜まったログのフラッシュを試みる
-        if not self.webhook_url or self.is_flushing or not self.buffer:
-            return
-        if not (self.bot.loop and self.bot.loop.is_running()):
-            return
-        self.is_flushing = True
-        try:
-            internal_logger.info(
-                f"Flushing {len(self.buffer)} buffered logs to Discord Webhook..."
-            )
-            while self.buffer:
-                record = self.buffer[0]
-                success = await self._send_single_log(record)
-                if success:
-                    self.buffer.pop(0)
-                else:
-                    # 送信に失敗した場合は一旦終了（ネットワーク未接続など）
-                    internal_logger.warning(
-                        "Failed to flush buffer log via Webhook, pausing flush process."
-                    )
-                    break
-        finally:
-            self.is_flushing = False
-
-    async def _send_single_log(self, record):
-        # 実際にWebhookへ1件のログを送信する
-        if not self.webhook_url:
-            return False
-        try:
-            embed = create_log_embed(record)
-            async with aiohttp.ClientSession() as session:
-                webhook = discord.Webhook.from_url(self.webhook_url, session=session)
-                await webhook.send(embed=embed)
-            return True
-        except Exception as e:
-            internal_logger.error(f"Failed to send log embed to Discord Webhook: {e}")
-            return False
-
-    async def send_log_to_discord(self, record):
-        success = await self._send_single_log(record)
-        if not success:
-            self.add_to_buffer(record)
-        # 溜まっているバッファがあれば送信を試みる
-        if self.buffer and self.bot.loop and self.bot.loop.is_running():
-            self.bot.loop.create_task(self.flush_buffer())
-
-
 # 設定の読み込み (環境変数からトークンを取得)
 load_dotenv()
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
@@ -144,11 +46,98 @@ if TOKEN is None:
     logging.error("DISCORD_BOT_TOKEN environment variable is not set.")
     exit(1)  # トークンがない場合は終了
 
-# インテントの設定
-intents = discord.Intents.all()
+# インテントとメンバー・メッセージのキャッシュの設定 (環境変数 CLIENT_PROFILE)
+client_profile = get_client_profile()
+try:
+    client_options = build_client_options(client_profile)
+except ValueError as e:
+    logging.error(f"Invalid client profile: {e}")
+    exit(1)
+logging.info(f"Using client profile '{client_profile}'.")
+# プレフィックスコマンドは使わないため、メッセージ内容のインテントがない場合はメンションをプレフィックスにする
+# (プレフィックスが文字列だとインテント不足の警告が出る)
+command_prefix = (
+    constants.COMMAND_PREFIX
+    if client_options["intents"].message_content
+    else commands.when_mentioned
+)
+
+
+# シャーディングの設定 (環境変数 BOT_SHARD_MODE, SHARD_COUNT, SHARD_IDS)
+try:
+    shard_config = ShardConfig.from_env()
+except ValueError as e:
+    logging.error(f"Invalid sharding configuration: {e}")
+    exit(1)
+
+
+def _get_voice_state_manager(
+    bot_instance: commands.Bot | commands.AutoShardedBot,
+) -> VoiceStateManager | None:
+    bot_commands = bot_instance.get_cog("BotCommands")
+    if isinstance(bot_commands, BotCommands):
+        return bot_commands.voice_state_manager
+    return None
+
+
+# Discord との接続を閉じた後に、最後のスナップショットを保存してデータベース接続プールを閉じる
+async def _close_resources(voice_state_manager: VoiceStateManager | None):
+    # イベントが届かなくなってから保存する
+    if voice_state_manager is not None:
+        await voice_state_manager.save_snapshot(force=True)
+    await close_db()
+    logging.info("Database pool closed.")
+    # ログのリスナースレッドを止めて残っているログを送信し、Webhook の HTTP セッションを閉じる
+    if discord_handler is not None:
+        await discord_handler.aclose()
+
+
+# 終了時に最後のスナップショットを保存し、データベース接続プールを閉じる Bot
+# (super().close() は全ての Cog を削除するため、マネージャーはその前に取得しておく)
+class NotificationBot(commands.Bot):
+    async def close(self):
+        voice_state_manager = _get_voice_state_manager(self)
+        await super().close()
+        await _close_resources(voice_state_manager)
+
+
+# 複数のシャード (ゲートウェイ接続) で動作する NotificationBot
+class ShardedNotificationBot(commands.AutoShardedBot):
+    async def close(self):
+        voice_state_manager = _get_voice_state_manager(self)
+        await super().close()
+        await _close_resources(voice_state_manager)
+
+
+# 登録済みの BotTasks Cog の定期実行タスクを開始する (再接続で on_ready が再度呼ばれた場合は開始済みのタスクを開始しない)
+# スナップショットと整合性チェックは登録済みの Cog のマネージャーを使う (再接続時に新しい空のマネージャーを参照しないため)
+# WAL チェックポイントも登録済みの Cog で1つだけ動かす (再接続のたびにループが増えないようにする)
+def _start_registered_tasks(bot_instance: commands.Bot | commands.AutoShardedBot):
+    loaded_tasks_cog = bot_instance.get_cog("BotTasks")
+    if not isinstance(loaded_tasks_cog, BotTasks):
+        return
+    if not loaded_tasks_cog.wal_checkpoint_task.is_running():
+        loaded_tasks_cog.wal_checkpoint_task.start()
+    if not loaded_tasks_cog.session_snapshot_task.is_running():
+        loaded_tasks_cog.session_snapshot_task.start()
+        loaded_tasks_cog.session_consistency_task.start()
+
 
 # Botのセットアップ
-bot = commands.Bot(command_prefix=constants.COMMAND_PREFIX, intents=intents)
+bot: commands.Bot | commands.AutoShardedBot
+if shard_config.is_sharded:
+    bot = ShardedNotificationBot(
+        command_prefix=command_prefix,
+        **client_options,
+        **shard_config.bot_options(),
+    )
+    logging.info(
+        f"Running as AutoShardedBot. shard_count={shard_config.shard_count}, shard_ids={shard_config.shard_ids}"
+    )
+else:
+    bot = NotificationBot(command_prefix=command_prefix, **client_options)
+# ルートロガーに追加した DiscordHandler (on_ready で作成される)
+discord_handler: DiscordHandler | None = None
 
 
 @bot.event
@@ -171,11 +160,14 @@ async def on_ready():
         logging.info(f"bot.tree type: {type(bot.tree)}")
         logging.info(f"bot.tree.clear_commands type: {type(bot.tree.clear_commands)}")
 
-    # DiscordHandler をロガーに追加
-    discord_handler = DiscordHandler(bot)
-    logger.addHandler(discord_handler)
-    logging.info("DiscordHandler added to logger.")
-    bot.loop.create_task(discord_handler.flush_buffer())
+    # DiscordHandler をロガーに追加 (再接続で on_ready が再度呼ばれた場合は追加しない)
+    # ログはキュー経由でリスナースレッドに渡され、整形や埋め込みの作成はイベントループの外で行われる
+    # (バッファへの追加時にハンドラがフラッシュタスクを管理するため、ここでは開始しない)
+    global discord_handler
+    if discord_handler is None:
+        discord_handler = DiscordHandler(bot)
+        discord_handler.start(logger)
+        logging.info("DiscordHandler added to logger.")
 
     # データベースの初期化
     try:
@@ -207,12 +199,19 @@ async def on_ready():
     )
     logging.info("VoiceStateManager instance created with decomposed components.")
 
+    # 前回の終了・クラッシュ時点で進行中だった通話セッションを復元する
+    # 再接続で on_ready が再度呼ばれた場合は、既存のマネージャーが状態を保持しているため復元しない
+    if "VoiceEvents" not in bot.cogs:
+        await voice_state_manager.restore_from_snapshot()
+
     # Cog の追加
     # VoiceEvents Cog は sleep_check_manager と voice_state_manager を必要とする
     voice_events_cog = VoiceEvents(bot, sleep_check_manager, voice_state_manager)
     if "VoiceEvents" not in bot.cogs:
         await bot.add_cog(voice_events_cog)
         logging.info("VoiceEvents Cog added.")
+        # 起動前から通話中のメンバーの状態を一括で登録する
+        await voice_events_cog.bootstrap_voice_states()
     else:
         logging.info("VoiceEvents Cog already loaded.")
 
@@ -235,6 +234,7 @@ async def on_ready():
     # 定期実行タスクの開始
     tasks_cog.send_monthly_stats_task.start()
     tasks_cog.send_annual_stats_task.start()
+    _start_registered_tasks(bot)
     # BotStatusUpdater のタスクは BotStatusUpdater クラス内で管理されるため、ここでは開始しない
     logging.info("Scheduled tasks started.")
 
@@ -242,32 +242,10 @@ async def on_ready():
     # BotCommands を Cog として追加することで自動的にツリーに登録されます。
     # 各ギルドで即座にコマンドを利用可能にするため、グローバルコマンドを各ギルドにコピーして同期します。
     if not getattr(bot, "_commands_registered", False):
-        bot._commands_registered = True  # type: ignore[attr-defined]
+        bot._commands_registered = True  # type: ignore[attr-defined,union-attr]
+        # 前回の同期からコマンドのツリーが変わったギルドだけを同期する
         logging.info("Starting command synchronization for all joined guilds.")
-        synced_guild_count = 0
-        for guild in bot.guilds:
-            if guild is None or bot.tree is None:
-                continue
-
-            logging.info(f"Syncing commands for guild {guild.id} ({guild.name}).")
-            try:
-                # グローバルコマンドをこのギルドにコピーして即座に反映させる
-                bot.tree.copy_global_to(guild=guild)
-                # ギルドコマンドを同期
-                synced_commands = await bot.tree.sync(guild=guild)
-                logging.info(
-                    f"Successfully synced commands for guild {guild.id} ({guild.name}). Synced command count: {len(synced_commands)}"
-                )
-                synced_guild_count += 1
-            except Exception as e:
-                logging.error(
-                    f"Failed to sync commands for guild {guild.id} ({guild.name}): {e}",
-                    exc_info=True,
-                )
-
-        logging.info(
-            f"Command synchronization completed. Successfully synced in {synced_guild_count} guilds."
-        )
+        await sync_guild_commands(bot.tree, list(bot.guilds))
     logging.warning("Bot is ready.")
 
 
@@ -296,6 +274,13 @@ async def on_command_error(ctx, error):
         )
 
 
+@bot.event
+async def on_shard_ready(shard_id):
+    """シャードの準備ができたときのハンドラ (AutoShardedBot で動作している場合のみ呼ばれる)"""
+    guild_count = sum(1 for guild in bot.guilds if guild.shard_id == shard_id)
+    logging.info(f"Shard {shard_id} is ready with {guild_count} guilds.")
+
+
 @bot.event
 async def on_error(event, *args, **kwargs):
     """Discord.py内部で発生するエラーのハンドラ"""
@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+# ロガーを取得
+logger = logging.getLogger(__name__)
+
+
+# 期限付きの処理 (タイマー) を1つのバックグラウンドタスクでまとめて実行するスケジューラ
+# タイマーごとに asyncio.sleep するタスクを作る代わりに、期限順のヒープを1つのタスクで監視する
+# キャンセルは辞書から外すだけ (O(1)) で、ヒープに残った古いエントリは取り出した時に読み飛ばす
+class TimerScheduler:
+    # 無効になったエントリがこの件数を超え、かつ有効なタイマーより多くなったらヒープを作り直す
+    COMPACT_THRESHOLD = 64
+
+    def __init__(self):
+        # (期限, 登録順, キー) のヒープ
+        self._heap: list[tuple[float, int, Hashable]] = []
+        # キー -> (期限, 登録順, コールバック, 引数)
+        self._timers: dict[Hashable, tuple[float, int, Callable, tuple]] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner_task: asyncio.Task | None = None
+        # 実行中のコールバックタスク (完了まで参照を保持する)
+        self._running: set[asyncio.Task] = set()
+        self.fired_count = 0
+
+    def pending_count(self) -> int:
+        """実行待ちのタイマーの数を返します。"""
+        return len(self._timers)
+
+    def is_scheduled(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def schedule(
+        self,
+        key: Hashable,
+        delay_seconds: float,
+        callback: Callable[..., Awaitable[Any]],
+        *args,
+    ):
+        """
+        delay_seconds 秒後に callback(*args) を実行するタイマーを登録します。
+        同じキーのタイマーが既にある場合は置き換えます (再スケジュール)。
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(delay_seconds, 0)
+        seq = next(self._counter)
+        self._timers[key] = (deadline, seq, callback, args)
+        heapq.heappush(self._heap, (deadline, seq, key))
+        self._maybe_compact()
+        # 先頭の期限が早まった可能性があるため、待機中のランナーを起こす
+        self._wakeup.set()
+        if self._runner_task is None or self._runner_task.done():
+            self._runner_task = asyncio.create_task(self._run())
+        logger.debug(f"Scheduled timer {key} in {delay_seconds} seconds.")
+
+    def cancel(self, key: Hashable) -> bool:
+        """タイマーをキャンセルします。キャンセルできた場合は True を返します。"""
+        if self._timers.pop(key, None) is None:
+            return False
+        logger.debug(f"Cancelled timer {key}.")
+        return True
+
+    async def stop(self):
+        """ランナーを停止し、実行待ちのタイマーを全て破棄します。"""
+        if self._runner_task is not None:
+            self._runner_task.cancel()
+            try:
+                await self._runner_task
+            except asyncio.CancelledError:
+                pass
+            self._runner_task = None
+        logger.info(
+            f"Timer scheduler stopped. Discarded {len(self._timers)} pending timers, fired {self.fired_count} timers."
+        )
+        self._timers.clear()
+        self._heap.clear()
+
+    def _maybe_compact(self):
+        stale = len(self._heap) - len(self._timers)
+        if stale > self.COMPACT_THRESHOLD and stale > len(self._timers):
+            self._heap = [
+                (deadline, seq, key)
+                for key, (deadline, seq, _, _) in self._timers.items()
+            ]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> list[tuple[Hashable, Callable, tuple]]:
+        """期限を過ぎた有効なタイマーを取り出します。"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            timer = self._timers.get(key)
+            # キャンセル済み、または再スケジュールされた古いエントリは読み飛ばす
+            if timer is None or timer[1] != seq:
+                continue
+            del self._timers[key]
+            due.append((key, timer[2], timer[3]))
+        return due
+
+    def _next_delay(self, now: float) -> float | None:
+        while self._heap:
+            deadline, seq, key = self._heap[0]
+            timer = self._timers.get(key)
+            if timer is not None and timer[1] == seq:
+                return max(deadline - now, 0)
+            heapq.heappop(self._heap)
+        return None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            for key, callback, args in self._pop_due(loop.time()):
+                self.fired_count += 1
+                task = asyncio.create_task(self._invoke(key, callback, args))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            delay = self._next_delay(loop.time())
+            try:
+                # 次の期限まで、または新しいタイマーが登録されるまで待機する
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _invoke(self, key: Hashable, callback: Callable, args: tuple):
+        try:
+            await callback(*args)
+        except Exception as e:
+            logger.exception(f"An error occurred while running timer {key}: {e}")
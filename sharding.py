@@ -0,0 +1,118 @@
+import logging
+import os
+from dataclasses import dataclass
+
+import discord
+
+import constants
+
+# ロガーを取得
+logger = logging.getLogger(__name__)
+
+
+def parse_shard_ids(value: str) -> list[int]:
+    """
+    "0-3,6" のような文字列をシャードIDのリストに変換します。
+    不正な値の場合は ValueError を送出します。
+    """
+    shard_ids: set[int] = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = (int(bound) for bound in part.split("-", 1))
+            if start > end:
+                raise ValueError(f"Invalid shard range: {part}")
+            shard_ids.update(range(start, end + 1))
+        else:
+            shard_ids.add(int(part))
+    if any(shard_id < 0 for shard_id in shard_ids):
+        raise ValueError(f"Shard IDs must not be negative: {value}")
+    return sorted(shard_ids)
+
+
+@dataclass(frozen=True, slots=True)
+class ShardConfig:
+    """
+    ゲートウェイのシャーディングの設定。
+    mode が "none" の場合は通常の Bot、"auto" の場合は AutoShardedBot で動作します。
+    shard_ids を指定すると、このプロセスはそのシャードだけを担当します (複数プロセスでシャードを分担する場合)。
+    """
+
+    mode: str = constants.SHARD_MODE_NONE
+    shard_count: int | None = None
+    shard_ids: tuple[int, ...] | None = None
+
+    @property
+    def is_sharded(self) -> bool:
+        return self.mode == constants.SHARD_MODE_AUTO
+
+    @classmethod
+    def from_env(cls) -> "ShardConfig":
+        """
+        環境変数 BOT_SHARD_MODE, SHARD_COUNT, SHARD_IDS から設定を読み込みます。
+        SHARD_IDS を指定した場合は SHARD_COUNT も必要です。不正な値の場合は ValueError を送出します。
+        """
+        mode = os.getenv("BOT_SHARD_MODE", constants.SHARD_MODE_NONE).lower()
+        shard_count_env = os.getenv("SHARD_COUNT")
+        shard_ids_env = os.getenv("SHARD_IDS")
+        shard_count = int(shard_count_env) if shard_count_env else None
+        shard_ids = tuple(parse_shard_ids(shard_ids_env)) if shard_ids_env else None
+        # シャード数やシャードIDが指定されていればシャーディングを有効にする
+        if shard_count is not None or shard_ids is not None:
+            mode = constants.SHARD_MODE_AUTO
+        if mode not in (constants.SHARD_MODE_NONE, constants.SHARD_MODE_AUTO):
+            raise ValueError(f"Unknown BOT_SHARD_MODE: {mode}")
+        if shard_count is not None and shard_count < 1:
+            raise ValueError(f"SHARD_COUNT must be positive: {shard_count}")
+        if shard_ids is not None:
+            if shard_count is None:
+                raise ValueError("SHARD_COUNT is required when SHARD_IDS is set.")
+            if shard_ids[-1] >= shard_count:
+                raise ValueError(
+                    f"SHARD_IDS {list(shard_ids)} must be less than SHARD_COUNT {shard_count}."
+                )
+        return cls(mode=mode, shard_count=shard_count, shard_ids=shard_ids)
+
+    def bot_options(self) -> dict:
+        """Bot のコンストラクタに渡すシャーディングのオプションを返します。"""
+        if not self.is_sharded:
+            return {}
+        options: dict = {"shard_count": self.shard_count}
+        if self.shard_ids is not None:
+            options["shard_ids"] = list(self.shard_ids)
+        return options
+
+
+def get_shard_scope(bot) -> tuple[list[int], int] | None:
+    """
+    このプロセスが一部のシャードだけを担当している場合は (シャードIDのリスト, シャード数) を返します。
+    全てのギルドを担当している場合は None を返します。
+    """
+    shard_ids = getattr(bot, "shard_ids", None)
+    shard_count = getattr(bot, "shard_count", None)
+    if not isinstance(shard_ids, (list, tuple)) or not isinstance(shard_count, int):
+        return None  # シャーディングしていない Bot
+    if len(shard_ids) >= shard_count:
+        return None
+    return list(shard_ids), shard_count
+
+
+def guilds_by_shard(bot) -> dict[int, list[discord.Guild]]:
+    """
+    このプロセスが担当しているギルドをシャードごとに分けて返します。
+    シャーディングしていない場合は全てのギルドをシャードID 0 にまとめます。
+    """
+    scope = get_shard_scope(bot)
+    result: dict[int, list[discord.Guild]] = {}
+    for guild in bot.guilds:
+        shard_id = guild.shard_id or 0
+        if scope is not None and shard_id not in scope[0]:
+            # 他のプロセスが担当するシャードのギルドは処理しない
+            logger.warning(
+                f"Guild {guild.id} belongs to shard {shard_id}, which is not owned by this process. Skipping."
+            )
+            continue
+        result.setdefault(shard_id, []).append(guild)
+    return result
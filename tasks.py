@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 from zoneinfo import ZoneInfo
 from discord.ext import tasks
@@ -7,6 +8,8 @@ import logging  # logging モジュールをインポート
 
 import config  # config モジュールをインポート
 import constants  # constants モジュールをインポート
+from database import checkpoint_wal
+from sharding import guilds_by_shard
 
 # ロガーを取得
 logger = logging.getLogger(__name__)
@@ -17,6 +20,8 @@ class BotTasks(commands.Cog):
     def __init__(self, bot, bot_commands_cog):
         self.bot = bot
         self.bot_commands_cog = bot_commands_cog
+        # WAL チェックポイントの実行回数 (TRUNCATE を行う周期の判定に使用)
+        self._wal_checkpoint_count = 0
         logger.info("BotTasks Cog initialized.")
         # --- 毎日18時のトリガータスク ---
         # タスクは @tasks.loop デコレータによって定義されます。
@@ -69,6 +74,35 @@ class BotTasks(commands.Cog):
         else:
             logger.info(f"No notification channel set for guild {guild_id}")
 
+    async def _send_stats_to_all_guilds(
+        self, period_display, create_embed_func, embed_title
+    ):
+        """
+        このプロセスが担当する全てのギルドに統計情報を送信します。
+        ギルドはシャードごとに順番に処理し、シャード同士は並行して処理します。
+        """
+
+        async def send_for_shard(shard_id: int, guilds: list):
+            for guild in guilds:
+                try:
+                    await self._send_stats_to_channel(
+                        guild, period_display, create_embed_func, embed_title
+                    )
+                except Exception as e:
+                    logger.exception(
+                        f"Failed to send stats for guild {guild.id} on shard {shard_id}: {e}"
+                    )
+            logger.info(
+                f"Processed stats for {len(guilds)} guilds on shard {shard_id} for period {period_display}."
+            )
+
+        await asyncio.gather(
+            *(
+                send_for_shard(shard_id, guilds)
+                for shard_id, guilds in guilds_by_shard(self.bot).items()
+            )
+        )
+
     async def _create_annual_stats_embed_for_task(self, guild, year_str: str):
         """
         年間統計情報Embedをタスクから呼び出すためのヘルパー関数。
@@ -83,13 +117,13 @@ class BotTasks(commands.Cog):
             avg_duration,
             longest_info,
             ranking_text,
-            sessions_data,
+            session_summary,
             members_total,
         ) = await self.bot_commands_cog.get_and_process_annual_stats_data(
             guild, year_str
         )
 
-        if not sessions_data:
+        if not session_summary["session_count"]:
             logger.info(f"No annual stats found for year {year_str}. Returning None.")
             return None, year_display  # データがない場合はNoneを返す
 
@@ -121,15 +155,13 @@ class BotTasks(commands.Cog):
             previous_month = prev_month_last_day.strftime("%Y-%m")
             logger.debug(f"Calculating stats for previous month: {previous_month}")
 
-            # 各ギルドに対して前月の統計情報を送信
+            # 担当する各ギルドに対して前月の統計情報を送信
             try:
-                for guild in self.bot.guilds:
-                    await self._send_stats_to_channel(
-                        guild,
-                        previous_month,
-                        self.bot_commands_cog._create_monthly_stats_embed,
-                        constants.EMBED_TITLE_MONTHLY_STATS,
-                    )
+                await self._send_stats_to_all_guilds(
+                    previous_month,
+                    self.bot_commands_cog._create_monthly_stats_embed,
+                    constants.EMBED_TITLE_MONTHLY_STATS,
+                )
                 logger.info("Monthly stats task finished.")
             except Exception as e:
                 logger.error(
@@ -159,15 +191,13 @@ class BotTasks(commands.Cog):
             year_str = str(now.year)
             logger.debug(f"Calculating stats for year: {year_str}")
 
-            # 各ギルドに対して年間の統計情報を送信
+            # 担当する各ギルドに対して年間の統計情報を送信
             try:
-                for guild in self.bot.guilds:
-                    await self._send_stats_to_channel(
-                        guild,
-                        year_str,
-                        self._create_annual_stats_embed_for_task,  # ここを修正
-                        constants.EMBED_TITLE_ANNUAL_STATS,
-                    )
+                await self._send_stats_to_all_guilds(
+                    year_str,
+                    self._create_annual_stats_embed_for_task,
+                    constants.EMBED_TITLE_ANNUAL_STATS,
+                )
                 logger.info("Annual stats task finished.")
             except Exception as e:
                 logger.error(
@@ -176,3 +206,43 @@ class BotTasks(commands.Cog):
                 )
         else:
             logger.debug("Annual stats task skipped: not December 31st.")
+
+    # --- WAL チェックポイントタスク ---
+    # 通常は PASSIVE で書き戻し、constants.WAL_TRUNCATE_EVERY_N_CHECKPOINTS 回に一度 TRUNCATE で WAL ファイルを切り詰める
+    @tasks.loop(minutes=constants.WAL_CHECKPOINT_INTERVAL_MINUTES)
+    async def wal_checkpoint_task(self):
+        self._wal_checkpoint_count += 1
+        mode = (
+            "TRUNCATE"
+            if self._wal_checkpoint_count % constants.WAL_TRUNCATE_EVERY_N_CHECKPOINTS
+            == 0
+            else "PASSIVE"
+        )
+        try:
+            await checkpoint_wal(mode)
+        except Exception as e:
+            logger.exception(
+                f"An unexpected error occurred in WAL checkpoint task ({mode}): {e}"
+            )
+
+    # --- 通話セッションのスナップショットタスク ---
+    # 進行中の通話セッションを定期的に保存し、再起動やクラッシュ後に通話時間を引き継げるようにする
+    @tasks.loop(seconds=constants.SESSION_SNAPSHOT_INTERVAL_SECONDS)
+    async def session_snapshot_task(self):
+        try:
+            await self.bot_commands_cog.voice_state_manager.save_snapshot()
+        except Exception as e:
+            logger.exception(
+                f"An unexpected error occurred in session snapshot task: {e}"
+            )
+
+    # --- 通話セッションの整合性チェックタスク ---
+    # イベントごとの差分更新で生じたずれを、チャンネルのメンバー全体との比較で定期的に検出・修正する
+    @tasks.loop(minutes=constants.SESSION_CONSISTENCY_CHECK_INTERVAL_MINUTES)
+    async def session_consistency_task(self):
+        try:
+            await self.bot_commands_cog.voice_state_manager.check_session_consistency()
+        except Exception as e:
+            logger.exception(
+                f"An unexpected error occurred in session consistency task: {e}"
+            )
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+import constants
+from client_profile import build_client_options
+from commands import BotCommands
+
+
+def test_client_profiles():
+    full = build_client_options(constants.CLIENT_PROFILE_FULL)
+    assert full["intents"].members and full["intents"].presences
+    assert full["chunk_guilds_at_startup"]
+
+    minimal = build_client_options(constants.CLIENT_PROFILE_MINIMAL)
+    intents = minimal["intents"]
+    assert intents.guilds and intents.voice_states and intents.guild_reactions
+    assert not (intents.members or intents.presences or intents.message_content)
+    assert minimal["member_cache_flags"].voice
+    assert not minimal["member_cache_flags"].joined
+    assert not minimal["chunk_guilds_at_startup"]
+    assert minimal["max_messages"] is None
+
+    standard = build_client_options(constants.CLIENT_PROFILE_STANDARD)
+    assert standard["intents"].members and not standard["intents"].presences
+
+    with pytest.raises(ValueError):
+        build_client_options("unknown")
+
+
+@pytest.mark.asyncio
+async def test_display_names_fall_back_to_chunked_fetch(monkeypatch):
+    monkeypatch.setattr(constants, "MEMBER_FETCH_CHUNK_SIZE", 2)
+    cached = {1: SimpleNamespace(id=1, display_name="cached")}
+    queries: list[list[int]] = []
+
+    async def query_members(*, user_ids, limit, cache):
+        queries.append(list(user_ids))
+        assert limit == len(user_ids) and not cache
+        # ID 5 はギルドにいない
+        return [
+            SimpleNamespace(id=uid, display_name=f"fetched{uid}")
+            for uid in user_ids
+            if uid != 5
+        ]
+
+    guild = SimpleNamespace(id=1, get_member=cached.get, query_members=query_members)
+    cog = BotCommands(MagicMock(), MagicMock(), MagicMock())
+
+    names = await cog._get_member_display_names(guild, [1, 2, 3, 2, 4, 5])
+    assert names == ["cached", "fetched2", "fetched3", "fetched2", "fetched4", "5"]
+    assert queries == [[2, 3], [4, 5]]
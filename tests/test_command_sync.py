@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+from typing import Any
+
+import discord
+import pytest
+from discord import app_commands
+
+import command_sync
+
+
+def _make_tree() -> app_commands.CommandTree:
+    tree = app_commands.CommandTree(discord.Client(intents=discord.Intents.none()))
+
+    @tree.command(name="ping", description="応答を返します")
+    async def ping(interaction: discord.Interaction):
+        pass
+
+    return tree
+
+
+@pytest.mark.asyncio
+async def test_only_changed_guilds_are_synced(monkeypatch):
+    stored: dict[int, str] = {}
+    synced_guild_ids: list[int] = []
+
+    async def get_fingerprints():
+        return dict(stored)
+
+    async def set_fingerprints(fingerprints):
+        stored.update(fingerprints)
+        return True
+
+    monkeypatch.setattr(command_sync, "get_command_sync_fingerprints", get_fingerprints)
+    monkeypatch.setattr(command_sync, "set_command_sync_fingerprints", set_fingerprints)
+
+    tree = _make_tree()
+
+    async def fake_sync(*, guild=None):
+        if guild.id == 3:
+            raise RuntimeError("boom")
+        synced_guild_ids.append(guild.id)
+        return tree.get_commands(guild=guild)
+
+    monkeypatch.setattr(tree, "sync", fake_sync)
+    guilds: Any = [
+        SimpleNamespace(id=guild_id, name=f"g{guild_id}") for guild_id in (1, 2, 3)
+    ]
+
+    result = await command_sync.sync_guild_commands(tree, guilds, concurrency=2)
+    assert (result["synced"], result["skipped"], result["failed"]) == (2, 0, 1)
+    assert sorted(synced_guild_ids) == [1, 2]
+    assert set(stored) == {1, 2}
+
+    # 変更がなければ同期しない (失敗したギルドは再度同期する)
+    synced_guild_ids.clear()
+    result = await command_sync.sync_guild_commands(tree, guilds)
+    assert (result["synced"], result["skipped"], result["failed"]) == (0, 2, 1)
+    assert synced_guild_ids == []
+
+    # コマンドが変わったら全てのギルドを同期する
+    @tree.command(name="pong", description="応答を返します")
+    async def pong(interaction: discord.Interaction):
+        pass
+
+    result = await command_sync.sync_guild_commands(tree, guilds)
+    assert (result["synced"], result["skipped"], result["failed"]) == (2, 0, 1)
+    assert sorted(synced_guild_ids) == [1, 2]
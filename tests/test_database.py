@@ -0,0 +1,872 @@
+import asyncio
+import datetime
+import json
+
+import aiosqlite
+import pytest
+
+import config
+import database
+
+GUILD_ID = 1000
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "voice_stats.db")
+    monkeypatch.setattr(database, "DB_FILE", path)
+    monkeypatch.setattr(database, "_pool", database.DatabasePool(reader_count=2))
+    monkeypatch.setattr(database, "_write_buffer", database.StatsWriteBuffer())
+    monkeypatch.setattr(database, "_settings_cache", database.GuildSettingsCache())
+    monkeypatch.setattr(database, "_report_cache", database.ReportCache())
+    monkeypatch.setattr(config, "_server_notification_channels", {})
+    monkeypatch.setattr(config, "CHANNELS_FILE", str(tmp_path / "channels.json"))
+    return path
+
+
+def _write_channels_file(content: str):
+    with open(config.CHANNELS_FILE, "w") as f:
+        f.write(content)
+
+
+@pytest.mark.asyncio
+async def test_functions_route_through_pool(db_file):
+    await database.init_db()
+    try:
+        await database.update_member_monthly_stats(GUILD_ID, "2024-01", 1, 100)
+        await database.update_member_monthly_stats(GUILD_ID, "2024-01", 1, 50)
+        assert await database.get_total_call_time(1) == 150
+
+        stats = database.get_pool_stats()
+        assert stats["hits"] + stats["misses"] >= 3
+        assert stats["fallbacks"] == 0
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_writer_rolls_back_on_error(db_file):
+    await database.init_db()
+    try:
+        with pytest.raises(RuntimeError):
+            async with database.DatabaseConnection() as conn:
+                await conn.execute(
+                    "INSERT INTO mute_events (user_id, timestamp) VALUES (?, ?)",
+                    (1, "2024-01-01T00:00:00+00:00"),
+                )
+                raise RuntimeError("boom")
+        async with database.DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.execute("SELECT COUNT(*) FROM mute_events")
+            assert (await cursor.fetchone())[0] == 0
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_pool_close_waits_for_borrowed_readers(db_file):
+    await database.init_db()
+    holder = database.DatabaseConnection()
+    await holder.__aenter__()
+    reader = database.DatabaseConnection(readonly=True)
+    conn = await reader.__aenter__()
+    waiting_writer = asyncio.create_task(database._pool.acquire_writer())
+    await asyncio.sleep(0)
+    close = asyncio.create_task(database._pool.close())
+    await asyncio.sleep(0.01)
+    await holder.__aexit__(None, None, None)
+
+    try:
+        # 書き込み用接続を待っている間に閉じられた場合は、閉じた接続を渡さない
+        with pytest.raises(RuntimeError):
+            await waiting_writer
+        # 貸し出し中の読み取り用接続は、返却されるまで閉じない
+        await asyncio.sleep(0.01)
+        assert not close.done()
+        cursor = await conn.execute("SELECT COUNT(*) FROM mute_events")
+        assert tuple(await cursor.fetchone()) == (0,)
+    finally:
+        await reader.__aexit__(None, None, None)
+        await close
+    assert not database._pool.is_open
+
+
+@pytest.mark.asyncio
+async def test_init_db_enables_wal_and_checkpoints(db_file):
+    await database.init_db()
+    try:
+        async with database.DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.execute("PRAGMA journal_mode")
+            assert (await cursor.fetchone())[0] == "wal"
+
+        await database.increment_mute_count(GUILD_ID, 1)
+        busy, _log, _checkpointed = await database.checkpoint_wal("TRUNCATE")
+        assert busy == 0
+        assert database.get_pool_stats()["commit_count"] >= 1
+
+        with pytest.raises(ValueError):
+            await database.checkpoint_wal("BOGUS")
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_write_buffer_batches_and_flushes_on_close(db_file):
+    await database.init_db()
+    started = datetime.datetime(2024, 1, 5, 12, 0, tzinfo=datetime.timezone.utc)
+    await database.queue_member_monthly_stats(GUILD_ID, "2024-01", 1, 100)
+    await database.queue_member_monthly_stats(GUILD_ID, "2024-01", 1, 20)
+    await database.queue_member_monthly_stats(GUILD_ID, "2024-01", 2, 30)
+    await database.queue_voice_session(GUILD_ID, started, 120, [1, 2])
+
+    # バッファ内の未反映の値も総通話時間に含まれる
+    assert await database.get_total_call_time(1) == 120
+    assert await database.get_total_call_time_for_guild_members([1, 2, 3]) == {
+        1: 120,
+        2: 30,
+        3: 0,
+    }
+    commits_before = database.get_pool_stats()["commit_count"]
+
+    await database.close_db()
+
+    # 1回のコミットで全ての書き込みが反映される
+    assert database._pool.commit_count == commits_before + 1
+    assert await database.get_monthly_member_stats(GUILD_ID, "2024-01") == {
+        1: 120,
+        2: 30,
+    }
+    sessions = await database.get_monthly_voice_sessions(GUILD_ID, "2024-01")
+    assert len(sessions) == 1
+    assert sorted(sessions[0]["participants"]) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_write_buffer_drops_batch_after_max_retries(db_file, monkeypatch):
+    await database.init_db()
+    buffer = database.StatsWriteBuffer(max_retries=2)
+    started = datetime.datetime(2024, 1, 5, 12, 0, tzinfo=datetime.timezone.utc)
+    try:
+        # 書き込めない行は再試行の上限まではバッファに残る
+        insert_session = database.SQL_INSERT_SESSION
+        monkeypatch.setattr(
+            database, "SQL_INSERT_SESSION", "INSERT INTO missing VALUES (?, ?, ?, ?)"
+        )
+        await buffer.add_session(GUILD_ID, started, 60, [1])
+        with pytest.raises(aiosqlite.OperationalError):
+            await buffer.flush()
+        assert buffer.pending_count() == 1
+
+        # 上限に達したら破棄し、後から追加された書き込みは引き続き反映する
+        await buffer.add_monthly_stats(GUILD_ID, "2024-01", 1, 30)
+        with pytest.raises(aiosqlite.OperationalError):
+            await buffer.flush()
+        assert buffer.pending_count() == 0
+        assert buffer.dropped_count == 2
+
+        monkeypatch.setattr(database, "SQL_INSERT_SESSION", insert_session)
+        await buffer.add_monthly_stats(GUILD_ID, "2024-01", 1, 40)
+        await buffer.flush()
+        assert buffer.consecutive_failures == 0
+        assert await database.get_monthly_member_stats(GUILD_ID, "2024-01") == {1: 40}
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_lifetime_stats_backfilled_and_maintained(db_file):
+    # member_lifetime_stats が存在しない既存のデータベースを用意する
+    async with aiosqlite.connect(db_file) as conn:
+        await conn.execute(
+            "CREATE TABLE member_monthly_stats (month_key TEXT NOT NULL, member_id INTEGER NOT NULL, total_duration INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (month_key, member_id))"
+        )
+        await conn.executemany(
+            "INSERT INTO member_monthly_stats VALUES (?, ?, ?)",
+            [("2023-12", 1, 100), ("2024-01", 1, 50), ("2024-01", 2, 10)],
+        )
+        await conn.commit()
+
+    await database.init_db()
+    try:
+        assert await database.get_total_call_time(1) == 150
+        await database.update_member_monthly_stats(GUILD_ID, "2024-02", 1, 25)
+        await database.queue_member_monthly_stats(GUILD_ID, "2024-02", 2, 5)
+        await database.flush_write_buffer()
+        assert await database.get_total_call_time_for_guild_members([1, 2]) == {
+            1: 175,
+            2: 15,
+        }
+    finally:
+        await database.close_db()
+
+    # 2回目以降の初期化では再度埋め直さない
+    await database.init_db()
+    try:
+        assert await database.get_total_call_time(1) == 175
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_lifetime_stats_backfill_retried_when_not_recorded(db_file):
+    await database.init_db()
+    await database.update_member_monthly_stats(GUILD_ID, "2024-01", 1, 100)
+    await database.close_db()
+    # 以前の起動でテーブルだけが作成され、総通話時間が埋められなかった状態を用意する
+    async with aiosqlite.connect(db_file) as conn:
+        await conn.executescript("""
+            DELETE FROM member_lifetime_stats;
+            DELETE FROM schema_migrations WHERE name = 'backfill_member_lifetime_stats';
+        """)
+        await conn.commit()
+
+    await database.init_db()
+    try:
+        assert await database.get_total_call_time(1) == 100
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_guild_lifetime_stats_backfill_retried_when_not_recorded(db_file):
+    await database.init_db()
+    await database.update_member_monthly_stats(GUILD_ID, "2024-01", 1, 100)
+    await database.update_member_monthly_stats(GUILD_ID, "2024-02", 1, 20)
+    await database.close_db()
+    # 以前の起動でテーブルだけが作成され、累計通話時間が埋められなかった状態を用意する
+    async with aiosqlite.connect(db_file) as conn:
+        await conn.executescript("""
+            DELETE FROM member_guild_lifetime_stats;
+            DELETE FROM schema_migrations WHERE name = 'backfill_member_guild_lifetime_stats';
+        """)
+        await conn.commit()
+
+    await database.init_db()
+    try:
+        assert await database.get_member_call_time_rank(GUILD_ID, 1) == (1, 120)
+    finally:
+        await database.close_db()
+
+
+async def _query_plan(sql, params):
+    async with database.DatabaseConnection(readonly=True) as conn:
+        cursor = await conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return " | ".join(row[3] for row in await cursor.fetchall())
+
+
+@pytest.mark.asyncio
+async def test_report_queries_use_range_indexes(db_file):
+    await database.init_db()
+    try:
+        plan = await _query_plan(
+            database.SQL_GET_SESSIONS_IN_RANGE,
+            (GUILD_ID, *database._year_range("2024")),
+        )
+        assert (
+            "USING INDEX idx_sessions_guild_id_start_time (guild_id=? AND start_time>? AND start_time<?)"
+            in plan
+        )
+
+        plan = await _query_plan(
+            database.SQL_GET_MONTHLY_MUTE_COUNTS,
+            (GUILD_ID, *database._month_range("2024-12")),
+        )
+        assert (
+            "SEARCH mute_events USING INDEX idx_mute_events_guild_id_timestamp" in plan
+        )
+
+        plan = await _query_plan(
+            database.SQL_GET_MEMBER_TOTAL_STATS_IN_MONTH_RANGE,
+            (GUILD_ID, "2024-01", "2025-01"),
+        )
+        assert "(guild_id=? AND month_key>? AND month_key<?)" in plan
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_range_queries_match_previous_results(db_file):
+    await database.init_db()
+    try:
+        for start in (
+            datetime.datetime(2023, 12, 31, 23, 59, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2024, 1, 1, 0, 0, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2024, 12, 31, 23, 59, tzinfo=datetime.timezone.utc),
+        ):
+            await database.record_voice_session_to_db(GUILD_ID, start, 60, [1, 2])
+        await database.update_member_monthly_stats(GUILD_ID, "2023-12", 1, 10)
+        await database.update_member_monthly_stats(GUILD_ID, "2024-01", 1, 20)
+        await database.update_member_monthly_stats(GUILD_ID, "2024-12", 1, 30)
+        async with database.DatabaseConnection() as conn:
+            await conn.executemany(
+                "INSERT INTO mute_events (user_id, timestamp, guild_id) VALUES (?, ?, ?)",
+                [
+                    (1, "2024-11-30T23:59:59+00:00", GUILD_ID),
+                    (1, "2024-12-01T00:00:00+00:00", GUILD_ID),
+                    (2, "2024-12-31T23:59:59.999999+00:00", GUILD_ID),
+                    (2, "2025-01-01T00:00:00+00:00", GUILD_ID),
+                    (3, "2024-12-15T00:00:00+00:00", GUILD_ID + 1),
+                ],
+            )
+            await conn.commit()
+
+        assert len(await database.get_annual_voice_sessions(GUILD_ID, "2024")) == 2
+        assert await database.get_annual_member_total_stats(GUILD_ID, "2024") == {1: 50}
+        assert sorted(await database.get_monthly_mute_counts(GUILD_ID, "2024-12")) == [
+            (1, 1),
+            (2, 1),
+        ]
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_stats_are_partitioned_by_guild(db_file):
+    await database.init_db()
+    started = datetime.datetime(2024, 1, 5, 12, 0, tzinfo=datetime.timezone.utc)
+    try:
+        await database.queue_member_monthly_stats(GUILD_ID, "2024-01", 1, 100)
+        await database.queue_member_monthly_stats(GUILD_ID + 1, "2024-01", 1, 40)
+        await database.queue_member_monthly_stats(GUILD_ID + 1, "2024-01", 2, 30)
+        await database.queue_voice_session(GUILD_ID, started, 100, [1])
+        await database.queue_voice_session(GUILD_ID + 1, started, 40, [1, 2])
+        await database.flush_write_buffer()
+
+        assert await database.get_monthly_member_stats(GUILD_ID, "2024-01") == {1: 100}
+        assert await database.get_monthly_member_stats(GUILD_ID + 1, "2024-01") == {
+            1: 40,
+            2: 30,
+        }
+        sessions = await database.get_monthly_voice_sessions(GUILD_ID, "2024-01")
+        assert [s["duration"] for s in sessions] == [100]
+        assert len(await database.get_annual_voice_sessions(GUILD_ID + 1, "2024")) == 1
+        # 総通話時間はギルドをまたいで合計される
+        assert await database.get_total_call_time(1) == 140
+
+        plan = await _query_plan(
+            database.SQL_GET_MONTHLY_SESSIONS, (GUILD_ID, "2024-01")
+        )
+        assert (
+            "USING INDEX idx_sessions_guild_id_month_key (guild_id=? AND month_key=?)"
+            in plan
+        )
+        # member_monthly_stats は (guild_id, month_key, ...) のインデックスで対象ギルド・月の行だけを検索する
+        plan = await _query_plan(
+            database.SQL_GET_MONTHLY_MEMBER_STATS, (GUILD_ID, "2024-01")
+        )
+        assert "SEARCH member_monthly_stats USING" in plan
+        assert "(guild_id=? AND month_key=?)" in plan
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_legacy_rows_backfilled_from_notification_channel(db_file):
+    # guild_id を持たない旧スキーマのデータベースを用意する
+    async with aiosqlite.connect(db_file) as conn:
+        await conn.executescript("""
+            CREATE TABLE sessions (id INTEGER PRIMARY KEY AUTOINCREMENT, month_key TEXT NOT NULL, start_time TEXT NOT NULL, duration INTEGER NOT NULL);
+            CREATE TABLE session_participants (session_id INTEGER, member_id INTEGER NOT NULL, PRIMARY KEY (session_id, member_id));
+            CREATE TABLE member_monthly_stats (month_key TEXT NOT NULL, member_id INTEGER NOT NULL, total_duration INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (month_key, member_id));
+            INSERT INTO sessions (month_key, start_time, duration) VALUES ('2024-01', '2024-01-05T12:00:00+00:00', 60);
+            INSERT INTO session_participants VALUES (1, 1);
+            INSERT INTO member_monthly_stats VALUES ('2024-01', 1, 60);
+        """)
+        await conn.commit()
+    # 通知チャンネルは以前の設定ファイルから取り込まれる
+    await asyncio.to_thread(_write_channels_file, json.dumps({str(GUILD_ID): 1}))
+
+    await database.init_db()
+    try:
+        async with database.DatabaseConnection(readonly=True) as conn:
+            for table in ("sessions", "session_participants", "member_monthly_stats"):
+                cursor = await conn.execute(f"SELECT DISTINCT guild_id FROM {table}")
+                assert [row[0] for row in await cursor.fetchall()] == [GUILD_ID]
+
+        # 移行後も同じギルド・月・メンバーへの加算は1行にまとめられる
+        await database.update_member_monthly_stats(GUILD_ID, "2024-01", 1, 40)
+        assert await database.get_monthly_member_stats(GUILD_ID, "2024-01") == {1: 100}
+        sessions = await database.get_monthly_voice_sessions(GUILD_ID, "2024-01")
+        assert sessions[0]["participants"] == [1]
+        assert await database.get_monthly_member_stats(GUILD_ID + 1, "2024-01") == {}
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_unattributed_legacy_rows_visible_to_every_guild(db_file):
+    async with aiosqlite.connect(db_file) as conn:
+        await conn.execute(
+            "CREATE TABLE member_monthly_stats (month_key TEXT NOT NULL, member_id INTEGER NOT NULL, total_duration INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (month_key, member_id))"
+        )
+        await conn.execute("INSERT INTO member_monthly_stats VALUES ('2024-01', 1, 60)")
+        await conn.commit()
+
+    # 通知チャンネルが設定されたギルドがないため、既存の行はギルドを特定できない
+    await database.init_db()
+    try:
+        await database.update_member_monthly_stats(GUILD_ID, "2024-01", 1, 40)
+        assert await database.get_monthly_member_stats(GUILD_ID, "2024-01") == {1: 100}
+        assert await database.get_monthly_member_stats(GUILD_ID + 1, "2024-01") == {
+            1: 60
+        }
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_legacy_mute_rows_migrated_to_guild_partitioning(db_file):
+    async with aiosqlite.connect(db_file) as conn:
+        await conn.executescript("""
+            CREATE TABLE user_mute_stats (member_id INTEGER PRIMARY KEY, mute_count INTEGER NOT NULL DEFAULT 0);
+            CREATE TABLE mute_events (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, timestamp TEXT NOT NULL);
+            CREATE INDEX idx_user_mute_stats_ranking ON user_mute_stats (mute_count DESC, member_id);
+            INSERT INTO user_mute_stats VALUES (1, 2);
+            INSERT INTO mute_events (user_id, timestamp) VALUES (1, '2024-01-05T12:00:00+00:00');
+        """)
+        await conn.commit()
+
+    # 通知チャンネルが設定されたギルドがないため、既存の行はどのギルドの統計にも含める
+    await database.init_db()
+    try:
+        await database.increment_mute_count(GUILD_ID, 2)
+        await database.increment_mute_count(GUILD_ID + 1, 2)
+        await database.increment_mute_count(GUILD_ID + 1, 2)
+        assert await database.get_top_members_by_mute_count(GUILD_ID, 10) == [
+            (1, 2),
+            (2, 1),
+        ]
+        assert await database.get_top_members_by_mute_count(GUILD_ID + 1, 10) == [
+            (1, 2),
+            (2, 2),
+        ]
+        assert await database.get_mute_count(GUILD_ID, 1) == 2
+        assert await database.get_monthly_mute_counts(GUILD_ID, "2024-01") == [(1, 1)]
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_daily_rollup_maintained_on_session_write(db_file):
+    await database.init_db()
+    day1 = datetime.datetime(2024, 1, 5, 12, 0, tzinfo=datetime.timezone.utc)
+    day2 = datetime.datetime(2024, 1, 6, 12, 0, tzinfo=datetime.timezone.utc)
+    try:
+        await database.queue_voice_session(GUILD_ID, day1, 100, [1, 2])
+        await database.queue_voice_session(GUILD_ID, day1, 300, [1])
+        await database.queue_voice_session(GUILD_ID, day2, 300, [2])
+        await database.flush_write_buffer()
+        await database.record_voice_session_to_db(GUILD_ID, day2, 50, [3])
+        await database.record_voice_session_to_db(GUILD_ID + 1, day2, 900, [4])
+
+        summary = await database.get_monthly_session_summary(GUILD_ID, "2024-01")
+        assert summary["session_count"] == 4
+        assert summary["total_duration"] == 750
+        # 同じ期間のセッションは先に記録されたものを最長とする
+        assert summary["longest"]["duration"] == 300
+        assert summary["longest"]["start_time"] == day1.isoformat()
+
+        annual = await database.get_annual_session_summary(GUILD_ID, "2024")
+        assert annual == summary
+        empty = await database.get_monthly_session_summary(GUILD_ID, "2024-02")
+        assert empty["session_count"] == 0
+        assert empty["longest"] is None
+
+        async with database.DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.execute(
+                "SELECT COUNT(*) FROM daily_session_rollup WHERE guild_id = ?",
+                (GUILD_ID,),
+            )
+            assert (await cursor.fetchone())[0] == 2
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_daily_rollup_backfilled_from_existing_sessions(db_file):
+    async with aiosqlite.connect(db_file) as conn:
+        await conn.executescript(f"""
+            CREATE TABLE sessions (id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL DEFAULT 0, month_key TEXT NOT NULL, start_time TEXT NOT NULL, duration INTEGER NOT NULL);
+            INSERT INTO sessions (guild_id, month_key, start_time, duration) VALUES
+                ({GUILD_ID}, '2024-01', '2024-01-05T01:00:00+00:00', 60),
+                ({GUILD_ID}, '2024-01', '2024-01-05T02:00:00+00:00', 120),
+                ({GUILD_ID}, '2024-01', '2024-01-31T23:00:00+00:00', 120),
+                ({GUILD_ID}, '2024-02', '2024-02-01T00:00:00+00:00', 500);
+        """)
+        await conn.commit()
+
+    await database.init_db()
+    try:
+        summary = await database.get_monthly_session_summary(GUILD_ID, "2024-01")
+        assert summary["session_count"] == 3
+        assert summary["total_duration"] == 300
+        assert summary["longest"]["id"] == 2
+        annual = await database.get_annual_session_summary(GUILD_ID, "2024")
+        assert annual["session_count"] == 4
+        assert annual["longest"]["id"] == 4
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_daily_rollup_backfill_retried_after_failed_startup(db_file, monkeypatch):
+    await database.init_db()
+    await database.close_db()
+    # 以前の起動でテーブルだけが作成され、集計が埋められなかった状態を用意する
+    async with aiosqlite.connect(db_file) as conn:
+        await conn.executescript(f"""
+            INSERT INTO sessions (guild_id, month_key, start_time, duration) VALUES
+                ({GUILD_ID}, '2024-01', '2024-01-05T01:00:00+00:00', 60),
+                ({GUILD_ID}, '2024-01', '2024-01-06T01:00:00+00:00', 120);
+            DELETE FROM schema_migrations;
+        """)
+        await conn.commit()
+
+    # 集計を埋めた後、コミット前に起動が失敗した場合は何も反映されない
+    backfill = database._backfill_daily_session_rollup
+
+    async def failing_backfill(cursor):
+        await backfill(cursor)
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(database, "_backfill_daily_session_rollup", failing_backfill)
+    with pytest.raises(RuntimeError):
+        await database.init_db()
+    async with aiosqlite.connect(db_file) as conn:
+        cursor = await conn.execute("SELECT COUNT(*) FROM daily_session_rollup")
+        assert await cursor.fetchone() == (0,)
+        cursor = await conn.execute("SELECT COUNT(*) FROM schema_migrations")
+        assert await cursor.fetchone() == (0,)
+
+    # 次回の起動で集計を埋め直し、それ以降は再度埋めない
+    monkeypatch.setattr(database, "_backfill_daily_session_rollup", backfill)
+    for _ in range(2):
+        await database.init_db()
+        try:
+            summary = await database.get_monthly_session_summary(GUILD_ID, "2024-01")
+            assert summary["session_count"] == 2
+            assert summary["total_duration"] == 180
+        finally:
+            await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_guild_settings_served_from_cache(db_file, monkeypatch):
+    await database.init_db()
+    await database.update_guild_settings(GUILD_ID, lonely_timeout_minutes=7)
+    await database.close_db()
+
+    # 起動時に settings テーブルから読み込まれる
+    cache = database.GuildSettingsCache(max_size=2)
+    monkeypatch.setattr(database, "_settings_cache", cache)
+    await database.init_db()
+    try:
+        settings = await database.get_guild_settings(GUILD_ID)
+        assert settings["lonely_timeout_minutes"] == 7
+        assert cache.get_stats()["hits"] == 1
+
+        # 設定のないギルドはデフォルト値がキャッシュされ、更新時にライトスルーで置き換わる
+        await database.get_guild_settings(2)
+        await database.get_guild_settings(2)
+        await database.update_guild_settings(2, reaction_wait_minutes=9)
+        pool_stats = database.get_pool_stats()
+        settings = await database.get_guild_settings(2)
+        assert settings["reaction_wait_minutes"] == 9
+        assert (
+            settings["lonely_timeout_minutes"]
+            == database.constants.DEFAULT_LONELY_TIMEOUT_MINUTES
+        )
+        assert database.get_pool_stats() == pool_stats
+
+        # 上限を超えると最も長く使われていないギルドから破棄される
+        await database.get_guild_settings(3)
+        stats = cache.get_stats()
+        assert stats["size"] == 2
+        assert stats["evictions"] == 1
+        assert stats["misses"] == 2
+        assert stats["hit_rate"] == pytest.approx(4 / 6)
+    finally:
+        await database.close_db()
+
+
+def test_guild_settings_cache_ignores_stale_loads():
+    cache = database.GuildSettingsCache()
+    # 読み込み中に設定が書き込まれた場合、読み込み結果では上書きしない
+    generation = cache.generation
+    cache.put(GUILD_ID, {"lonely_timeout_minutes": 7})
+    cache.put(GUILD_ID, {"lonely_timeout_minutes": 1}, generation)
+    assert cache.get(GUILD_ID) == {"lonely_timeout_minutes": 7}
+
+    # 破棄された後の読み込み結果もキャッシュしない
+    generation = cache.generation
+    cache.invalidate(GUILD_ID)
+    cache.put(GUILD_ID, {"lonely_timeout_minutes": 1}, generation)
+    assert cache.get(GUILD_ID) is None
+
+    generation = cache.generation
+    cache.put(GUILD_ID, {"lonely_timeout_minutes": 3}, generation)
+    assert cache.get(GUILD_ID) == {"lonely_timeout_minutes": 3}
+
+
+@pytest.mark.asyncio
+async def test_notification_channels_stored_in_database(db_file):
+    await asyncio.to_thread(
+        _write_channels_file, json.dumps({str(GUILD_ID): 1, "2000": 2})
+    )
+
+    await database.init_db()
+    try:
+        assert config.get_notification_channel_id(GUILD_ID) == 1
+        assert await database.set_notification_channel(GUILD_ID, 3)
+        assert config.get_notification_channel_id(GUILD_ID) == 3
+    finally:
+        await database.close_db()
+
+    # 設定ファイルの取り込みは一度だけで、以降はデータベースの値が使われる
+    await asyncio.to_thread(_write_channels_file, json.dumps({str(GUILD_ID): 4}))
+    config.load_notification_channels({})
+    await database.init_db()
+    try:
+        assert config.get_notification_channel_id(GUILD_ID) == 3
+        assert sorted(config.get_notification_guild_ids()) == [GUILD_ID, 2000]
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_channels_file_import_retried_after_parse_error(db_file):
+    await asyncio.to_thread(_write_channels_file, "{not json")
+
+    # 読み込めなかった場合は取り込み済みとして記録しない
+    await database.init_db()
+    try:
+        assert config.get_notification_guild_ids() == []
+        assert await database.set_notification_channel(GUILD_ID, 3)
+    finally:
+        await database.close_db()
+
+    # 次回の起動で取り込み直す (コマンドで設定された値は上書きしない)
+    await asyncio.to_thread(
+        _write_channels_file, json.dumps({str(GUILD_ID): 1, "2000": 2})
+    )
+    config.load_notification_channels({})
+    await database.init_db()
+    try:
+        assert config.get_notification_channel_id(GUILD_ID) == 3
+        assert config.get_notification_channel_id(2000) == 2
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_report_cache_invalidated_by_stats_writes(db_file, monkeypatch):
+    await database.init_db()
+    try:
+        cache = database.ReportCache(ttl_seconds=0)
+        monkeypatch.setattr(database, "_report_cache", cache)
+        month = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m")
+        monthly = database.constants.REPORT_KIND_MONTHLY
+        ranking = database.constants.REPORT_KIND_RANKING
+        total = database.constants.REPORT_PERIOD_TOTAL
+
+        # 終わった月のレポートは期限切れにならない (今月分と累計は TTL で期限切れになる)
+        for guild_id, period, kind in [
+            (GUILD_ID, "2024-01", monthly),
+            (GUILD_ID, month, monthly),
+            (GUILD_ID, total, ranking),
+        ]:
+            database.cache_report(
+                guild_id, period, kind, "report", database.get_report_cache_generation()
+            )
+        assert database.get_cached_report(GUILD_ID, "2024-01", monthly) == "report"
+        assert database.get_cached_report(GUILD_ID, month, monthly) is None
+        assert database.get_cached_report(GUILD_ID, total, ranking) is None
+
+        cache.ttl_seconds = 3600
+        for guild_id in (GUILD_ID, GUILD_ID + 1):
+            database.cache_report(guild_id, month, monthly, "report", cache.generation)
+            database.cache_report(guild_id, total, ranking, "report", cache.generation)
+
+        # 通話時間の書き込みはコミット時に、そのギルドの月間統計とランキングを破棄する
+        generation = database.get_report_cache_generation()
+        await database.queue_member_monthly_stats(GUILD_ID, month, 1, 60)
+        assert database.get_cached_report(GUILD_ID, month, monthly) == "report"
+        await database.flush_write_buffer()
+        assert database.get_cached_report(GUILD_ID, month, monthly) is None
+        assert database.get_cached_report(GUILD_ID, total, ranking) is None
+        assert database.get_cached_report(GUILD_ID + 1, month, monthly) == "report"
+        assert database.get_cached_report(GUILD_ID + 1, total, ranking) == "report"
+
+        # 集計中に書き込みがあった場合はキャッシュしない
+        database.cache_report(GUILD_ID, month, monthly, "stale", generation)
+        assert database.get_cached_report(GUILD_ID, month, monthly) is None
+
+        # ミュート回数の加算はそのギルドのその月の月間統計とランキングだけを破棄する
+        await database.increment_mute_count(GUILD_ID + 1, 1)
+        assert database.get_cached_report(GUILD_ID + 1, month, monthly) is None
+        assert database.get_cached_report(GUILD_ID + 1, total, ranking) is None
+        assert database.get_cached_report(GUILD_ID, "2024-01", monthly) == "report"
+        assert cache.get_stats()["hits"] == 5
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_top_k_rankings_and_own_rank(db_file):
+    await database.init_db()
+    try:
+        for member_id, duration in [(1, 300), (2, 100), (3, 200), (4, 200)]:
+            await database.update_member_monthly_stats(
+                GUILD_ID, "2024-01", member_id, duration
+            )
+        await database.update_member_monthly_stats(GUILD_ID, "2024-02", 2, 500)
+        await database.update_member_monthly_stats(GUILD_ID + 1, "2024-01", 5, 900)
+
+        assert await database.get_top_members_by_call_time(GUILD_ID, 3, "2024-01") == [
+            (1, 300),
+            (3, 200),
+            (4, 200),
+        ]
+        # 累計はギルドごとの全期間の合計で並べる
+        assert await database.get_top_members_by_call_time(GUILD_ID, 2) == [
+            (2, 600),
+            (1, 300),
+        ]
+        assert await database.get_member_call_time_rank(GUILD_ID, 4, "2024-01") == (
+            2,
+            200,
+        )
+        assert await database.get_member_call_time_rank(GUILD_ID, 2, "2024-01") == (
+            4,
+            100,
+        )
+        assert await database.get_member_call_time_rank(GUILD_ID, 5) == (None, 0)
+
+        async with database.DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.execute(
+                "EXPLAIN QUERY PLAN " + database.SQL_TOTAL_CALL_TIME_RANKING["top"],
+                (GUILD_ID, 10),
+            )
+            plan = " ".join(row[3] for row in await cursor.fetchall())
+        assert "idx_member_guild_lifetime_stats_ranking" in plan
+        assert "TEMP B-TREE" not in plan
+
+        for member_id in (1, 2, 2, 3, 3, 3):
+            await database.increment_mute_count(GUILD_ID, member_id)
+        # 他のギルドのミュート回数はランキングに含めない
+        for _ in range(5):
+            await database.increment_mute_count(GUILD_ID + 1, 4)
+        assert await database.get_top_members_by_mute_count(GUILD_ID, 2) == [
+            (3, 3),
+            (2, 2),
+        ]
+        month = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m")
+        assert await database.get_top_members_by_mute_count(GUILD_ID, 1, month) == [
+            (3, 3)
+        ]
+        assert await database.get_mute_count(GUILD_ID, 4) == 0
+        assert await database.get_mute_count(GUILD_ID + 1, 4) == 5
+
+        async with database.DatabaseConnection(readonly=True) as conn:
+            cursor = await conn.execute(
+                "EXPLAIN QUERY PLAN " + database.SQL_GET_TOP_TOTAL_MUTE_COUNTS,
+                (GUILD_ID, 10),
+            )
+            plan = " ".join(row[3] for row in await cursor.fetchall())
+        assert "idx_user_mute_stats_ranking" in plan
+        assert "TEMP B-TREE" not in plan
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_rankings_include_unattributed_legacy_rows(db_file):
+    await database.init_db()
+    try:
+        await database.update_member_monthly_stats(
+            database.constants.UNATTRIBUTED_GUILD_ID, "2024-01", 1, 50
+        )
+        await database.update_member_monthly_stats(GUILD_ID, "2024-01", 1, 20)
+        await database.update_member_monthly_stats(GUILD_ID, "2024-01", 2, 60)
+    finally:
+        await database.close_db()
+
+    # ギルドIDを持たない行がある場合は、メンバーごとに合計してから並べる
+    await database.init_db()
+    try:
+        assert await database.get_top_members_by_call_time(GUILD_ID, 10, "2024-01") == [
+            (1, 70),
+            (2, 60),
+        ]
+        assert await database.get_member_call_time_rank(GUILD_ID, 2) == (2, 60)
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_session_participants_fetched_in_chunks(db_file, monkeypatch):
+    await database.init_db()
+    try:
+        started = datetime.datetime(2024, 3, 1, tzinfo=datetime.timezone.utc)
+        for i in range(5):
+            await database.queue_voice_session(
+                GUILD_ID, started + datetime.timedelta(days=i), 10 * (i + 1), [i, 100]
+            )
+        await database.flush_write_buffer()
+
+        # 参加者は chunk 件ずつ取得する (IN 句の変数の数が上限を超えない)
+        monkeypatch.setattr(database.constants, "SESSION_PARTICIPANTS_CHUNK_SIZE", 2)
+        sessions = await database.get_annual_voice_sessions(GUILD_ID, "2024")
+        assert [session["duration"] for session in sessions] == [10, 20, 30, 40, 50]
+        assert [sorted(session["participants"]) for session in sessions] == [
+            [i, 100] for i in range(5)
+        ]
+        assert (
+            await database.get_monthly_voice_sessions(GUILD_ID, "2024-03") == sessions
+        )
+        participants = await database.get_participants_by_session_ids(
+            [session["id"] for session in sessions]
+        )
+        assert len(participants) == 5
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_command_sync_fingerprints_round_trip(db_file):
+    await database.init_db()
+    try:
+        assert await database.get_command_sync_fingerprints() == {}
+        assert await database.set_command_sync_fingerprints({1: "a", 2: "b"})
+        assert await database.set_command_sync_fingerprints({2: "c"})
+        assert await database.get_command_sync_fingerprints() == {1: "a", 2: "c"}
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_session_snapshot_scoped_to_owned_shards(db_file):
+    # シャード数 2 のとき、(guild_id >> 22) % 2 でシャードが決まる
+    shard0_guild = 2 << 22
+    shard1_guild = 3 << 22
+    snapshot_at = "2024-01-01T00:00:00+00:00"
+    await database.init_db()
+    try:
+        assert await database.save_session_snapshot(
+            [(shard0_guild, 10, 100.0), (shard1_guild, 20, 100.0)],
+            [],
+            [],
+            snapshot_at,
+        )
+        # シャード0を担当するプロセスはシャード0のスナップショットだけを置き換える
+        assert await database.save_session_snapshot(
+            [(shard0_guild, 11, 200.0)], [], [], snapshot_at, ([0], 2)
+        )
+        all_sessions = (await database.load_session_snapshot())["sessions"]
+        assert sorted(row[:2] for row in all_sessions) == [
+            (shard0_guild, 11),
+            (shard1_guild, 20),
+        ]
+        shard1_sessions = (await database.load_session_snapshot(([1], 2)))["sessions"]
+        assert [row[:2] for row in shard1_sessions] == [(shard1_guild, 20)]
+    finally:
+        await database.close_db()
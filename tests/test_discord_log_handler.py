@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import discord
+import pytest
+
+import constants
+import discord_log_handler
+from discord_log_handler import DiscordHandler
+from formatters import create_log_embed
+
+
+class FakeWebhook:
+    def __init__(self, failures: list[Exception] | None = None):
+        self.calls: list[list[discord.Embed]] = []
+        self.failures = failures or []
+
+    async def send(self, embeds):
+        self.calls.append(list(embeds))
+        if self.failures:
+            raise self.failures.pop(0)
+
+
+def _make_handler(monkeypatch, webhook: FakeWebhook) -> Any:
+    monkeypatch.setenv(
+        "DISCORD_WEBHOOK_URL", "https://discord.com/api/webhooks/1/token"
+    )
+    handler = DiscordHandler(SimpleNamespace(loop=asyncio.get_running_loop()))
+    monkeypatch.setattr(handler, "_get_webhook", lambda url: webhook)
+    return handler
+
+
+def _record(n: int) -> logging.LogRecord:
+    return logging.LogRecord(
+        "test", logging.WARNING, __file__, 1, f"warning {n}", None, None
+    )
+
+
+@pytest.mark.asyncio
+async def test_logs_are_sent_in_batches_of_embeds(monkeypatch):
+    webhook = FakeWebhook()
+    handler = _make_handler(monkeypatch, webhook)
+
+    for n in range(25):
+        handler.emit(_record(n))
+    # 同じメッセージは送信しない
+    handler.emit(_record(24))
+    await asyncio.sleep(0)
+    await handler._flush_task
+
+    assert [len(embeds) for embeds in webhook.calls] == [10, 10, 5]
+    assert webhook.calls[0][0].description == "```\nwarning 0\n```"
+    stats = handler.get_stats()
+    assert stats["webhook_calls"] == 3
+    assert stats["records_sent"] == 25
+    assert stats["buffered"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_batch_is_retried_after_retry_after(monkeypatch):
+    response = SimpleNamespace(
+        status=429, reason="Too Many Requests", headers={"Retry-After": "0.05"}
+    )
+    webhook = FakeWebhook([discord.HTTPException(response, "rate limited")])
+    handler = _make_handler(monkeypatch, webhook)
+
+    started = time.monotonic()
+    for n in range(3):
+        handler.add_to_buffer(create_log_embed(_record(n)))
+    await handler.flush_buffer()
+
+    assert time.monotonic() - started >= 0.05
+    assert len(webhook.calls) == 2
+    assert [e.description for e in webhook.calls[0]] == [
+        e.description for e in webhook.calls[1]
+    ]
+    stats = handler.get_stats()
+    assert stats["rate_limited"] == 1
+    assert stats["records_sent"] == 3
+    await handler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_buffer_drops_oldest_logs_when_full(monkeypatch):
+    handler = _make_handler(monkeypatch, FakeWebhook())
+
+    for n in range(constants.LOG_BUFFER_MAX_SIZE + 5):
+        handler.add_to_buffer(create_log_embed(_record(n)))
+
+    assert len(handler.buffer) == constants.LOG_BUFFER_MAX_SIZE
+    assert handler.buffer[0].description == "```\nwarning 5\n```"
+    assert handler.get_stats()["dropped"] == 5
+
+
+@pytest.mark.asyncio
+async def test_records_are_formatted_on_listener_thread(monkeypatch):
+    webhook = FakeWebhook()
+    handler = _make_handler(monkeypatch, webhook)
+    threads: list[threading.Thread] = []
+
+    def recording_create_log_embed(record):
+        threads.append(threading.current_thread())
+        return create_log_embed(record)
+
+    monkeypatch.setattr(
+        discord_log_handler, "create_log_embed", recording_create_log_embed
+    )
+    logger = logging.getLogger("test.discord_log_handler")
+    logger.propagate = False
+    handler.start(logger)
+    try:
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            for _ in range(3):
+                logger.exception("voice event failed")
+        logger.info("not sent")
+    finally:
+        await handler.aclose()
+
+    # 重複したメッセージと WARNING 未満のログは送信されない
+    assert [len(embeds) for embeds in webhook.calls] == [1]
+    assert "RuntimeError: boom" in str(webhook.calls[0][0].fields[-1].value)
+    assert threads and threading.main_thread() not in threads
+    assert not logger.handlers
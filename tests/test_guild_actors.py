@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from guild_actors import GuildActors
+
+
+@pytest.mark.asyncio
+async def test_events_are_ordered_per_guild_and_parallel_across_guilds():
+    actors = GuildActors("test")
+    order: list[tuple[int, int]] = []
+    release = asyncio.Event()
+
+    async def handler(guild_id, n):
+        if guild_id == 1 and n == 0:
+            # ギルド1の最初のイベントが終わるまで、ギルド1の後続イベントは処理されない
+            await release.wait()
+        order.append((guild_id, n))
+
+    try:
+        for n in range(3):
+            actors.submit(1, handler, 1, n)
+        assert actors.queue_depth(1) == 3
+        actors.submit(2, handler, 2, 0)
+        await asyncio.sleep(0.01)
+        # ギルド1が止まっていても、ギルド2は処理される
+        assert order == [(2, 0)]
+
+        release.set()
+        await actors.join()
+        assert order == [(2, 0), (1, 0), (1, 1), (1, 2)]
+
+        stats = actors.get_stats()
+        assert stats[1]["processed"] == 3
+        assert stats[1]["max_depth"] == 3
+        assert stats[1]["depth"] == 0
+        assert stats[2]["processed"] == 1
+        assert stats[1]["max_latency"] >= stats[2]["max_latency"]
+    finally:
+        await actors.stop()
+
+
+@pytest.mark.asyncio
+async def test_failing_event_does_not_stop_worker():
+    actors = GuildActors("test")
+    done: list[int] = []
+
+    async def handler(n):
+        if n == 0:
+            raise RuntimeError("boom")
+        done.append(n)
+
+    try:
+        actors.submit(1, handler, 0)
+        actors.submit(1, handler, 1)
+        await actors.join()
+        assert done == [1]
+        assert actors.get_stats()[1]["failed"] == 1
+    finally:
+        await actors.stop()
+
+
+@pytest.mark.asyncio
+async def test_run_waits_for_result_on_guild_queue():
+    actors = GuildActors("test")
+    order: list[str] = []
+
+    async def handler(name):
+        order.append(name)
+        return name.upper()
+
+    async def failing():
+        raise ValueError("boom")
+
+    try:
+        actors.submit(1, handler, "queued")
+        # 先に追加されたイベントの後に処理され、結果が返される
+        assert await actors.run(1, handler, "run") == "RUN"
+        assert order == ["queued", "run"]
+        with pytest.raises(ValueError):
+            await actors.run(1, failing)
+    finally:
+        await actors.stop()
+
+
+@pytest.mark.asyncio
+async def test_idle_worker_is_reaped_and_restarted():
+    actors = GuildActors("test")
+    actors.IDLE_TIMEOUT_SECONDS = 0.01
+    done: list[int] = []
+
+    async def handler(n):
+        done.append(n)
+
+    try:
+        actors.submit(1, handler, 0)
+        await actors.join()
+        await asyncio.sleep(0.05)
+        # キューが空のまま一定時間が経過したワーカーとキューは削除される
+        assert actors._workers == {}
+        assert actors._queues == {}
+
+        # 次のイベントでワーカーを再び開始し、計測値は引き継ぐ
+        actors.submit(1, handler, 1)
+        await actors.join()
+        assert done == [0, 1]
+        assert actors.get_stats()[1]["processed"] == 2
+    finally:
+        await actors.stop()
@@ -0,0 +1,94 @@
+import importlib
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import MagicMock
+
+import aiosqlite
+import discord
+import pytest
+
+import config
+import database
+from commands import BotCommands
+from voice_state_manager import (
+    BotStatusUpdater,
+    CallNotificationManager,
+    StatisticalSessionManager,
+    VoiceStateManager,
+)
+
+GUILD_ID = 1000
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "voice_stats.db")
+    monkeypatch.setattr(database, "DB_FILE", path)
+    monkeypatch.setattr(database, "_pool", database.DatabasePool(reader_count=2))
+    monkeypatch.setattr(database, "_write_buffer", database.StatsWriteBuffer())
+    monkeypatch.setattr(database, "_settings_cache", database.GuildSettingsCache())
+    monkeypatch.setattr(database, "_report_cache", database.ReportCache())
+    monkeypatch.setattr(config, "_server_notification_channels", {})
+    monkeypatch.setattr(config, "CHANNELS_FILE", str(tmp_path / "channels.json"))
+    return path
+
+
+@pytest.fixture
+def main_module(monkeypatch):
+    monkeypatch.setenv("DISCORD_BOT_TOKEN", "token")
+    monkeypatch.delenv("BOT_SHARD_MODE", raising=False)
+    monkeypatch.delenv("SHARD_COUNT", raising=False)
+    monkeypatch.delenv("SHARD_IDS", raising=False)
+    return importlib.import_module("main")
+
+
+@pytest.mark.asyncio
+async def test_close_saves_snapshot_before_cogs_are_removed(main_module, db_file):
+    await database.init_db()
+    bot = main_module.NotificationBot(
+        command_prefix="!", intents=discord.Intents.none()
+    )
+    session_manager = StatisticalSessionManager(bot)
+    voice_state_manager = VoiceStateManager(
+        bot,
+        CallNotificationManager(bot),
+        session_manager,
+        BotStatusUpdater(bot, session_manager),
+    )
+    channel: Any = SimpleNamespace(
+        id=10, members=[SimpleNamespace(id=1), SimpleNamespace(id=2)]
+    )
+    session_manager.start_session(GUILD_ID, channel)
+    await bot.add_cog(BotCommands(bot, MagicMock(), voice_state_manager))
+
+    await bot.close()
+
+    assert bot.get_cog("BotCommands") is None
+    async with aiosqlite.connect(db_file) as conn:
+        cursor = await conn.execute(
+            "SELECT guild_id, channel_id FROM active_session_snapshots"
+        )
+        assert await cursor.fetchall() == [(GUILD_ID, 10)]
+
+
+@pytest.mark.asyncio
+async def test_registered_tasks_started_once_across_reconnects(main_module, db_file):
+    await database.init_db()
+    bot = main_module.NotificationBot(
+        command_prefix="!", intents=discord.Intents.none()
+    )
+    tasks_cog = main_module.BotTasks(bot, MagicMock())
+    await bot.add_cog(tasks_cog)
+    try:
+        # 再接続で on_ready が再度呼ばれても、開始済みのループを開始し直さない
+        main_module._start_registered_tasks(bot)
+        main_module._start_registered_tasks(bot)
+
+        assert tasks_cog.wal_checkpoint_task.is_running()
+        assert tasks_cog.session_snapshot_task.is_running()
+        assert tasks_cog.session_consistency_task.is_running()
+    finally:
+        tasks_cog.wal_checkpoint_task.cancel()
+        tasks_cog.session_snapshot_task.cancel()
+        tasks_cog.session_consistency_task.cancel()
+        await database.close_db()
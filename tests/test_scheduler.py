@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from scheduler import TimerScheduler
+
+
+@pytest.mark.asyncio
+async def test_timers_fire_in_deadline_order():
+    scheduler = TimerScheduler()
+    fired = []
+
+    async def record(name):
+        fired.append(name)
+
+    try:
+        scheduler.schedule("late", 0.05, record, "late")
+        scheduler.schedule("early", 0.01, record, "early")
+        assert scheduler.pending_count() == 2
+        await asyncio.sleep(0.1)
+        assert fired == ["early", "late"]
+        assert scheduler.pending_count() == 0
+        assert scheduler.fired_count == 2
+    finally:
+        await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_reschedule_replaces_and_cancel_discards():
+    scheduler = TimerScheduler()
+    fired = []
+
+    async def record(name):
+        fired.append(name)
+
+    try:
+        scheduler.schedule("lonely", 0.01, record, "first")
+        # 同じキーで再スケジュールすると前のタイマーは実行されない
+        scheduler.schedule("lonely", 0.03, record, "second")
+        scheduler.schedule("unmute", 0.01, record, "unmute")
+        assert scheduler.cancel("unmute")
+        assert not scheduler.cancel("unmute")
+        assert scheduler.pending_count() == 1
+        assert scheduler.is_scheduled("lonely")
+
+        await asyncio.sleep(0.02)
+        assert fired == []
+        await asyncio.sleep(0.03)
+        assert fired == ["second"]
+    finally:
+        await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_many_reschedules_keep_heap_bounded():
+    scheduler = TimerScheduler()
+
+    async def noop():
+        pass
+
+    try:
+        for _ in range(1000):
+            for channel_id in range(10):
+                scheduler.schedule(("lonely", channel_id), 60, noop)
+        assert scheduler.pending_count() == 10
+        assert len(scheduler._heap) <= 10 + 2 * TimerScheduler.COMPACT_THRESHOLD
+    finally:
+        await scheduler.stop()
+    assert scheduler.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_failing_callback_does_not_stop_scheduler():
+    scheduler = TimerScheduler()
+    fired = []
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def record():
+        fired.append(True)
+
+    try:
+        scheduler.schedule("fail", 0, fail)
+        scheduler.schedule("ok", 0.02, record)
+        await asyncio.sleep(0.05)
+        assert fired == [True]
+    finally:
+        await scheduler.stop()
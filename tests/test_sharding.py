@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import pytest
+
+import constants
+from sharding import ShardConfig, get_shard_scope, guilds_by_shard, parse_shard_ids
+
+
+def test_parse_shard_ids():
+    assert parse_shard_ids("0-2, 5,1") == [0, 1, 2, 5]
+    with pytest.raises(ValueError):
+        parse_shard_ids("3-1")
+
+
+def test_shard_config_from_env(monkeypatch):
+    monkeypatch.delenv("BOT_SHARD_MODE", raising=False)
+    monkeypatch.delenv("SHARD_COUNT", raising=False)
+    monkeypatch.delenv("SHARD_IDS", raising=False)
+    config = ShardConfig.from_env()
+    assert not config.is_sharded
+    assert config.bot_options() == {}
+
+    monkeypatch.setenv("SHARD_COUNT", "4")
+    monkeypatch.setenv("SHARD_IDS", "2-3")
+    config = ShardConfig.from_env()
+    assert config.mode == constants.SHARD_MODE_AUTO
+    assert config.bot_options() == {"shard_count": 4, "shard_ids": [2, 3]}
+
+    monkeypatch.setenv("SHARD_IDS", "4")
+    with pytest.raises(ValueError):
+        ShardConfig.from_env()
+
+
+def test_guilds_are_grouped_by_owned_shard():
+    guilds = [
+        SimpleNamespace(id=guild_id, shard_id=shard_id)
+        for guild_id, shard_id in ((1, 0), (2, 1), (3, 1), (4, 2))
+    ]
+    bot = SimpleNamespace(guilds=guilds, shard_ids=[0, 1], shard_count=4)
+    assert get_shard_scope(bot) == ([0, 1], 4)
+    grouped = guilds_by_shard(bot)
+    assert {shard_id: [g.id for g in gs] for shard_id, gs in grouped.items()} == {
+        0: [1],
+        1: [2, 3],
+    }
+
+    # シャーディングしていない Bot は全てのギルドを担当する
+    unsharded = SimpleNamespace(guilds=guilds[:2], shard_ids=None, shard_count=None)
+    assert get_shard_scope(unsharded) is None
+    assert [g.id for g in guilds_by_shard(unsharded)[0]] == [1]
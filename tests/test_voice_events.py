@@ -0,0 +1,296 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+import constants
+import voice_events
+import voice_state_manager
+from scheduler import TimerScheduler
+
+
+def _payload(message_id, user_id, emoji=constants.REACTION_EMOJI_SLEEP_CHECK):
+    return SimpleNamespace(message_id=message_id, user_id=user_id, emoji=emoji)
+
+
+@pytest.mark.asyncio
+async def test_raw_reaction_resolves_sleep_check_by_message_id(monkeypatch):
+    manager = voice_events.SleepCheckManager(MagicMock())
+    on_reacted = AsyncMock()
+    monkeypatch.setattr(manager, "_on_sleep_check_reacted", on_reacted)
+    monkeypatch.setattr(manager, "_on_reaction_timeout", AsyncMock())
+    settings = {"reaction_wait_minutes": 5}
+    try:
+        with patch.object(
+            voice_events, "get_guild_settings", AsyncMock(return_value=settings)
+        ):
+            await manager.start_reaction_wait(100, 1, 10, 20, 30)
+        assert manager.scheduler.is_scheduled(("reaction", 100))
+
+        # 関係のないメッセージ、別のユーザー、別の絵文字のリアクションは無視する
+        await manager.handle_raw_reaction(_payload(999, 1))
+        await manager.handle_raw_reaction(_payload(100, 2))
+        await manager.handle_raw_reaction(_payload(100, 1, emoji="👍"))
+        on_reacted.assert_not_awaited()
+        assert 100 in manager.sleep_check_messages
+
+        await manager.handle_raw_reaction(_payload(100, 1))
+        on_reacted.assert_awaited_once_with(100, 1, 10, 20, 30)
+        assert 100 not in manager.sleep_check_messages
+        assert manager.scheduler.pending_count() == 0
+    finally:
+        await manager.scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_reaction_timeout_after_cancel_does_nothing():
+    bot = MagicMock()
+    manager = voice_events.SleepCheckManager(bot)
+    settings = {"reaction_wait_minutes": 5}
+    try:
+        with patch.object(
+            voice_events, "get_guild_settings", AsyncMock(return_value=settings)
+        ):
+            await manager.start_reaction_wait(100, 1, 10, 20, 30)
+        assert manager.cancel_sleep_check(100) is not None
+        await manager._on_reaction_timeout(100, 1, 10, 30)
+        bot.get_guild.assert_not_called()
+    finally:
+        await manager.scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_seeds_sessions_from_voice_channels():
+    def channel(channel_id, *member_ids):
+        return SimpleNamespace(
+            id=channel_id, members=[SimpleNamespace(id=m) for m in member_ids]
+        )
+
+    bot = MagicMock()
+    bot.guilds = [
+        SimpleNamespace(
+            id=1,
+            voice_channels=[channel(10, 100, 101), channel(11, 102), channel(12)],
+        ),
+        SimpleNamespace(id=2, voice_channels=[channel(20, 200)]),
+    ]
+    call_manager = voice_state_manager.CallNotificationManager(bot)
+    session_manager = voice_state_manager.StatisticalSessionManager(bot)
+    status_updater = MagicMock()
+    state_manager = voice_state_manager.VoiceStateManager(
+        bot, call_manager, session_manager, status_updater
+    )
+    sleep_manager = voice_events.SleepCheckManager(bot)
+    sleep_manager.bot_muted_members.append(200)
+    cog = voice_events.VoiceEvents(bot, sleep_manager, state_manager)
+    settings = {"lonely_timeout_minutes": 180}
+    try:
+        with patch.object(
+            voice_events, "get_guild_settings", AsyncMock(return_value=settings)
+        ):
+            await cog.bootstrap_voice_states()
+
+        assert set(call_manager.call_sessions[1]) == {10, 11}
+        assert set(call_manager.call_sessions[2]) == {20}
+        assert session_manager.get_active_session_keys() == [(1, 10)]
+        status_updater.add_active_channel.assert_called_once_with(1, 10)
+        # ボットがミュートしたメンバーには寝落ち確認を開始しない
+        assert set(sleep_manager.lonely_voice_channels) == {(1, 11)}
+        assert sleep_manager.scheduler.is_scheduled(("lonely", 1, 11))
+    finally:
+        await sleep_manager.scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_coalescer_collapses_bursts_into_net_transition():
+    scheduler = TimerScheduler()
+    dispatch = AsyncMock()
+    coalescer = voice_events.VoiceEventCoalescer(scheduler, dispatch, 0.05)
+    member = SimpleNamespace(id=1, guild=SimpleNamespace(id=10))
+    other = SimpleNamespace(id=2, guild=SimpleNamespace(id=10))
+
+    def state(channel):
+        return SimpleNamespace(channel=channel)
+
+    try:
+        # 最初のイベントはすぐに処理する
+        await coalescer.submit(member, state(None), state("A"))
+        dispatch.assert_awaited_once()
+        # 窓の間の移動・退出は、A からの退出1回にまとめる
+        await coalescer.submit(member, state("A"), state("B"))
+        await coalescer.submit(member, state("B"), state(None))
+        # 別のメンバーのイベントはまとめない
+        await coalescer.submit(other, state(None), state("A"))
+        assert dispatch.await_count == 2
+
+        await asyncio.sleep(0.2)
+        assert dispatch.await_count == 3
+        _, before, after = dispatch.await_args_list[-1].args
+        assert (before.channel, after.channel) == ("A", None)
+
+        await coalescer.submit(member, state(None), state("C"))
+        await asyncio.sleep(0.2)
+        await coalescer.submit(member, state("C"), state(None))
+        assert dispatch.await_count == 5
+        # 退出直後の入室・退出は打ち消し合うため何も処理しない
+        await coalescer.submit(member, state(None), state("D"))
+        await coalescer.submit(member, state("D"), state(None))
+        await asyncio.sleep(0.2)
+        assert dispatch.await_count == 5
+
+        assert coalescer.get_stats() == {
+            "received": 8,
+            "dispatched": 5,
+            "coalesced": 3,
+            "open_windows": 0,
+        }
+    finally:
+        await scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_session_end_uses_event_member_for_milestone():
+    bot = MagicMock()
+    cog = voice_events.VoiceEvents(
+        bot, voice_events.SleepCheckManager(bot), MagicMock()
+    )
+    # 退出したメンバーはキャッシュから削除されているため get_member では見つからない
+    guild = MagicMock(id=10)
+    guild.get_member.return_value = None
+    member = MagicMock(id=1, guild=guild)
+    join_time = voice_events.datetime.datetime(2024, 1, 1)
+    notify = AsyncMock()
+    try:
+        with (
+            patch.object(
+                voice_events,
+                "get_total_call_time_for_guild_members",
+                AsyncMock(return_value={1: 100}),
+            ),
+            patch.object(voice_events, "queue_member_monthly_stats", AsyncMock()),
+            patch.object(cog, "_check_and_notify_milestone", notify),
+            patch.object(
+                voice_events.config, "get_notification_channel_id", return_value=None
+            ),
+        ):
+            await cog._process_session_end_data(
+                guild, [(1, 50, join_time), (2, 30, join_time)], member
+            )
+
+        notify.assert_awaited_once_with(member, guild, 100, 150, None)
+        guild.get_member.assert_called_once_with(2)
+    finally:
+        await cog.sleep_check_manager.scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_lonely_check_skipped_when_cleared_while_sending(monkeypatch):
+    bot = MagicMock()
+    manager = voice_events.SleepCheckManager(bot)
+    channel = SimpleNamespace(id=20, name="voice", members=[SimpleNamespace(id=1)])
+    guild = MagicMock()
+    guild.get_channel.return_value = channel
+    bot.get_guild.return_value = guild
+    message = MagicMock(id=100, add_reaction=AsyncMock())
+
+    # 送信中にメンバーが退出し、一人以下の状態が解除される
+    async def send(embed):
+        await manager.remove_lonely_channel(10, 20)
+        return message
+
+    bot.get_channel.return_value = MagicMock(send=send)
+    delete_message = AsyncMock()
+    monkeypatch.setattr(manager, "_delete_sleep_check_message", delete_message)
+    start_reaction_wait = AsyncMock()
+    monkeypatch.setattr(manager, "start_reaction_wait", start_reaction_wait)
+    try:
+        with patch.object(
+            voice_events,
+            "get_guild_settings",
+            AsyncMock(return_value={"lonely_timeout_minutes": 5}),
+        ):
+            await manager.start_lonely_check(10, 20, 1, 30)
+        await manager.check_lonely_channel(10, 20, 1, 30)
+        start_reaction_wait.assert_not_awaited()
+        delete_message.assert_awaited_once_with(100, 30)
+
+        # 解除済みの状態でタイマーの処理がキューから実行されても何もしない
+        bot.get_guild.reset_mock()
+        await manager.check_lonely_channel(10, 20, 1, 30)
+        bot.get_guild.assert_not_called()
+    finally:
+        await manager.scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_sleep_check_timers_and_reactions_run_on_guild_actor(monkeypatch):
+    bot = MagicMock()
+    manager = voice_events.SleepCheckManager(bot)
+    cog = voice_events.VoiceEvents(bot, manager, MagicMock())
+    submit = MagicMock()
+    monkeypatch.setattr(cog.guild_actors, "submit", submit)
+    try:
+        await manager.run_in_guild(10, manager.check_lonely_channel, 10, 20, 1, 30)
+        submit.assert_called_once_with(10, manager.check_lonely_channel, 10, 20, 1, 30)
+
+        # 寝落ち確認メッセージ以外へのリアクションはキューに追加しない
+        await cog.on_raw_reaction_add(_payload(999, 1))
+        assert submit.call_count == 1
+        manager.sleep_check_messages[100] = {"guild_id": 10, "member_id": 1}
+        payload = _payload(100, 1)
+        await cog.on_raw_reaction_add(payload)
+        submit.assert_called_with(10, manager.handle_raw_reaction, payload)
+    finally:
+        await manager.scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test_cog_unload_flushes_coalesced_events(monkeypatch):
+    bot = MagicMock()
+    cog = voice_events.VoiceEvents(
+        bot, voice_events.SleepCheckManager(bot), MagicMock()
+    )
+    processed = []
+
+    async def dispatch(member, before, after):
+        await asyncio.sleep(0.01)
+        processed.append((before.channel, after.channel))
+
+    monkeypatch.setattr(cog, "_dispatch_voice_state_update", dispatch)
+    member = SimpleNamespace(id=1, guild=SimpleNamespace(id=10))
+
+    def state(channel):
+        return SimpleNamespace(channel=channel)
+
+    await cog.voice_event_coalescer.submit(member, state(None), state("A"))
+    await cog.voice_event_coalescer.submit(member, state("A"), state("B"))
+    # 窓の終わりを待たずに停止しても、まとめていたイベントとキューのイベントを処理してから停止する
+    await cog.cog_unload()
+    assert processed == [(None, "A"), ("A", "B")]
+    assert cog.voice_event_coalescer.get_stats()["open_windows"] == 0
+
+
+@pytest.mark.asyncio
+async def test_unmute_on_channel_active_runs_on_guild_actor(monkeypatch):
+    bot = MagicMock()
+    manager = voice_events.SleepCheckManager(bot)
+    state_manager = MagicMock()
+    state_manager.notify_member_joined = AsyncMock(return_value=[])
+    cog = voice_events.VoiceEvents(bot, manager, state_manager)
+    submit = MagicMock()
+    monkeypatch.setattr(cog.guild_actors, "submit", submit)
+    muted = SimpleNamespace(id=2)
+    manager.bot_muted_members.append(muted.id)
+    member = SimpleNamespace(id=1, guild=SimpleNamespace(id=10))
+    channel = SimpleNamespace(id=20, name="vc", members=[member, muted])
+    try:
+        await cog._handle_join(member, channel)
+
+        # ミュート解除は追跡されないタスクではなく、ギルドのキューで処理する
+        submit.assert_called_once()
+        guild_id, handler, target = submit.call_args.args
+        assert (guild_id, target) == (10, muted)
+        assert handler.__name__ == "unmute_existing_member"
+    finally:
+        await manager.scheduler.stop()
@@ -0,0 +1,221 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+import config
+import database
+import voice_state_manager
+from guild_actors import GuildActors
+from voice_state_manager import (
+    BotStatusUpdater,
+    CallNotificationManager,
+    CallSession,
+    StatisticalSessionManager,
+    VoiceSession,
+    VoiceStateManager,
+)
+
+GUILD_ID = 1000
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "voice_stats.db")
+    monkeypatch.setattr(database, "DB_FILE", path)
+    monkeypatch.setattr(database, "_pool", database.DatabasePool(reader_count=2))
+    monkeypatch.setattr(database, "_write_buffer", database.StatsWriteBuffer())
+    monkeypatch.setattr(database, "_settings_cache", database.GuildSettingsCache())
+    monkeypatch.setattr(database, "_report_cache", database.ReportCache())
+    monkeypatch.setattr(config, "_server_notification_channels", {})
+    monkeypatch.setattr(config, "CHANNELS_FILE", str(tmp_path / "channels.json"))
+    return path
+
+
+def _make_manager(channels):
+    bot = MagicMock()
+    bot.get_channel.side_effect = channels.get
+    call_manager = CallNotificationManager(bot)
+    session_manager = StatisticalSessionManager(bot)
+    status_updater = BotStatusUpdater(bot, session_manager)
+    status_updater.add_active_channel = MagicMock()  # type: ignore[method-assign]
+    return VoiceStateManager(bot, call_manager, session_manager, status_updater)
+
+
+def _channel(*member_ids, channel_id=0) -> Any:
+    return SimpleNamespace(
+        id=channel_id, members=[SimpleNamespace(id=m) for m in member_ids]
+    )
+
+
+@pytest.mark.asyncio
+async def test_sessions_restored_from_snapshot_and_reconciled(db_file):
+    await database.init_db()
+    try:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        start_time = now - datetime.timedelta(hours=1)
+        start = start_time.timestamp()
+        before = _make_manager({})
+        sessions = before.statistical_session_manager.active_voice_sessions
+        # チャンネル10: 1, 2, 3 が通話中 (停止中に 3 が退出し、4 が参加する)
+        sessions[(GUILD_ID, 10)] = VoiceSession(
+            start, {1: start, 2: start, 3: start}, {1, 2, 3, 9}
+        )
+        # チャンネル20: 停止中に全員が退出する
+        sessions[(GUILD_ID, 20)] = VoiceSession(start, {5: start, 6: start}, {5, 6})
+        before.call_notification_manager.call_sessions[GUILD_ID] = {
+            10: CallSession(start, 1),
+            20: CallSession(start, 5),
+        }
+        assert await before.save_snapshot()
+
+        after = _make_manager({10: _channel(1, 2, 4), 20: _channel()})
+        await after.restore_from_snapshot()
+
+        restored = after.statistical_session_manager.active_voice_sessions
+        assert list(restored) == [(GUILD_ID, 10)]
+        session = restored[(GUILD_ID, 10)]
+        assert session.session_start == start
+        assert session.current_members[1] == start
+        assert session.current_members[2] == start
+        assert session.current_members[4] > start
+        assert session.all_participants == {1, 2, 3, 4, 9}
+        assert after.call_notification_manager.call_sessions == {
+            GUILD_ID: {10: CallSession(start, 1)}
+        }
+        after.bot_status_updater.add_active_channel.assert_called_once_with(  # type: ignore[attr-defined]
+            GUILD_ID, 10
+        )
+
+        # 停止中に終わったセッションと退出したメンバーは、スナップショット時刻までの時間で記録される
+        await database.flush_write_buffer()
+        stats = await database.get_monthly_member_stats(
+            GUILD_ID, start_time.strftime("%Y-%m")
+        )
+        assert set(stats) == {3, 5, 6}
+        assert all(3590 <= stats[m] <= 3610 for m in stats)
+        summary = await database.get_session_summary(
+            GUILD_ID, start_time.strftime("%Y-%m-%d"), "9999-12-31"
+        )
+        assert summary["session_count"] == 1
+
+        # 復元後の状態で保存し直されているため、再度復元しても二重に記録されない
+        again = _make_manager({10: _channel(1, 2, 4), 20: _channel()})
+        await again.restore_from_snapshot()
+        await database.flush_write_buffer()
+        assert (
+            await database.get_monthly_member_stats(
+                GUILD_ID, start_time.strftime("%Y-%m")
+            )
+            == stats
+        )
+    finally:
+        await database.close_db()
+
+
+def test_update_session_members_uses_session_records():
+    manager = StatisticalSessionManager(MagicMock())
+    manager.start_session(GUILD_ID, _channel(1, 2, channel_id=10))
+    session = manager.active_voice_sessions[(GUILD_ID, 10)]
+    assert isinstance(session, VoiceSession)
+
+    ended = manager.update_session_members(GUILD_ID, _channel(2, 3, channel_id=10))
+    assert [member_id for member_id, _, _ in ended] == [1]
+    _member_id, duration, join_time = ended[0]
+    assert duration >= 0
+    assert join_time.timestamp() == pytest.approx(session.session_start)
+    assert set(session.current_members) == {2, 3}
+    assert session.all_participants == {1, 2, 3}
+    assert manager.add_member(GUILD_ID, 10, 3) is None
+    assert manager.add_member(GUILD_ID, 10, 4)[0] == 4
+
+
+@pytest.mark.asyncio
+async def test_member_deltas_and_periodic_drift_check(db_file):
+    await database.init_db()
+    try:
+        channel = _channel(1, 2, 3, channel_id=10)
+        bot = MagicMock()
+        bot.get_channel.side_effect = {10: channel}.get
+        manager = StatisticalSessionManager(bot)
+        manager.start_session(GUILD_ID, channel)
+        session = manager.active_voice_sessions[(GUILD_ID, 10)]
+
+        # 参加・退出はチャンネルのメンバー一覧を見ずに、対象メンバーだけを更新する
+        assert manager.add_member(GUILD_ID, 10, 4) is not None
+        ended = manager.remove_member(GUILD_ID, 10, 1)
+        assert [member_id for member_id, _, _ in ended] == [1]
+        assert manager.remove_member(GUILD_ID, 10, 1) == []
+        assert set(session.current_members) == {2, 3, 4}
+
+        # 実際のチャンネルは 2, 3, 5 (4 の退出と 5 の参加を取りこぼした状態)
+        channel.members = _channel(2, 3, 5).members
+        assert await manager.reconcile_sessions() == 2
+        assert set(session.current_members) == {2, 3, 5}
+        assert manager.drift_count == 2
+        assert await manager.reconcile_sessions() == 0
+
+        await database.flush_write_buffer()
+        stats = await database.get_monthly_member_stats(
+            GUILD_ID, datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m")
+        )
+        assert set(stats) == {4}
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_drift_check_ends_sessions_below_minimum(db_file):
+    await database.init_db()
+    try:
+        channel = _channel(1, 2, channel_id=10)
+        manager = _make_manager({10: channel})
+        session_manager = manager.statistical_session_manager
+        status_updater = manager.bot_status_updater
+        session_manager.start_session(GUILD_ID, channel)
+        status_updater.active_status_channels.add((GUILD_ID, 10))
+
+        # 2 の退出を取りこぼし、チャンネルには 1 だけが残っている
+        # 整合性チェックはボイスステート更新と同じギルドのキューで処理される
+        manager.guild_actors = GuildActors("test")
+        channel.members = _channel(1).members
+        assert await manager.check_session_consistency() == 1
+        assert manager.guild_actors.get_stats()[GUILD_ID]["processed"] == 1
+        await manager.guild_actors.stop()
+        assert not session_manager.is_session_active(GUILD_ID, 10)
+        assert status_updater.active_status_channels == set()
+
+        # 退出したメンバーと残っていたメンバーの通話時間、セッション全体が記録される
+        await database.flush_write_buffer()
+        month = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m")
+        stats = await database.get_monthly_member_stats(GUILD_ID, month)
+        assert set(stats) == {1, 2}
+        summary = await database.get_monthly_session_summary(GUILD_ID, month)
+        assert summary["session_count"] == 1
+    finally:
+        await database.close_db()
+
+
+@pytest.mark.asyncio
+async def test_end_session_records_once_when_ended_concurrently(monkeypatch):
+    queued = []
+
+    async def queue_voice_session(*args):
+        # 書き込みバッファのフラッシュで処理が切り替わる場合を再現する
+        await asyncio.sleep(0)
+        queued.append(args)
+
+    monkeypatch.setattr(voice_state_manager, "queue_voice_session", queue_voice_session)
+    manager = StatisticalSessionManager(MagicMock())
+    channel = _channel(1, 2, channel_id=10)
+    manager.start_session(GUILD_ID, channel)
+
+    first, second = await asyncio.gather(
+        manager.end_session(GUILD_ID, channel), manager.end_session(GUILD_ID, channel)
+    )
+    assert len(queued) == 1
+    assert len(first) == 2
+    assert second == []
@@ -2,12 +2,14 @@ import discord
 import datetime
 import asyncio
 import logging
+import time
+from dataclasses import dataclass
 from discord.ext import commands  # Cog を使用するためにインポート
 
 from database import (
-    get_total_call_time,
+    get_total_call_time_for_guild_members,
     get_guild_settings,
-    update_member_monthly_stats,
+    queue_member_monthly_stats,
     increment_mute_count,
     add_active_muted_member,
     remove_active_muted_member,
@@ -15,6 +17,8 @@ from database import (
 )
 import config
 from voice_state_manager import VoiceStateManager
+from scheduler import TimerScheduler
+from guild_actors import GuildActors
 import formatters
 import constants
 
@@ -22,21 +26,168 @@ import constants
 logger = logging.getLogger(__name__)
 
 
+@dataclass(slots=True)
+class LonelyChannel:
+    """一人以下の状態になった通話チャンネルの記録。start_time はエポック秒。"""
+
+    start_time: float
+    member_id: int
+
+
+@dataclass(slots=True)
+class _CoalesceWindow:
+    """1メンバーのボイスステート更新をまとめる窓。"""
+
+    lock: asyncio.Lock
+    # 窓の間に届いたイベントの正味の遷移 (最初のイベントの before と最後のイベントの after)
+    member: discord.Member | None = None
+    before: discord.VoiceState | None = None
+    after: discord.VoiceState | None = None
+    event_count: int = 0
+
+
+class VoiceEventCoalescer:
+    """
+    (guild_id, member_id) ごとにボイスステート更新をまとめ、短時間の連続したイベントを1つの正味の遷移にします。
+
+    窓が閉じている時に届いたイベントはすぐに処理し、そこから window_seconds の窓を開きます。
+    窓の間に届いたイベントはまとめ、窓の終わりに最初の before から最後の after への遷移として一度だけ処理します。
+    チャンネルの出入りが打ち消し合う場合 (入室してすぐ退出など) は処理しません。
+    同じメンバーのイベントは lock により届いた順に dispatch に渡されるため、通話時間の計算順序は変わりません。
+    """
+
+    def __init__(
+        self,
+        scheduler: TimerScheduler,
+        dispatch,
+        window_seconds: float = constants.VOICE_EVENT_COALESCE_WINDOW_SECONDS,
+    ):
+        self.scheduler = scheduler
+        self._dispatch = dispatch
+        self.window_seconds = window_seconds
+        self._windows: dict[tuple[int, int], _CoalesceWindow] = {}
+        self.received_count = 0
+        self.dispatched_count = 0
+        self.coalesced_count = 0
+
+    def get_stats(self) -> dict:
+        """受信・処理・まとめたイベントの件数を返します。"""
+        return {
+            "received": self.received_count,
+            "dispatched": self.dispatched_count,
+            "coalesced": self.coalesced_count,
+            "open_windows": len(self._windows),
+        }
+
+    async def submit(self, member, before, after):
+        self.received_count += 1
+        if self.window_seconds <= 0:
+            await self._run_dispatch(member, before, after)
+            return
+
+        key = (member.guild.id, member.id)
+        window = self._windows.get(key)
+        if window is not None:
+            # 窓が開いている間のイベントはまとめ、窓の終わりに処理する
+            if window.event_count == 0:
+                window.before = before
+            window.member = member
+            window.after = after
+            window.event_count += 1
+            return
+
+        window = _CoalesceWindow(asyncio.Lock())
+        self._windows[key] = window
+        self._schedule_close(key)
+        async with window.lock:
+            await self._run_dispatch(member, before, after)
+
+    def _schedule_close(self, key: tuple[int, int]):
+        self.scheduler.schedule(
+            ("voice_event", *key), self.window_seconds, self._close_window, key
+        )
+
+    async def _close_window(self, key: tuple[int, int]):
+        window = self._windows.get(key)
+        if window is None:
+            return
+        if window.event_count == 0:
+            # 窓の間にイベントがなければ窓を閉じる
+            del self._windows[key]
+            return
+        # 処理中に届くイベントに備えて次の窓を開く
+        self._schedule_close(key)
+        await self._dispatch_window(key, window)
+
+    async def flush(self):
+        """
+        開いている全ての窓を閉じ、まとめていたイベントの正味の遷移を処理します。
+        終了時に、窓の終わりを待たずに残りのイベントを処理するために呼び出されます。
+        """
+        for key in list(self._windows):
+            self.scheduler.cancel(("voice_event", *key))
+            window = self._windows.pop(key)
+            await self._dispatch_window(key, window)
+
+    async def _dispatch_window(self, key: tuple[int, int], window: _CoalesceWindow):
+        # 窓の間にまとめたイベントの正味の遷移を処理する
+        member, before, after = window.member, window.before, window.after
+        event_count = window.event_count
+        window.member = window.before = window.after = None
+        window.event_count = 0
+
+        if before is None or after is None:
+            return
+        async with window.lock:
+            if before.channel is None and after.channel is None:
+                # 入室と退出が打ち消し合ったため、何も処理しない
+                self.coalesced_count += event_count
+                logger.debug(
+                    f"Dropped {event_count} voice state updates for member {key[1]} in guild {key[0]} that cancelled out."
+                )
+                return
+            self.coalesced_count += event_count - 1
+            logger.debug(
+                f"Coalesced {event_count} voice state updates for member {key[1]} in guild {key[0]} into one transition."
+            )
+            await self._run_dispatch(member, before, after)
+
+    async def _run_dispatch(self, member, before, after):
+        self.dispatched_count += 1
+        await self._dispatch(member, before, after)
+
+
 class SleepCheckManager:
     def __init__(self, bot):
         self.bot = bot
         logger.info("SleepCheckManager initialized.")
-        # 一人以下の状態になった通話チャンネルとその時刻、メンバー、関連タスクを記録する辞書
-        # キー: (guild_id, voice_channel_id), 値: {"start_time": datetimeオブジェクト, "member_id": int, "task": asyncio.Task}
-        self.lonely_voice_channels = {}
-
-        # 寝落ち確認メッセージとそれに対するリアクション監視タスクを記録する辞書
-        # キー: message_id, 値: {"member_id": int, "task": asyncio.Task, "channel_id": int, "notification_channel_id": int}
+        # 一人以下の状態になった通話チャンネルとその時刻、メンバーを記録する辞書
+        # キー: (guild_id, voice_channel_id), 値: LonelyChannel
+        # 寝落ち確認までの待機はスケジューラのタイマー ("lonely", guild_id, voice_channel_id) で管理する
+        self.lonely_voice_channels: dict[tuple[int, int], LonelyChannel] = {}
+
+        # リアクション待ちの寝落ち確認メッセージを記録する辞書
+        # キー: message_id, 値: {"member_id": int, "guild_id": int, "channel_id": int, "notification_channel_id": int}
+        # リアクションは on_raw_reaction_add で message_id から引き当て、タイムアウトはスケジューラのタイマー ("reaction", message_id) で管理する
         self.sleep_check_messages = {}
 
         # ボットがサーバーミュートしたメンバーのIDを記録するリスト
         self.bot_muted_members = []
 
+        # 寝落ち確認、リアクション待ちのタイムアウト、ミュート解除の遅延を管理するスケジューラ
+        self.scheduler = TimerScheduler()
+
+        # ボイスステート更新を処理するギルドごとのキュー (VoiceEvents が設定する)
+        # 設定されている場合、タイマーの処理はボイスステート更新と同じキューで順番に処理する
+        self.guild_actors: GuildActors | None = None
+
+    # タイマーの期限に達した処理をギルドのキューに追加する (キューがなければその場で実行する)
+    async def run_in_guild(self, guild_id: int, handler, *args):
+        if self.guild_actors is None:
+            await handler(*args)
+            return
+        self.guild_actors.submit(guild_id, handler, *args)
+
     # メッセージを削除するヘルパー関数
     async def _delete_sleep_check_message(
         self, message_id: int, notification_channel_id: int | None
@@ -84,34 +235,59 @@ class SleepCheckManager:
             await remove_active_muted_member(member_id)
             logger.info(f"Removed member {member_id} from bot_muted_members.")
 
-    # lonely_voice_channels にチャンネルを追加するヘルパー関数
-    def add_lonely_channel(
-        self, guild_id: int, channel_id: int, member_id: int, task: asyncio.Task
+    # lonely_voice_channels にチャンネルを追加し、寝落ち確認のタイマーを登録するヘルパー関数
+    async def start_lonely_check(
+        self,
+        guild_id: int,
+        channel_id: int,
+        member_id: int,
+        notification_channel_id: int | None,
     ):
         key = (guild_id, channel_id)
-        self.lonely_voice_channels[key] = {
-            "start_time": datetime.datetime.now(datetime.timezone.utc),
-            "member_id": member_id,
-            "task": task,
-        }
+        entry = LonelyChannel(time.time(), member_id)
+        self.lonely_voice_channels[key] = entry
         logger.info(
             f"Channel {channel_id} ({guild_id}) has one or fewer members. Member: {member_id}"
         )
+        timeout_seconds = await self._get_lonely_timeout_seconds(guild_id)
+        # 設定の取得中に一人以下の状態が解除された場合はタイマーを登録しない
+        if self.lonely_voice_channels.get(key) is not entry:
+            return
+        self.scheduler.schedule(
+            ("lonely", guild_id, channel_id),
+            timeout_seconds,
+            self.run_in_guild,
+            guild_id,
+            self.check_lonely_channel,
+            guild_id,
+            channel_id,
+            member_id,
+            notification_channel_id,
+        )
+        logger.debug(
+            f"Scheduled sleep check for channel {channel_id} ({guild_id}) in {timeout_seconds} seconds. Pending timers: {self.scheduler.pending_count()}"
+        )
+
+    # リアクション待ちを終了し、タイムアウトのタイマーをキャンセルするヘルパー関数
+    # 終了したメッセージの記録を返す (メッセージの削除は呼び出し元で行う)
+    def cancel_sleep_check(self, message_id: int) -> dict | None:
+        self.scheduler.cancel(("reaction", message_id))
+        data = self.sleep_check_messages.pop(message_id, None)
+        if data is not None:
+            logger.debug(f"Removed message {message_id} from sleep_check_messages.")
+        return data
 
     # lonely_voice_channels からチャンネルを削除するヘルパー関数
+    # リアクション待ちを終了した寝落ち確認メッセージの (message_id, notification_channel_id) のリストを返す
     async def remove_lonely_channel(
-        self, guild_id: int, channel_id: int, cancel_task: bool = True
-    ):
+        self, guild_id: int, channel_id: int
+    ) -> list[tuple[int, int | None]]:
         key = (guild_id, channel_id)
+        cancelled_messages: list[tuple[int, int | None]] = []
         if key in self.lonely_voice_channels:
-            if (
-                cancel_task
-                and self.lonely_voice_channels[key]["task"]
-                and not self.lonely_voice_channels[key]["task"].cancelled()
-            ):
-                self.lonely_voice_channels[key]["task"].cancel()
+            if self.scheduler.cancel(("lonely", guild_id, channel_id)):
                 logger.debug(
-                    f"Cancelled lonely state task for channel {channel_id} ({guild_id})."
+                    f"Cancelled lonely state timer for channel {channel_id} ({guild_id})."
                 )
 
             # このチャンネルに関連付けられたリアクション監視タスクもキャンセルし、メッセージを削除
@@ -121,23 +297,27 @@ class SleepCheckManager:
                 if (
                     data.get("channel_id") == channel_id
                     and data.get("member_id")
-                    == self.lonely_voice_channels[key]["member_id"]
+                    == self.lonely_voice_channels[key].member_id
                 ):
-                    if data["task"] and not data["task"].cancelled():
-                        data["task"].cancel()
-                        logger.info(
-                            f"Cancelled reaction monitoring task for message {message_id} in channel {channel_id} ({guild_id})."
-                        )
                     message_ids_to_remove.append(message_id)
 
             for message_id in message_ids_to_remove:
-                # タスクはキャンセルしたが、メッセージの削除と sleep_check_messages からの削除は呼び出し元で行う
-                logger.debug(f"Task for message {message_id} cancelled.")
+                # リアクション待ちは終了するが、メッセージの削除は呼び出し元で行う
+                data = self.cancel_sleep_check(message_id)
+                if data is not None:
+                    cancelled_messages.append(
+                        (message_id, data.get("notification_channel_id"))
+                    )
+                logger.info(
+                    f"Cancelled reaction monitoring for message {message_id} in channel {channel_id} ({guild_id})."
+                )
 
             self.lonely_voice_channels.pop(key)
             logger.info(f"Removed lonely state for channel {channel_id} ({guild_id}).")
+        return cancelled_messages
 
     # --- 寝落ち確認とミュート処理 ---
+    # start_lonely_check で登録したタイマーの期限に達した時に呼び出される
     async def check_lonely_channel(
         self,
         guild_id: int,
@@ -146,18 +326,22 @@ class SleepCheckManager:
         notification_channel_id: int | None,
     ):
         logger.info(
-            f"Starting lonely state check for channel {channel_id} ({guild_id}). Member: {member_id}"
+            f"Lonely state timeout reached for channel {channel_id} ({guild_id}). Member: {member_id}"
         )
-        timeout_seconds = await self._get_lonely_timeout_seconds(guild_id)
-        logger.debug(f"Configured timeout: {timeout_seconds} seconds")
-        await asyncio.sleep(timeout_seconds)  # 設定された時間待機
+        key = (guild_id, channel_id)
+        entry = self.lonely_voice_channels.get(key)
+        # キューで待っている間に一人以下の状態が解除された場合は何もしない
+        if entry is None or entry.member_id != member_id:
+            logger.debug(
+                f"Lonely state for channel {channel_id} ({guild_id}) was cleared before the check. Skipping."
+            )
+            return
 
         # 再度チャンネルの状態を確認
         guild = self.bot.get_guild(guild_id)
         if not guild:
             logger.warning(f"Guild {guild_id} not found. Ending lonely state check.")
             # タスクが完了したので lonely_voice_channels から削除
-            key = (guild_id, channel_id)
             if key in self.lonely_voice_channels:
                 self.lonely_voice_channels.pop(key)
             return
@@ -167,9 +351,7 @@ class SleepCheckManager:
             logger.info(
                 f"Channel {channel_id} does not exist or member {member_id} is not in the channel. Ending lonely state check."
             )
-            await self.remove_lonely_channel(
-                guild_id, channel_id, cancel_task=False
-            )  # タスク自体は完了しているのでキャンセルは不要
+            await self.remove_lonely_channel(guild_id, channel_id)
             return
 
         # チャンネルに一人だけ残っている、または複数人だが最初に一人になったメンバーがまだいる場合
@@ -196,24 +378,23 @@ class SleepCheckManager:
                             f"Sent sleep check message to channel {notification_channel_id}. Message ID: {message.id}"
                         )
 
-                        # リアクション監視タスクを開始
-                        reaction_task = asyncio.create_task(
-                            self.wait_for_reaction(
-                                message.id,
-                                member_id,
-                                guild_id,
-                                channel_id,
-                                notification_channel_id,
+                        # 送信中に一人以下の状態が解除された場合は、リアクション待ちを開始せずにメッセージを削除する
+                        if self.lonely_voice_channels.get(key) is not entry:
+                            logger.info(
+                                f"Lonely state for channel {channel_id} ({guild_id}) was cleared while sending the sleep check message. Deleting message {message.id}."
                             )
-                        )
-                        self.sleep_check_messages[message.id] = {
-                            "member_id": member_id,
-                            "channel_id": channel_id,
-                            "task": reaction_task,
-                            "notification_channel_id": notification_channel_id,
-                        }
-                        logger.debug(
-                            f"Started reaction monitoring task. Message ID: {message.id}, Channel ID: {channel_id}, Notification Channel ID: {notification_channel_id}"
+                            await self._delete_sleep_check_message(
+                                message.id, notification_channel_id
+                            )
+                            return
+
+                        # リアクション待ちを開始
+                        await self.start_reaction_wait(
+                            message.id,
+                            member_id,
+                            guild_id,
+                            channel_id,
+                            notification_channel_id,
                         )
 
                     except discord.Forbidden:
@@ -221,7 +402,6 @@ class SleepCheckManager:
                             f"Error: No permission to send messages to channel {notification_channel.name} ({notification_channel_id})."
                         )
                         # メッセージ送信失敗時も lonely_voice_channels から削除
-                        key = (guild_id, channel_id)
                         if key in self.lonely_voice_channels:
                             self.lonely_voice_channels.pop(key)
                     except Exception as e:
@@ -229,7 +409,6 @@ class SleepCheckManager:
                             f"An error occurred while sending sleep check message: {e}"
                         )
                         # メッセージ送信失敗時も lonely_voice_channels から削除
-                        key = (guild_id, channel_id)
                         if key in self.lonely_voice_channels:
                             self.lonely_voice_channels.pop(key)
                 else:
@@ -237,7 +416,6 @@ class SleepCheckManager:
                         f"Member {member_id} not found. Removing from lonely state management."
                     )
                     # メンバーが見つからない場合も状態管理から削除
-                    key = (guild_id, channel_id)
                     if key in self.lonely_voice_channels:
                         self.lonely_voice_channels.pop(key)
             else:
@@ -245,7 +423,6 @@ class SleepCheckManager:
                     f"Notification channel not found: Guild ID {guild_id}. Removing from lonely state management."
                 )
                 # 通知チャンネルがない場合も状態管理から削除
-                key = (guild_id, channel_id)
                 if key in self.lonely_voice_channels:
                     self.lonely_voice_channels.pop(key)
         else:
@@ -253,11 +430,11 @@ class SleepCheckManager:
                 f"Notification channel not set for guild {guild.name} ({guild_id}). Cannot send sleep check message. Removing from lonely state management."
             )
             # 通知チャンネルが設定されていない場合も状態管理から削除
-            key = (guild_id, channel_id)
             if key in self.lonely_voice_channels:
                 self.lonely_voice_channels.pop(key)
 
-    async def wait_for_reaction(
+    # 寝落ち確認メッセージを記録し、リアクション待ちのタイムアウトを登録する
+    async def start_reaction_wait(
         self,
         message_id: int,
         member_id: int,
@@ -268,160 +445,198 @@ class SleepCheckManager:
         logger.info(
             f"Starting reaction monitoring for message {message_id}. Member: {member_id}"
         )
+        self.sleep_check_messages[message_id] = {
+            "member_id": member_id,
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "notification_channel_id": notification_channel_id,
+        }
         settings = await get_guild_settings(guild_id)
         wait_seconds = settings["reaction_wait_minutes"] * constants.SECONDS_PER_MINUTE
         logger.debug(f"Configured reaction wait time: {wait_seconds} seconds")
+        # 設定の取得中にリアクション待ちが終了した場合はタイマーを登録しない
+        if message_id not in self.sleep_check_messages:
+            return
+        # 期限に達したら _on_reaction_timeout でミュートする
+        self.scheduler.schedule(
+            ("reaction", message_id),
+            wait_seconds,
+            self.run_in_guild,
+            guild_id,
+            self._on_reaction_timeout,
+            message_id,
+            member_id,
+            guild_id,
+            notification_channel_id,
+        )
+        logger.debug(
+            f"Started reaction monitoring. Message ID: {message_id}, Channel ID: {channel_id}, Notification Channel ID: {notification_channel_id}"
+        )
 
-        try:
-            # 指定された絵文字、ユーザーからのリアクションを待つ
-            def check(reaction, user):
-                return (
-                    user.id == member_id
-                    and str(reaction.emoji) == constants.REACTION_EMOJI_SLEEP_CHECK
-                    and reaction.message.id == message_id
-                )
+    # on_raw_reaction_add から呼び出され、寝落ち確認メッセージへのリアクションであればミュートをキャンセルする
+    # メッセージキャッシュに依存しないよう、生のペイロードの message_id で sleep_check_messages を引き当てる
+    async def handle_raw_reaction(self, payload: discord.RawReactionActionEvent):
+        data = self.sleep_check_messages.get(payload.message_id)
+        if data is None:
+            return
+        if (
+            payload.user_id != data["member_id"]
+            or str(payload.emoji) != constants.REACTION_EMOJI_SLEEP_CHECK
+        ):
+            return
+        # タイムアウトのタイマーが同時に期限に達していてもミュートしないよう、先に記録から外す
+        self.cancel_sleep_check(payload.message_id)
+        await self._on_sleep_check_reacted(
+            payload.message_id,
+            data["member_id"],
+            data["guild_id"],
+            data["channel_id"],
+            data["notification_channel_id"],
+        )
 
-            await self.bot.wait_for("reaction_add", timeout=wait_seconds, check=check)
-            logger.info(
-                f"Member {member_id} reacted to message {message_id}. Cancelling mute process."
-            )
-            guild = self.bot.get_guild(guild_id)
-            if guild and notification_channel_id:
-                notification_channel = self.bot.get_channel(notification_channel_id)
-                if notification_channel:
-                    try:
-                        member = guild.get_member(member_id)
-                        if member:
-                            embed = discord.Embed(
-                                title=constants.EMBED_TITLE_SLEEP_CHECK,
-                                description=f"{member.mention}{constants.EMBED_DESCRIPTION_SLEEP_CHECK_CANCEL}",
-                                color=constants.EMBED_COLOR_SUCCESS,
-                            )
-                            await notification_channel.send(embed=embed)
-                            logger.info(
-                                f"Sent mute cancellation message to channel {notification_channel.id}."
-                            )
-                    except discord.Forbidden:
-                        logger.error(
-                            f"Error: No permission to send messages to channel {notification_channel.name} ({notification_channel.id})."
+    # 寝落ち確認メッセージにリアクションがあった場合の処理
+    async def _on_sleep_check_reacted(
+        self,
+        message_id: int,
+        member_id: int,
+        guild_id: int,
+        channel_id: int,
+        notification_channel_id: int | None,
+    ):
+        logger.info(
+            f"Member {member_id} reacted to message {message_id}. Cancelling mute process."
+        )
+        guild = self.bot.get_guild(guild_id)
+        if guild and notification_channel_id:
+            notification_channel = self.bot.get_channel(notification_channel_id)
+            if notification_channel:
+                try:
+                    member = guild.get_member(member_id)
+                    if member:
+                        embed = discord.Embed(
+                            title=constants.EMBED_TITLE_SLEEP_CHECK,
+                            description=f"{member.mention}{constants.EMBED_DESCRIPTION_SLEEP_CHECK_CANCEL}",
+                            color=constants.EMBED_COLOR_SUCCESS,
                         )
-                    except Exception as e:
-                        logger.error(
-                            f"An error occurred while sending mute cancellation message: {e}"
+                        await notification_channel.send(embed=embed)
+                        logger.info(
+                            f"Sent mute cancellation message to channel {notification_channel.id}."
                         )
+                except discord.Forbidden:
+                    logger.error(
+                        f"Error: No permission to send messages to channel {notification_channel.name} ({notification_channel.id})."
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"An error occurred while sending mute cancellation message: {e}"
+                    )
 
-            # ヘルパー関数を使用してメッセージを削除
-            await self._delete_sleep_check_message(message_id, notification_channel_id)
+        # ヘルパー関数を使用してメッセージを削除
+        await self._delete_sleep_check_message(message_id, notification_channel_id)
 
-            # チャンネルの状態管理から削除（再チェックの前に実行）
-            key = (guild_id, channel_id)
-            if key in self.lonely_voice_channels:
-                self.lonely_voice_channels.pop(key)
+        # チャンネルの状態管理から削除（再チェックの前に実行）
+        key = (guild_id, channel_id)
+        if key in self.lonely_voice_channels:
+            self.lonely_voice_channels.pop(key)
+            logger.debug(
+                f"Removed channel {channel_id} ({guild_id}) from lonely_voice_channels before recheck."
+            )
+
+        # リアクションがありミュートがキャンセルされた後、チャンネルに一人以下のメンバーしかいない場合は再度寝落ちチェックを開始
+        current_channel = guild.get_channel(channel_id) if guild else None
+        logger.debug(
+            f"Debug: After reaction, current_channel: {current_channel}, members count: {len(current_channel.members) if current_channel else 'N/A'}"
+        )
+        if current_channel and len(current_channel.members) <= 1:
+            key_current = (guild_id, current_channel.id)
+            # すでにLonely状態のタスクがない場合のみ新規タスクを開始
+            if key_current not in self.lonely_voice_channels:
                 logger.debug(
-                    f"Removed channel {channel_id} ({guild_id}) from lonely_voice_channels before recheck."
+                    f"Channel {current_channel.id} ({guild_id}) has one or fewer members after reaction. Starting sleep check. Member: {member_id}"
+                )
+                notification_channel_id_recheck = config.get_notification_channel_id(
+                    guild_id
+                )
+                await self.start_lonely_check(
+                    guild_id,
+                    current_channel.id,
+                    member_id,
+                    notification_channel_id_recheck,
+                )
+                logger.info(
+                    f"Restarted sleep check for member {member_id} in channel {current_channel.id} after reaction."
                 )
 
-            # リアクションがありミュートがキャンセルされた後、チャンネルに一人以下のメンバーしかいない場合は再度寝落ちチェックを開始
-            current_channel = guild.get_channel(channel_id)
-            logger.debug(
-                f"Debug: After reaction, current_channel: {current_channel}, members count: {len(current_channel.members) if current_channel else 'N/A'}"
-            )
-            if current_channel and len(current_channel.members) <= 1:
-                key_current = (guild_id, current_channel.id)
-                # すでにLonely状態のタスクがない場合のみ新規タスクを開始
-                if key_current not in self.lonely_voice_channels:
-                    logger.debug(
-                        f"Channel {current_channel.id} ({guild_id}) has one or fewer members after reaction. Starting sleep check. Member: {member_id}"
-                    )
-                    notification_channel_id_recheck = (
-                        config.get_notification_channel_id(guild_id)
-                    )
-                    task = asyncio.create_task(
-                        self.check_lonely_channel(
-                            guild_id,
-                            current_channel.id,
-                            member_id,
-                            notification_channel_id_recheck,
-                        )
-                    )
-                    self.add_lonely_channel(
-                        guild_id, current_channel.id, member_id, task
-                    )
-                    logger.info(
-                        f"Restarted sleep check for member {member_id} in channel {current_channel.id} after reaction."
-                    )
+    # リアクション待ちのタイマーの期限に達した時に呼び出され、ミュート処理を実行する
+    async def _on_reaction_timeout(
+        self,
+        message_id: int,
+        member_id: int,
+        guild_id: int,
+        notification_channel_id: int | None,
+    ):
+        # リアクション待ちを終了する (既にリアクションがあった、または退室などで終了している場合は何もしない)
+        if self.cancel_sleep_check(message_id) is None:
+            return
 
-        except asyncio.TimeoutError:
-            # タイムアウトした場合、ミュート処理を実行
-            logger.info(
-                f"No reaction to message {message_id}. Muting member {member_id}."
-            )
-            guild = self.bot.get_guild(guild_id)
-            if guild:
-                member = guild.get_member(member_id)
-                if member:
+        # タイムアウトした場合、ミュート処理を実行
+        logger.info(f"No reaction to message {message_id}. Muting member {member_id}.")
+        guild = self.bot.get_guild(guild_id)
+        if guild:
+            member = guild.get_member(member_id)
+            if member:
+                try:
+                    await member.edit(mute=True, deafen=True)
+                    # ミュートカウントをインクリメント
                     try:
-                        await member.edit(mute=True, deafen=True)
-                        # ミュートカウントをインクリメント
-                        try:
-                            await increment_mute_count(member.id)
-                            logger.info(
-                                f"Incremented mute count for member {member.id}."
-                            )
-                        except Exception as e_inc:
-                            logger.error(
-                                f"Failed to increment mute count for member {member.id}: {e_inc}"
-                            )
-
-                        logger.info(
-                            f"Muted member {member.display_name} ({member.id})."
+                        await increment_mute_count(guild_id, member.id)
+                        logger.info(f"Incremented mute count for member {member.id}.")
+                    except Exception as e_inc:
+                        logger.error(
+                            f"Failed to increment mute count for member {member.id}: {e_inc}"
                         )
-                        # ボットがミュートしたメンバーを記録
-                        await self.add_bot_muted_member(member.id)
 
-                        if notification_channel_id:
-                            notification_channel = self.bot.get_channel(
-                                notification_channel_id
-                            )
-                            if notification_channel:
-                                try:
-                                    embed = discord.Embed(
-                                        title=constants.EMBED_TITLE_SLEEP_CHECK,
-                                        description=f"{member.mention}{constants.EMBED_DESCRIPTION_SLEEP_CHECK_MUTE}",
-                                        color=constants.EMBED_COLOR_ERROR,
-                                    )
-                                    await notification_channel.send(embed=embed)
-                                    logger.info(
-                                        f"Sent mute execution message to channel {notification_channel.id}."
-                                    )
-                                except discord.Forbidden:
-                                    logger.error(
-                                        f"Error: No permission to send messages to channel {notification_channel.name} ({notification_channel.id})."
-                                    )
-                                except Exception as e:
-                                    logger.error(
-                                        f"An error occurred while sending mute execution message: {e}"
-                                    )
+                    logger.info(f"Muted member {member.display_name} ({member.id}).")
+                    # ボットがミュートしたメンバーを記録
+                    await self.add_bot_muted_member(member.id)
 
-                    except discord.Forbidden:
-                        logger.error(
-                            f"Error: No permission to unmute member {member.display_name} ({member.id})."
+                    if notification_channel_id:
+                        notification_channel = self.bot.get_channel(
+                            notification_channel_id
                         )
-                    except Exception as e:
-                        logger.error(f"An error occurred while unmuting member: {e}")
-                else:
-                    logger.warning(f"Member {member_id} not found.")
-            else:
-                logger.warning(f"Guild {guild_id} not found.")
+                        if notification_channel:
+                            try:
+                                embed = discord.Embed(
+                                    title=constants.EMBED_TITLE_SLEEP_CHECK,
+                                    description=f"{member.mention}{constants.EMBED_DESCRIPTION_SLEEP_CHECK_MUTE}",
+                                    color=constants.EMBED_COLOR_ERROR,
+                                )
+                                await notification_channel.send(embed=embed)
+                                logger.info(
+                                    f"Sent mute execution message to channel {notification_channel.id}."
+                                )
+                            except discord.Forbidden:
+                                logger.error(
+                                    f"Error: No permission to send messages to channel {notification_channel.name} ({notification_channel.id})."
+                                )
+                            except Exception as e:
+                                logger.error(
+                                    f"An error occurred while sending mute execution message: {e}"
+                                )
 
-            # ヘルパー関数を使用してメッセージを削除
-            await self._delete_sleep_check_message(message_id, notification_channel_id)
+                except discord.Forbidden:
+                    logger.error(
+                        f"Error: No permission to unmute member {member.display_name} ({member.id})."
+                    )
+                except Exception as e:
+                    logger.error(f"An error occurred while unmuting member: {e}")
+            else:
+                logger.warning(f"Member {member_id} not found.")
+        else:
+            logger.warning(f"Guild {guild_id} not found.")
 
-        finally:
-            # 処理が完了したら、一時的な記録から削除
-            if message_id in self.sleep_check_messages:
-                self.sleep_check_messages.pop(message_id)
-                logger.debug(f"Removed message {message_id} from sleep_check_messages.")
+        # ヘルパー関数を使用してメッセージを削除
+        await self._delete_sleep_check_message(message_id, notification_channel_id)
 
     # get_lonely_timeout_seconds を SleepCheckManager のメソッドとして移動
     async def _get_lonely_timeout_seconds(self, guild_id):
@@ -448,8 +663,60 @@ class VoiceEvents(commands.Cog):
         self.voice_state_manager = (
             voice_state_manager  # VoiceStateManager は調整役として残す
         )
+        # ボイスステート更新はギルドごとのキューで順番に処理する (ギルド間は並行して処理される)
+        # 寝落ち確認のタイマーとリアクション、セッションの整合性チェックも同じキューで処理し、ボイスステート更新と競合しないようにする
+        self.guild_actors = GuildActors("voice")
+        sleep_check_manager.guild_actors = self.guild_actors
+        voice_state_manager.guild_actors = self.guild_actors
+        # 同じメンバーの短時間の連続したボイスステート更新をまとめてから、ギルドのキューに追加する
+        self.voice_event_coalescer = VoiceEventCoalescer(
+            sleep_check_manager.scheduler, self._enqueue_voice_state_update
+        )
         logger.info("VoiceEvents Cog initialized.")
 
+    async def bootstrap_voice_states(self):
+        """
+        起動時に全ギルドのボイスチャンネルを一度だけ走査し、既に通話中のメンバーの状態を登録します。
+        通話セッション、2人以上通話セッション、ステータス更新対象チャンネル、寝落ち確認のタイマーをまとめて登録します。
+        通知メッセージは送信しません。
+        """
+        started = time.perf_counter()
+        now = time.time()
+        channel_count = 0
+        call_count = 0
+        session_count = 0
+        lonely_count = 0
+        for guild in self.bot.guilds:
+            notification_channel_id = config.get_notification_channel_id(guild.id)
+            for channel in guild.voice_channels:
+                if not channel.members:
+                    continue
+                channel_count += 1
+                call_seeded, session_seeded = self.voice_state_manager.seed_channel(
+                    guild.id, channel, now
+                )
+                call_count += call_seeded
+                session_count += session_seeded
+
+                if len(channel.members) == 1:
+                    lonely_member = channel.members[0]
+                    if (
+                        (guild.id, channel.id)
+                        not in self.sleep_check_manager.lonely_voice_channels
+                        and lonely_member.id
+                        not in self.sleep_check_manager.bot_muted_members
+                    ):
+                        await self.sleep_check_manager.start_lonely_check(
+                            guild.id,
+                            channel.id,
+                            lonely_member.id,
+                            notification_channel_id,
+                        )
+                        lonely_count += 1
+        logger.info(
+            f"Voice state bootstrap finished in {time.perf_counter() - started:.3f}s. Scanned {channel_count} occupied channels: seeded {call_count} call sessions, {session_count} statistical sessions, {lonely_count} sleep checks."
+        )
+
     # --- 10時間達成通知用ヘルパー関数 ---
     async def _check_and_notify_milestone(
         self,
@@ -551,16 +818,11 @@ class VoiceEvents(commands.Cog):
                 notification_channel_id = config.get_notification_channel_id(
                     guild_id
                 )  # config から取得
-                task = asyncio.create_task(
-                    self.sleep_check_manager.check_lonely_channel(
-                        guild_id,
-                        channel_after.id,
-                        lonely_member.id,
-                        notification_channel_id,
-                    )
-                )
-                self.sleep_check_manager.add_lonely_channel(
-                    guild_id, channel_after.id, lonely_member.id, task
+                await self.sleep_check_manager.start_lonely_check(
+                    guild_id,
+                    channel_after.id,
+                    lonely_member.id,
+                    notification_channel_id,
                 )
         # 入室したチャンネルが複数人になった場合、一人以下の状態を解除
         elif len(channel_after.members) > 1:
@@ -568,36 +830,18 @@ class VoiceEvents(commands.Cog):
                 logger.debug(
                     f"Multiple members joined channel {channel_after.id} ({guild_id}). Removing lonely state."
                 )
-                # lonely_voice_channels から削除される前にメッセージIDを取得
-                lonely_member_id = self.sleep_check_manager.lonely_voice_channels[
-                    key_after
-                ]["member_id"]
-                await self.sleep_check_manager.remove_lonely_channel(
-                    guild_id, channel_after.id
+                # 一人以下の状態を解除し、リアクション待ちを終了したメッセージを取得
+                cancelled_messages = (
+                    await self.sleep_check_manager.remove_lonely_channel(
+                        guild_id, channel_after.id
+                    )
                 )
 
                 # 関連付けられたメッセージを削除
-                message_ids_to_remove = []
-                for (
-                    message_id,
-                    data,
-                ) in self.sleep_check_manager.sleep_check_messages.items():
-                    if (
-                        data.get("channel_id") == channel_after.id
-                        and data.get("member_id") == lonely_member_id
-                    ):
-                        message_ids_to_remove.append(message_id)
-
-                for message_id in message_ids_to_remove:
-                    notification_channel_id = (
-                        self.sleep_check_manager.sleep_check_messages[message_id].get(
-                            "notification_channel_id"
-                        )
-                    )
+                for message_id, notification_channel_id in cancelled_messages:
                     await self.sleep_check_manager._delete_sleep_check_message(
                         message_id, notification_channel_id
                     )
-                    # sleep_check_messages からの削除は wait_for_reaction の finally で行われるため、ここでは不要
                     logger.debug(
                         f"Message {message_id} deletion requested due to multiple members joining."
                     )
@@ -642,7 +886,10 @@ class VoiceEvents(commands.Cog):
                         except Exception as e:
                             logger.error(f"Error unmuting existing member: {e}")
 
-                    asyncio.create_task(unmute_existing_member(current_member))
+                    # 追跡されないタスクにせず、ギルドのキューで順番に処理する (アンロード時にキューと一緒に待機される)
+                    await self.sleep_check_manager.run_in_guild(
+                        guild_id, unmute_existing_member, current_member
+                    )
 
         # VoiceStateManager に処理を委譲し、統計更新が必要なデータを取得
         ended_sessions_data = await self.voice_state_manager.notify_member_joined(
@@ -654,7 +901,9 @@ class VoiceEvents(commands.Cog):
 
         # VoiceStateManager から統計更新が必要なデータが返された場合、処理関数に委譲
         if ended_sessions_data:
-            await self._process_session_end_data(member.guild, ended_sessions_data)
+            await self._process_session_end_data(
+                member.guild, ended_sessions_data, member
+            )
 
         # ボットによってミュートされたメンバーが再入室した場合、ミュートを解除
         if member.id in self.sleep_check_manager.bot_muted_members:
@@ -662,8 +911,6 @@ class VoiceEvents(commands.Cog):
 
             async def unmute_after_delay(m: discord.Member):
                 logger.debug(f"Starting delayed unmute process for member {m.id}.")
-                # チャンネルの状態変化が完全に反映されるのを待つため、少し遅延させる
-                await asyncio.sleep(constants.UNMUTE_DELAY_SECONDS)
                 try:
                     await m.edit(mute=False, deafen=False)
                     await self.sleep_check_manager.remove_bot_muted_member(m.id)
@@ -714,16 +961,11 @@ class VoiceEvents(commands.Cog):
                                 notification_channel_id_recheck = (
                                     config.get_notification_channel_id(m.guild.id)
                                 )
-                                task = asyncio.create_task(
-                                    self.sleep_check_manager.check_lonely_channel(
-                                        m.guild.id,
-                                        current_channel.id,
-                                        m.id,
-                                        notification_channel_id_recheck,
-                                    )
-                                )
-                                self.sleep_check_manager.add_lonely_channel(
-                                    m.guild.id, current_channel.id, m.id, task
+                                await self.sleep_check_manager.start_lonely_check(
+                                    m.guild.id,
+                                    current_channel.id,
+                                    m.id,
+                                    notification_channel_id_recheck,
                                 )
                                 logger.info(
                                     f"Restarted sleep check for member {m.id} in channel {current_channel.id}."
@@ -737,7 +979,15 @@ class VoiceEvents(commands.Cog):
                     logger.error(f"An error occurred while unmuting member: {e}")
                 logger.debug(f"Delayed unmute process for member {m.id} completed.")
 
-            asyncio.create_task(unmute_after_delay(member))
+            # チャンネルの状態変化が完全に反映されるのを待つため、少し遅延させてからミュートを解除する
+            self.sleep_check_manager.scheduler.schedule(
+                ("unmute", member.id),
+                constants.UNMUTE_DELAY_SECONDS,
+                self.sleep_check_manager.run_in_guild,
+                member.guild.id,
+                unmute_after_delay,
+                member,
+            )
 
     # チャンネルから退出した場合の処理
     async def _handle_leave(self, member, channel_before):
@@ -748,27 +998,24 @@ class VoiceEvents(commands.Cog):
         key_before = (guild_id, channel_before.id)
 
         # 退室したメンバーに関連付けられた寝落ち確認タスクがあればキャンセルし、メッセージを削除
-        message_ids_to_remove = []
+        messages_to_remove = []
         for message_id, data in self.sleep_check_manager.sleep_check_messages.items():
             # 退室したメンバーに関連付けられたリアクション監視タスクをキャンセル
             if data.get("member_id") == member.id:
-                if data["task"] and not data["task"].cancelled():
-                    data["task"].cancel()
-                    logger.info(
-                        f"Cancelled reaction monitoring task for message {message_id} due to member {member.id} leaving."
-                    )
-                message_ids_to_remove.append(message_id)
+                messages_to_remove.append(
+                    (message_id, data.get("notification_channel_id"))
+                )
 
-        for message_id in message_ids_to_remove:
+        for message_id, notification_channel_id in messages_to_remove:
+            self.sleep_check_manager.cancel_sleep_check(message_id)
+            logger.info(
+                f"Cancelled reaction monitoring for message {message_id} due to member {member.id} leaving."
+            )
             # ヘルパー関数を使用してメッセージを削除
-            notification_channel_id = self.sleep_check_manager.sleep_check_messages[
-                message_id
-            ].get("notification_channel_id")
             await self.sleep_check_manager._delete_sleep_check_message(
                 message_id, notification_channel_id
             )
 
-            # sleep_check_messages からの削除は wait_for_reaction の finally で行われるため、ここでは不要
             logger.debug(f"Message {message_id} deletion requested due to member move.")
 
         # 退室したチャンネルに誰もいなくなった場合、一人以下の状態を解除
@@ -793,16 +1040,11 @@ class VoiceEvents(commands.Cog):
                 notification_channel_id = config.get_notification_channel_id(
                     guild_id
                 )  # config から取得
-                task = asyncio.create_task(
-                    self.sleep_check_manager.check_lonely_channel(
-                        guild_id,
-                        channel_before.id,
-                        lonely_member.id,
-                        notification_channel_id,
-                    )
-                )
-                self.sleep_check_manager.add_lonely_channel(
-                    guild_id, channel_before.id, lonely_member.id, task
+                await self.sleep_check_manager.start_lonely_check(
+                    guild_id,
+                    channel_before.id,
+                    lonely_member.id,
+                    notification_channel_id,
                 )
 
         # VoiceStateManager に処理を委譲し、統計更新が必要なデータを取得
@@ -814,56 +1056,59 @@ class VoiceEvents(commands.Cog):
         )
         # VoiceStateManager から統計更新が必要なデータが返された場合、処理関数に委譲
         if ended_sessions_data:
-            await self._process_session_end_data(member.guild, ended_sessions_data)
+            await self._process_session_end_data(
+                member.guild, ended_sessions_data, member
+            )
 
     async def _process_session_end_data(
-        self, guild: discord.Guild, ended_sessions_data: list
+        self,
+        guild: discord.Guild,
+        ended_sessions_data: list,
+        event_member: discord.Member | None = None,
     ):
         """
         VoiceStateManagerから返された終了した個別のメンバーセッションデータを処理し、
         統計更新とマイルストーン通知を行います。
+        event_member はイベントを発生させたメンバーです。退出したメンバーは通話中のメンバーだけを
+        キャッシュする設定ではキャッシュから削除されているため、get_member ではなくこのオブジェクトを使います。
 
-        TODO: データベース操作におけるエラーハンドリング（try...except）を追加検討
-        現在の実装では、データベース操作中にエラーが発生した場合、例外が捕捉されず、
-        予期しない動作やボットのクラッシュにつながる可能性があります。
+        月間統計の更新はライトビハインドバッファに追加され、まとめてデータベースに書き込まれます。
+        更新前の総通話時間は対象メンバー分を1回のクエリで取得し、更新後の値はその値に通話時間を加算して求めます。
         """
         logger.info(
             f"Starting processing of ended session data for guild {guild.id}. Data count: {len(ended_sessions_data)}"
         )
+        # データベース操作: 対象メンバーの合計通話時間をまとめて取得 (更新前の値、未反映の書き込みを含む)
+        # エラー時は空の辞書が返されるため、各メンバーの値は DEFAULT_TOTAL_DURATION となる
+        member_ids = list({member_id for member_id, _, _ in ended_sessions_data})
+        running_totals = await get_total_call_time_for_guild_members(member_ids)
+
         for member_id, duration, join_time in ended_sessions_data:
             logger.debug(
                 f"Processing session end data for member {member_id}. Duration: {duration}, Join time: {join_time}"
             )
-            before_total = constants.DEFAULT_TOTAL_DURATION  # エラー時のデフォルト値
-            after_total = constants.DEFAULT_TOTAL_DURATION  # エラー時のデフォルト値
             month_key = join_time.strftime("%Y-%m")
+            before_total = running_totals.get(
+                member_id, constants.DEFAULT_TOTAL_DURATION
+            )
+            after_total = before_total + duration
+            # 同じメンバーのデータが複数ある場合に備えて、加算後の値を次の更新前の値とする
+            running_totals[member_id] = after_total
 
             try:
-                # データベース操作: メンバーの合計通話時間を取得 (更新前の値)
-                before_total = await get_total_call_time(member_id)
-                logger.debug(
-                    f"Fetched before_total for member {member_id}: {before_total}"
-                )
-            except Exception as e:
-                logger.error(
-                    f"An error occurred while fetching total call time for member {member_id} in _process_session_end_data: {e}"
-                )
-                # エラーが発生しても処理は続行
-
-            try:
-                # データベース操作: メンバーの月間統計を更新し、更新後の合計通話時間を取得
-                after_total = await update_member_monthly_stats(
-                    month_key, member_id, duration
+                # データベース操作: メンバーの月間統計の更新をバッファに追加
+                await queue_member_monthly_stats(
+                    guild.id, month_key, member_id, duration
                 )
                 logger.debug(
-                    f"Updated monthly stats for member {member_id}. New total: {after_total}"
+                    f"Queued monthly stats update for member {member_id}. New total: {after_total}"
                 )
             except Exception as e:
                 logger.error(
                     f"An error occurred while updating member monthly stats for member {member_id} (Month: {month_key}, Duration: {duration}) in _process_session_end_data: {e}"
                 )
                 # エラーが発生しても処理は続行
-                # update_member_monthly_stats はエラー時に DEFAULT_TOTAL_DURATION を返すため、after_total はその値になる
+                # 書き込めなかった分はバッファに残り、次回のフラッシュで再試行される
 
                 # データベース書き込みエラー発生を通知
                 notification_channel_id = config.get_notification_channel_id(guild.id)
@@ -892,12 +1137,16 @@ class VoiceEvents(commands.Cog):
             logger.debug(
                 f"Processing complete for member {member_id}. Before Total: {before_total}, After Total: {after_total}"
             )
-            m_obj = guild.get_member(member_id)
+            m_obj: discord.Member | None
+            if event_member is not None and event_member.id == member_id:
+                m_obj = event_member
+            else:
+                m_obj = guild.get_member(member_id)
             if m_obj:
                 notification_channel_id = config.get_notification_channel_id(
                     guild.id
                 )  # config から取得
-                # マイルストーン通知は、データベース更新が成功したかに関わらず、取得できた before_total と update_member_monthly_stats が返した after_total を使用してチェック
+                # マイルストーン通知は、データベース更新が成功したかに関わらず、更新前の総通話時間と加算後の after_total を使用してチェック
                 await self._check_and_notify_milestone(
                     m_obj, guild, before_total, after_total, notification_channel_id
                 )
@@ -937,16 +1186,11 @@ class VoiceEvents(commands.Cog):
                 notification_channel_id = config.get_notification_channel_id(
                     guild_id
                 )  # config から取得
-                task = asyncio.create_task(
-                    self.sleep_check_manager.check_lonely_channel(
-                        guild_id,
-                        channel_before.id,
-                        lonely_member.id,
-                        notification_channel_id,
-                    )
-                )
-                self.sleep_check_manager.add_lonely_channel(
-                    guild_id, channel_before.id, lonely_member.id, task
+                await self.sleep_check_manager.start_lonely_check(
+                    guild_id,
+                    channel_before.id,
+                    lonely_member.id,
+                    notification_channel_id,
                 )
         logger.debug(
             f"Finished processing leave part for member {member.id} moving from channel {channel_before.id}."
@@ -974,16 +1218,11 @@ class VoiceEvents(commands.Cog):
                 notification_channel_id = config.get_notification_channel_id(
                     guild_id
                 )  # config から取得
-                task = asyncio.create_task(
-                    self.sleep_check_manager.check_lonely_channel(
-                        guild_id,
-                        channel_after.id,
-                        lonely_member.id,
-                        notification_channel_id,
-                    )
-                )
-                self.sleep_check_manager.add_lonely_channel(
-                    guild_id, channel_after.id, lonely_member.id, task
+                await self.sleep_check_manager.start_lonely_check(
+                    guild_id,
+                    channel_after.id,
+                    lonely_member.id,
+                    notification_channel_id,
                 )
         # 入室したチャンネルが複数人になった場合、一人以下の状態を解除
         elif len(channel_after.members) > 1:
@@ -1008,27 +1247,24 @@ class VoiceEvents(commands.Cog):
         key_before = (guild_id, channel_before.id)
 
         # 移動元のチャンネルに関連付けられた寝落ち確認タスクがあればキャンセルし、メッセージを削除
-        message_ids_to_remove = []
+        messages_to_remove = []
         for message_id, data in self.sleep_check_manager.sleep_check_messages.items():
             # 移動したメンバーに関連付けられたリアクション監視タスクをキャンセル
             if data.get("member_id") == member.id:
-                if data["task"] and not data["task"].cancelled():
-                    data["task"].cancel()
-                    logger.info(
-                        f"Cancelled reaction monitoring task for message {message_id} due to member {member.id} moving."
-                    )
-                message_ids_to_remove.append(message_id)
+                messages_to_remove.append(
+                    (message_id, data.get("notification_channel_id"))
+                )
 
-        for message_id in message_ids_to_remove:
+        for message_id, notification_channel_id in messages_to_remove:
+            self.sleep_check_manager.cancel_sleep_check(message_id)
+            logger.info(
+                f"Cancelled reaction monitoring for message {message_id} due to member {member.id} moving."
+            )
             # ヘルパー関数を使用してメッセージを削除
-            notification_channel_id = self.sleep_check_manager.sleep_check_messages[
-                message_id
-            ].get("notification_channel_id")
             await self.sleep_check_manager._delete_sleep_check_message(
                 message_id, notification_channel_id
             )
 
-            # sleep_check_messages からの削除は wait_for_reaction の finally で行われるため、ここでは不要
             logger.debug(f"Message {message_id} deletion requested due to member move.")
 
         # 移動元のチャンネルの一人以下の状態を解除
@@ -1060,41 +1296,19 @@ class VoiceEvents(commands.Cog):
         # 移動元での退出による統計更新とマイルストーン通知
         if ended_sessions_from_before:
             await self._process_session_end_data(
-                member.guild, ended_sessions_from_before
+                member.guild, ended_sessions_from_before, member
             )
 
         # 移動先での入室による統計更新とマイルストーン通知 (移動してきたメンバー自身の場合のみ)
         # 移動直後は通話時間0として記録（新しいセッションの開始）
         if joined_session_data is not None:
-            member_id_join, duration_join, join_time_join = joined_session_data
             logger.debug(
-                f"Starting stats update process due to joining destination channel. Member: {member_id_join}, Duration: {duration_join}, Join time: {join_time_join}"
+                f"Starting stats update process due to joining destination channel. Member: {joined_session_data[0]}, Duration: {joined_session_data[1]}, Join time: {joined_session_data[2]}"
             )
-            # 移動直後は通話時間0として記録（新しいセッションの開始）
-            # _process_session_end_data と同様のロジックを適用しつつ、duration を 0 とする
-            before_total_join = await get_total_call_time(member_id_join)
-            month_key_join = join_time_join.strftime("%Y-%m")
-            await update_member_monthly_stats(
-                month_key_join, member_id_join, 0
-            )  # duration は 0
-            after_total_join = await get_total_call_time(member_id_join)
-            logger.debug(
-                f"Updated monthly stats for member {member_id_join}. Before Total: {before_total_join}, After Total: {after_total_join}"
-            )
-            m_obj_join = (
-                member.guild.get_member(member_id_join) if member.guild else None
+            # _process_session_end_data と同じ処理を duration = 0 のデータで行う
+            await self._process_session_end_data(
+                member.guild, [joined_session_data], member
             )
-            if m_obj_join:
-                notification_channel_id = config.get_notification_channel_id(
-                    member.guild.id
-                )  # config から取得
-                await self._check_and_notify_milestone(
-                    m_obj_join,
-                    member.guild,
-                    before_total_join,
-                    after_total_join,
-                    notification_channel_id,
-                )
 
         # ボットによってミュートされたメンバーがチャンネル移動した場合、ミュートを解除
         if member.id in self.sleep_check_manager.bot_muted_members:
@@ -1104,7 +1318,6 @@ class VoiceEvents(commands.Cog):
 
             async def unmute_after_delay(m: discord.Member):
                 logger.debug(f"Starting delayed unmute process for member {m.id}.")
-                await asyncio.sleep(constants.UNMUTE_DELAY_SECONDS)  # 1秒待機
                 try:
                     await m.edit(mute=False, deafen=False)
                     await self.sleep_check_manager.remove_bot_muted_member(m.id)
@@ -1147,7 +1360,34 @@ class VoiceEvents(commands.Cog):
                     logger.error(f"An error occurred while unmuting member: {e}")
                 logger.debug(f"Delayed unmute process for member {m.id} completed.")
 
-            asyncio.create_task(unmute_after_delay(member))
+            # チャンネルの状態変化が完全に反映されるのを待つため、少し遅延させてからミュートを解除する
+            self.sleep_check_manager.scheduler.schedule(
+                ("unmute", member.id),
+                constants.UNMUTE_DELAY_SECONDS,
+                self.sleep_check_manager.run_in_guild,
+                member.guild.id,
+                unmute_after_delay,
+                member,
+            )
+
+    async def cog_unload(self):
+        # まとめている途中のイベントをギルドのキューに追加し、キューに残ったイベントを処理し終えてから停止する
+        await self.voice_event_coalescer.flush()
+        try:
+            await asyncio.wait_for(
+                self.guild_actors.join(), constants.VOICE_EVENT_DRAIN_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Gave up waiting for queued voice state updates after {constants.VOICE_EVENT_DRAIN_TIMEOUT_SECONDS} seconds."
+            )
+        logger.info(
+            f"Voice event coalescer stats: {self.voice_event_coalescer.get_stats()}"
+        )
+        logger.info(f"Voice event actor stats: {self.guild_actors.get_stats()}")
+        await self.guild_actors.stop()
+        # 実行待ちのタイマーを破棄し、スケジューラを停止する
+        await self.sleep_check_manager.scheduler.stop()
 
     # 同一チャンネル内での状態変化（ミュート、デフなど）の処理
     async def _handle_state_change(self, member, before, after):
@@ -1159,11 +1399,34 @@ class VoiceEvents(commands.Cog):
         # 将来的にこれらの状態変化に対応する機能を追加する場合に、このメソッド内にロジックを記述します。
         pass
 
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        # 全てのリアクションを1つのリスナーで受け取り、寝落ち確認メッセージへのものだけをギルドのキューで処理する
+        data = self.sleep_check_manager.sleep_check_messages.get(payload.message_id)
+        if data is None:
+            return
+        self.guild_actors.submit(
+            data["guild_id"], self.sleep_check_manager.handle_raw_reaction, payload
+        )
+
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
         logger.info(
             f"on_voice_state_update event occurred: Member {member.id}, Before: {before.channel}, After: {after.channel}"
         )
+        await self.voice_event_coalescer.submit(member, before, after)
+
+    # まとめた後のボイスステート更新をギルドのキューに追加する
+    async def _enqueue_voice_state_update(self, member, before, after):
+        depth = self.guild_actors.submit(
+            member.guild.id, self._dispatch_voice_state_update, member, before, after
+        )
+        logger.debug(
+            f"Queued voice state update for member {member.id} in guild {member.guild.id}. Queue depth: {depth}"
+        )
+
+    # ギルドのワーカーから呼び出され、遷移の種類に応じて各ハンドラに振り分ける
+    async def _dispatch_voice_state_update(self, member, before, after):
         channel_before = before.channel
         channel_after = after.channel
 
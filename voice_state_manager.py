@@ -1,11 +1,21 @@
+import asyncio
 import discord
 from discord.ext import tasks
 import datetime
 import logging
+import time
+from dataclasses import dataclass, field
 from typing import Optional
 
-from database import record_voice_session_to_db
+from database import (
+    queue_voice_session,
+    queue_member_monthly_stats,
+    save_session_snapshot,
+    load_session_snapshot,
+)
 from formatters import format_duration, convert_utc_to_jst
+from guild_actors import GuildActors
+from sharding import get_shard_scope
 import config
 import constants
 
@@ -13,6 +23,33 @@ import constants
 logger = logging.getLogger(__name__)
 
 
+# セッションの時刻はエポック秒 (time.time()) の float で保持し、
+# データベースへの記録や表示の時だけ datetime に変換する
+def epoch_to_datetime(timestamp: float) -> datetime.datetime:
+    """エポック秒を UTC の datetime に変換します。"""
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+
+
+@dataclass(slots=True)
+class CallSession:
+    """通話通知用の通話セッション。"""
+
+    start_time: float
+    first_member: int
+
+
+@dataclass(slots=True)
+class VoiceSession:
+    """統計用の2人以上通話セッション。"""
+
+    # そのチャンネルで2人以上の通話が開始された時刻
+    session_start: float
+    # 現在そのチャンネルにいるメンバーとその参加時刻
+    current_members: dict[int, float] = field(default_factory=dict)
+    # そのセッション中に一度でもチャンネルに参加した全てのメンバーID
+    all_participants: set[int] = field(default_factory=set)
+
+
 class CallNotificationManager:
     """
     通話開始/終了通知の処理を行います。
@@ -22,8 +59,8 @@ class CallNotificationManager:
         self.bot = bot
         logger.info("CallNotificationManager initialized.")
         # 通話開始時間と最初に通話を開始した人を記録する辞書（通話通知用）
-        # キー: (guild_id, voice_channel_id), 値: {"start_time": datetimeオブジェクト, "first_member": member_id}
-        self.call_sessions = {}
+        # キー: guild_id, 値: {voice_channel_id: CallSession}
+        self.call_sessions: dict[int, dict[int, CallSession]] = {}
         logger.debug("Initialized call_sessions dictionary in CallNotificationManager.")
 
     async def _send_notification_embed(
@@ -87,10 +124,9 @@ class CallNotificationManager:
         if channel.id not in self.call_sessions[guild_id]:
             # 新しい通話セッションの開始時刻と最初のメンバーを記録
             start_time = now
-            self.call_sessions[guild_id][channel.id] = {
-                "start_time": start_time,
-                "first_member": member.id,
-            }
+            self.call_sessions[guild_id][channel.id] = CallSession(
+                start_time.timestamp(), member.id
+            )
             logger.info(
                 f"Starting new call session in channel {channel.id} ({guild_id})."
             )
@@ -130,7 +166,7 @@ class CallNotificationManager:
         logger.info(
             f"notify_call_end: Channel {channel.id} ({guild_id}) is now empty. Considering call ended."
         )
-        now = datetime.datetime.now(datetime.timezone.utc)
+        now = time.time()
         voice_channel_id = channel.id
 
         # 退出元のチャンネルでの通話セッションが存在する場合
@@ -141,8 +177,7 @@ class CallNotificationManager:
             session = self.call_sessions[guild_id].pop(
                 voice_channel_id
             )  # 通話セッションを終了
-            start_time = session["start_time"]
-            call_duration = (now - start_time).total_seconds()  # 通話時間を計算
+            call_duration = now - session.start_time  # 通話時間を計算
             duration_str = format_duration(call_duration)  # 表示用にフォーマット
             logger.debug(f"Call duration: {duration_str}")
             # 通話終了通知用のEmbedを作成
@@ -159,6 +194,55 @@ class CallNotificationManager:
                 f"No active call session in channel {voice_channel_id} ({guild_id})."
             )
 
+    def snapshot_rows(self) -> list[tuple[int, int, str, int]]:
+        """
+        スナップショット保存用に、進行中の通話セッションを (guild_id, channel_id, start_time, first_member_id) のリストで返します。
+        """
+        return [
+            (
+                guild_id,
+                channel_id,
+                epoch_to_datetime(session.start_time).isoformat(),
+                session.first_member,
+            )
+            for guild_id, channels in self.call_sessions.items()
+            for channel_id, session in channels.items()
+        ]
+
+    def seed_call_session(
+        self, guild_id: int, channel: discord.VoiceChannel, now: float
+    ) -> bool:
+        """
+        起動時に既に通話中のチャンネルを、通知を送らずに通話セッションとして登録します。
+        登録した場合は True を返します。
+        """
+        channels = self.call_sessions.setdefault(guild_id, {})
+        if not channel.members or channel.id in channels:
+            return False
+        channels[channel.id] = CallSession(now, channel.members[0].id)
+        return True
+
+    def restore_call_sessions(self, rows: list) -> int:
+        """
+        スナップショットから通話セッションを復元します。
+        チャンネルにまだメンバーがいる通話のみを復元し、無人になった通話は破棄します。
+        復元した通話セッションの数を返します。
+        """
+        restored = 0
+        for guild_id, channel_id, start_time, first_member_id, _ in rows:
+            channel = self.bot.get_channel(channel_id)
+            if channel is None or not getattr(channel, "members", None):
+                logger.info(
+                    f"Discarded call session snapshot for channel {channel_id} ({guild_id}): channel is empty or not found."
+                )
+                continue
+            self.call_sessions.setdefault(guild_id, {})[channel_id] = CallSession(
+                datetime.datetime.fromisoformat(start_time).timestamp(),
+                first_member_id,
+            )
+            restored += 1
+        return restored
+
 
 class StatisticalSessionManager:
     """
@@ -170,11 +254,10 @@ class StatisticalSessionManager:
         logger.info("StatisticalSessionManager initialized.")
 
         # (guild_id, channel_id) をキーに、現在進行中の「2人以上通話セッション」を記録する
-        # 値: {"session_start": datetimeオブジェクト, "current_members": {member_id: join_time}, "all_participants": {member_id}}
-        # session_start: そのチャンネルで2人以上の通話が開始された時刻
-        # current_members: 現在そのチャンネルにいるメンバーとそのチャンネルに参加した時刻
-        # all_participants: そのセッション中に一度でもチャンネルに参加した全てのメンバーIDのセット
-        self.active_voice_sessions = {}
+        # 値: VoiceSession (開始時刻、現在のメンバーと参加時刻、全参加者)
+        self.active_voice_sessions: dict[tuple[int, int], VoiceSession] = {}
+        # 定期的な整合性チェックで見つかったメンバーのずれの累計件数
+        self.drift_count = 0
         logger.debug(
             "Initialized active_voice_sessions dictionary in StatisticalSessionManager."
         )
@@ -186,24 +269,22 @@ class StatisticalSessionManager:
         logger.info(
             f"Starting new two-or-more-member call session in channel {channel.id} ({guild_id})."
         )
-        now = datetime.datetime.now(datetime.timezone.utc)
+        now = time.time()
         key = (guild_id, channel.id)
         # 新しい2人以上通話セッションを開始
         # セッション開始時刻は、通話がconstants.MIN_MEMBERS_FOR_SESSION人以上になった時刻（この時点の now）
-        self.active_voice_sessions[key] = {
-            "session_start": now,
-            "current_members": {
-                m.id: now for m in channel.members
-            },  # 現在のメンバーとその参加時刻を記録
-            "all_participants": set(
-                m.id for m in channel.members
-            ),  # 全参加者リストに現在のメンバーを追加
-        }
+        self.active_voice_sessions[key] = VoiceSession(
+            now,
+            {m.id: now for m in channel.members},  # 現在のメンバーとその参加時刻を記録
+            {m.id for m in channel.members},  # 全参加者リストに現在のメンバーを追加
+        )
         logger.debug(f"Created new active_voice_sessions entry: {key}")
 
     def update_session_members(self, guild_id: int, channel: discord.VoiceChannel):
         """
-        既存の2人以上通話セッションにメンバーの出入りを反映します。
+        既存の2人以上通話セッションのメンバーを、チャンネルの現在のメンバー全体と突き合わせて更新します。
+        チャンネルの人数に比例した処理になるため、イベントごとの更新には add_member / remove_member を使い、
+        この全体比較は reconcile_sessions による定期的な整合性チェックでのみ使用します。
 
         Args:
             guild_id (int): ギルドID。
@@ -219,19 +300,17 @@ class StatisticalSessionManager:
         logger.debug(
             f"Updating two-or-more-member call session members in channel {channel.id} ({guild_id})."
         )
-        now = datetime.datetime.now(datetime.timezone.utc)
+        now = time.time()
         key = (guild_id, channel.id)
-        if key in self.active_voice_sessions:
-            session_data = self.active_voice_sessions[key]
+        session_data = self.active_voice_sessions.get(key)
+        if session_data is not None:
+            current_members = session_data.current_members
             current_member_ids = {m.id for m in channel.members}
-            previous_member_ids = set(session_data["current_members"].keys())
 
             # 新規参加メンバーを追加
-            for member_id in current_member_ids - previous_member_ids:
-                session_data["current_members"][member_id] = (
-                    now  # 新規参加メンバーの参加時刻を記録
-                )
-                session_data["all_participants"].add(
+            for member_id in current_member_ids - current_members.keys():
+                current_members[member_id] = now  # 新規参加メンバーの参加時刻を記録
+                session_data.all_participants.add(
                     member_id
                 )  # 全参加者リストにメンバーを追加
                 logger.debug(
@@ -240,23 +319,19 @@ class StatisticalSessionManager:
 
             # 退出メンバーを current_members から削除し、終了セッションデータを生成
             ended_sessions_data = []
-            for member_id in previous_member_ids - current_member_ids:
-                if member_id in session_data["current_members"]:  # 念のため存在確認
-                    join_time = session_data["current_members"].pop(
-                        member_id
-                    )  # メンバーを現在のメンバーリストから削除
-                    duration = (
-                        now - join_time
-                    ).total_seconds()  # そのメンバーの通話時間を計算
-                    ended_sessions_data.append(
-                        (member_id, duration, join_time)
-                    )  # 終了リストに追加
-                    logger.debug(
-                        f"Individual session end data for member {member_id}: Duration {duration}, Join time {join_time}"
-                    )
+            for member_id in current_members.keys() - current_member_ids:
+                # メンバーを現在のメンバーリストから削除
+                join_time = current_members.pop(member_id)
+                duration = now - join_time  # そのメンバーの通話時間を計算
+                ended_sessions_data.append(
+                    (member_id, duration, epoch_to_datetime(join_time))
+                )  # 終了リストに追加
+                logger.debug(
+                    f"Individual session end data for member {member_id}: Duration {duration}, Join time {join_time}"
+                )
 
             logger.debug(
-                f"Updated active_voice_sessions[{key}]. Current members: {list(session_data['current_members'].keys())}, All participants count: {len(session_data['all_participants'])}"
+                f"Updated active_voice_sessions[{key}]. Current members: {list(current_members)}, All participants count: {len(session_data.all_participants)}"
             )
             return ended_sessions_data  # 終了した個別のメンバーセッションデータのリストを返す
         else:
@@ -287,38 +362,39 @@ class StatisticalSessionManager:
         ended_sessions_data = []  # 終了した個別のメンバーセッションデータを収集するリスト
 
         # 指定されたチャンネルの2人以上通話セッションがアクティブな場合
-        if key in self.active_voice_sessions:
-            session_data = self.active_voice_sessions[key]
-            now = datetime.datetime.now(datetime.timezone.utc)
+        # 記録の書き込み中に同じセッションが再度終了されないよう、await の前にアクティブセッションから削除する
+        session_data = self.active_voice_sessions.pop(key, None)
+        if session_data is not None:
+            now = time.time()
+            session_start = epoch_to_datetime(session_data.session_start)
             logger.debug(f"Active session found for channel {key}.")
 
             # セッション終了時の残メンバーの統計更新と通知チェックのためにデータを収集
-            remaining_members_data = session_data["current_members"].copy()
-            for m_id, join_time in remaining_members_data.items():
-                d = (now - join_time).total_seconds()
-                ended_sessions_data.append((m_id, d, join_time))  # 終了リストに追加
+            for m_id, join_time in session_data.current_members.items():
+                d = now - join_time
+                ended_sessions_data.append(
+                    (m_id, d, epoch_to_datetime(join_time))
+                )  # 終了リストに追加
                 logger.debug(
                     f"Data for member {m_id} remaining in ended session: Duration {d}, Join time {join_time}"
                 )
-                session_data["current_members"].pop(
-                    m_id
-                )  # 残メンバーを現在のメンバーリストから削除
-                logger.debug(
-                    f"Removed member {m_id} from active_voice_sessions[{key}]['current_members']."
-                )
+            # 残メンバーを現在のメンバーリストから削除
+            session_data.current_members.clear()
 
             # セッション全体の通話時間を計算し、データベースに記録
-            overall_duration = (now - session_data["session_start"]).total_seconds()
+            overall_duration = now - session_data.session_start
             logger.info(
-                f"Recording overall two-or-more-member call session for channel {channel.id} ({guild_id}). Start time: {session_data['session_start']}, Duration: {overall_duration}, All participants: {list(session_data['all_participants'])}"
+                f"Recording overall two-or-more-member call session for channel {channel.id} ({guild_id}). Start time: {session_start}, Duration: {overall_duration}, All participants: {list(session_data.all_participants)}"
             )
             try:
-                await record_voice_session_to_db(
-                    session_data["session_start"],
+                # セッションの記録はライトビハインドバッファに追加され、まとめてデータベースに書き込まれる
+                await queue_voice_session(
+                    guild_id,
+                    session_start,
                     overall_duration,
-                    list(session_data["all_participants"]),
+                    list(session_data.all_participants),
                 )
-                logger.debug("Successfully recorded voice session to DB.")
+                logger.debug("Successfully queued voice session for DB.")
             except Exception as e:
                 logger.error(
                     f"An error occurred while recording voice session to DB for channel {channel.id} ({guild_id}): {e}"
@@ -351,11 +427,6 @@ class StatisticalSessionManager:
                                 f"An error occurred while sending error notification: {notify_e}"
                             )
 
-            # key variable removed as it was unused
-            self.active_voice_sessions.pop(
-                (guild_id, channel.id), None
-            )  # アクティブセッションから削除
-
         else:
             logger.warning(
                 f"No active two-or-more-member call session found for channel {channel.id} ({guild_id}). Skipping end process."
@@ -365,6 +436,205 @@ class StatisticalSessionManager:
             ended_sessions_data  # 終了した個別のメンバーセッションデータのリストを返す
         )
 
+    def add_member(self, guild_id: int, channel_id: int, member_id: int):
+        """
+        入室・移動してきたメンバーを既存の2人以上通話セッションに追加します (O(1))。
+
+        Returns:
+            追加した場合は (member_id, 0, join_time) のタプル。
+            セッションがない場合、または既に current_members にいる場合 (移動ではなく状態変化とみなす) は None。
+        """
+        session_data = self.active_voice_sessions.get((guild_id, channel_id))
+        if session_data is None or member_id in session_data.current_members:
+            return None
+        now = time.time()
+        # 新規参加メンバーの参加時刻を記録
+        session_data.current_members[member_id] = now
+        session_data.all_participants.add(member_id)
+        logger.debug(f"Recorded joined_session_data for moved member {member_id}.")
+        return (member_id, 0, epoch_to_datetime(now))
+
+    def remove_member(
+        self, guild_id: int, channel_id: int, member_id: int
+    ) -> list[tuple[int, float, datetime.datetime]]:
+        """
+        退出・移動したメンバーを既存の2人以上通話セッションから削除します (O(1))。
+
+        Returns:
+            終了した個別のメンバーセッションデータ (member_id, duration, join_time) のリスト。
+            セッションがない場合、またはメンバーが current_members にいない場合は空のリスト。
+        """
+        session_data = self.active_voice_sessions.get((guild_id, channel_id))
+        if session_data is None:
+            return []
+        join_time = session_data.current_members.pop(member_id, None)
+        if join_time is None:
+            logger.debug(
+                f"Member {member_id} was not tracked in active_voice_sessions[{(guild_id, channel_id)}]."
+            )
+            return []
+        duration = time.time() - join_time
+        logger.debug(
+            f"Individual session end data for member {member_id}: Duration {duration}, Join time {join_time}"
+        )
+        return [(member_id, duration, epoch_to_datetime(join_time))]
+
+    async def reconcile_sessions(self, target_guild_id: int | None = None) -> int:
+        """
+        アクティブなセッションのメンバーをチャンネルの現在のメンバーと全体比較し、ずれを修正します。
+        target_guild_id を指定した場合はそのギルドのセッションだけをチェックします。
+        イベントの取りこぼしなどで生じたずれ (記録漏れの参加・退出) の件数を返し、ログに出力します。
+        ずれとして見つかった退出メンバーの通話時間は月間統計に記録します。
+        チャンネルの人数が constants.MIN_MEMBERS_FOR_SESSION 人未満になっているセッションは終了して記録します。
+        """
+        drift = 0
+        checked = 0
+        for (guild_id, channel_id), session_data in list(
+            self.active_voice_sessions.items()
+        ):
+            if target_guild_id is not None and guild_id != target_guild_id:
+                continue
+            checked += 1
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                logger.warning(
+                    f"Channel {channel_id} ({guild_id}) for active session not found during consistency check."
+                )
+                continue
+            previous_member_ids = set(session_data.current_members)
+            ended_sessions_data = self.update_session_members(guild_id, channel)
+            joined = session_data.current_members.keys() - previous_member_ids
+            if joined or ended_sessions_data:
+                drift += len(joined) + len(ended_sessions_data)
+                logger.warning(
+                    f"Session member drift in channel {channel_id} ({guild_id}): {len(joined)} untracked joins, {len(ended_sessions_data)} untracked leaves."
+                )
+            if len(channel.members) < constants.MIN_MEMBERS_FOR_SESSION:
+                # 退出の取りこぼしで人数が足りなくなったセッションは、残っているメンバーの分も含めて終了する
+                logger.warning(
+                    f"Channel {channel_id} ({guild_id}) has fewer than {constants.MIN_MEMBERS_FOR_SESSION} members during consistency check. Ending session."
+                )
+                ended_sessions_data += await self.end_session(guild_id, channel)
+            for member_id, duration, join_time in ended_sessions_data:
+                await queue_member_monthly_stats(
+                    guild_id, join_time.strftime("%Y-%m"), member_id, duration
+                )
+        self.drift_count += drift
+        logger.info(
+            f"Session consistency check finished for {checked} sessions. Drift: {drift} (total {self.drift_count})."
+        )
+        return drift
+
+    def snapshot_rows(self) -> tuple[list, list]:
+        """
+        スナップショット保存用に、進行中の2人以上通話セッションを返します。
+
+        Returns:
+            (sessions, members) のタプル。
+            sessions は (guild_id, channel_id, session_start) のリスト、
+            members は (guild_id, channel_id, member_id, join_time) のリストです。
+            既に退出した参加者の join_time は None になります。
+        """
+        sessions = []
+        members = []
+        for (guild_id, channel_id), session_data in self.active_voice_sessions.items():
+            sessions.append(
+                (
+                    guild_id,
+                    channel_id,
+                    epoch_to_datetime(session_data.session_start).isoformat(),
+                )
+            )
+            current_members = session_data.current_members
+            for member_id in session_data.all_participants | current_members.keys():
+                join_time = current_members.get(member_id)
+                members.append(
+                    (
+                        guild_id,
+                        channel_id,
+                        member_id,
+                        epoch_to_datetime(join_time).isoformat()
+                        if join_time is not None
+                        else None,
+                    )
+                )
+        return sessions, members
+
+    async def restore_sessions(self, session_rows: list, member_rows: list) -> int:
+        """
+        スナップショットから2人以上通話セッションを復元し、現在のボイスチャンネルのメンバーと突き合わせます。
+
+        - チャンネルにまだ constants.MIN_MEMBERS_FOR_SESSION 人以上いる場合は、元の開始時刻でセッションを再開します。
+          スナップショット時点でいたメンバーは元の参加時刻を引き継ぎ、停止中に参加したメンバーは現在時刻から数えます。
+        - 停止中に退出したメンバー、および停止中に終了したセッションは、スナップショット時刻までの通話時間で記録します。
+
+        復元したセッションの数を返します。
+        """
+        now = time.time()
+        members_by_key: dict[tuple[int, int], dict[int, Optional[str]]] = {}
+        for guild_id, channel_id, member_id, join_time in member_rows:
+            members_by_key.setdefault((guild_id, channel_id), {})[member_id] = join_time
+
+        restored = 0
+        for guild_id, channel_id, session_start, snapshot_at in session_rows:
+            key = (guild_id, channel_id)
+            start = datetime.datetime.fromisoformat(session_start).timestamp()
+            snapshot_time = datetime.datetime.fromisoformat(snapshot_at).timestamp()
+            snapshot_members = members_by_key.get(key, {})
+            previous_members = {
+                member_id: datetime.datetime.fromisoformat(join_time).timestamp()
+                for member_id, join_time in snapshot_members.items()
+                if join_time
+            }
+            channel = self.bot.get_channel(channel_id)
+            present_ids = (
+                {m.id for m in channel.members}
+                if channel is not None and hasattr(channel, "members")
+                else set()
+            )
+
+            if len(present_ids) >= constants.MIN_MEMBERS_FOR_SESSION:
+                self.active_voice_sessions[key] = VoiceSession(
+                    start,
+                    {
+                        member_id: previous_members.get(member_id, now)
+                        for member_id in present_ids
+                    },
+                    set(snapshot_members) | present_ids,
+                )
+                ended_members = {
+                    member_id: join_time
+                    for member_id, join_time in previous_members.items()
+                    if member_id not in present_ids
+                }
+                restored += 1
+                logger.info(
+                    f"Restored two-or-more-member call session for channel {channel_id} ({guild_id}) started at {session_start}."
+                )
+            else:
+                # 停止中にセッションが終了したため、スナップショット時刻で終了したものとして記録する
+                ended_members = previous_members
+                overall_duration = max(snapshot_time - start, 0)
+                await queue_voice_session(
+                    guild_id,
+                    epoch_to_datetime(start),
+                    overall_duration,
+                    list(snapshot_members),
+                )
+                logger.info(
+                    f"Recorded call session for channel {channel_id} ({guild_id}) that ended while offline. Duration: {overall_duration}"
+                )
+
+            for member_id, join_time in ended_members.items():
+                duration = max(snapshot_time - join_time, 0)
+                await queue_member_monthly_stats(
+                    guild_id,
+                    epoch_to_datetime(join_time).strftime("%Y-%m"),
+                    member_id,
+                    duration,
+                )
+        return restored
+
     def get_active_session_keys(self):
         """
         現在アクティブな2人以上通話セッションのキー (guild_id, channel_id) のリストを返します。
@@ -376,9 +646,9 @@ class StatisticalSessionManager:
         指定されたチャンネルのアクティブなセッション開始時刻を返します。
         セッションが存在しない場合は None を返します。
         """
-        key = (guild_id, channel_id)
-        if key in self.active_voice_sessions:
-            return self.active_voice_sessions[key]["session_start"]
+        session_data = self.active_voice_sessions.get((guild_id, channel_id))
+        if session_data is not None:
+            return epoch_to_datetime(session_data.session_start)
         return None
 
     def is_session_active(self, guild_id: int, channel_id: int):
@@ -396,13 +666,13 @@ class StatisticalSessionManager:
             f"Fetching formatted active call durations for guild {guild_id} from StatisticalSessionManager."
         )
         active_calls = []
-        now = datetime.datetime.now(datetime.timezone.utc)
+        now = time.time()
         # アクティブな2人以上通話セッションを全て確認
         for key, session_data in self.active_voice_sessions.items():
             # 指定されたギルドのセッションのみを対象とする
             if key[0] == guild_id:
                 # セッション開始からの経過時間を計算
-                duration_seconds = (now - session_data["session_start"]).total_seconds()
+                duration_seconds = now - session_data.session_start
                 # 表示用にフォーマット
                 formatted_duration = format_duration(duration_seconds)
                 # チャンネルIDとフォーマット済み通話時間をリストに追加
@@ -589,6 +859,11 @@ class VoiceStateManager:
         self.call_notification_manager = call_notification_manager
         self.statistical_session_manager = statistical_session_manager
         self.bot_status_updater = bot_status_updater
+        # 前回保存したスナップショットが空だったか (空のスナップショットの再保存を省略するため)
+        self._snapshot_was_empty = False
+        # ボイスステート更新を処理するギルドごとのキュー (VoiceEvents が設定する)
+        # 設定されている場合、整合性チェックはボイスステート更新と同じキューで順番に処理する
+        self.guild_actors: GuildActors | None = None
         logger.info("VoiceStateManager initialized with decomposed components.")
 
     # --- ボイスステート更新通知ハンドラ ---
@@ -621,35 +896,20 @@ class VoiceStateManager:
                 guild_id, channel_after.id
             ):
                 self.statistical_session_manager.start_session(guild_id, channel_after)
-            else:
-                # 既存セッションへのメンバー追加は update_session_members でまとめて行う
-                pass  # ここでは何もしない
             # ステータス更新対象としてチャンネルを追加
             self.bot_status_updater.add_active_channel(guild_id, channel_after.id)
-        else:
-            # 人数がconstants.MIN_MEMBERS_FOR_SESSION人未満の場合は、既にセッションが存在する場合のみ更新する
-            # （一時的に人数が減ってもセッション自体は継続しているとみなす）
-            if self.statistical_session_manager.is_session_active(
-                guild_id, channel_after.id
-            ):
-                pass  # 既存セッションへのメンバー追加は update_session_members でまとめて行う
             # 人数がconstants.MIN_MEMBERS_FOR_SESSION人未満になったら active_status_channels から削除
             # notify_member_left/moved で処理するため、ここでは追加のみ考慮
 
-        # 統計セッションマネージャーでメンバーリストを更新し、終了した個別のセッションデータを取得
-        # セッションがアクティブな場合のみ update_session_members を呼び出す
-        ended_sessions_data = []
-        if self.statistical_session_manager.is_session_active(
-            guild_id, channel_after.id
-        ):
-            ended_sessions_data = (
-                self.statistical_session_manager.update_session_members(
-                    guild_id, channel_after
-                )
-            )
+        # 既存セッションには参加したメンバーだけを追加する (O(1))
+        # 人数がconstants.MIN_MEMBERS_FOR_SESSION人未満でも、既にセッションが存在する場合は更新する
+        # （一時的に人数が減ってもセッション自体は継続しているとみなす）
+        self.statistical_session_manager.add_member(
+            guild_id, channel_after.id, member.id
+        )
 
-        # 終了した個別のメンバーセッションデータを返す（voice_events.py で統計更新と通知チェックを行う）
-        return ended_sessions_data
+        # 入室では個別のメンバーセッションは終了しないため、空のリストを返す
+        return []
 
     async def notify_member_left(
         self, member: discord.Member, channel_before: discord.VoiceChannel
@@ -690,11 +950,9 @@ class VoiceStateManager:
                     guild_id, channel_before.id
                 )
             else:
-                # 既存セッションからのメンバー削除は update_session_members でまとめて行う
-                ended_sessions_data = (
-                    self.statistical_session_manager.update_session_members(
-                        guild_id, channel_before
-                    )
+                # 既存セッションからは退出したメンバーだけを削除する (O(1))
+                ended_sessions_data = self.statistical_session_manager.remove_member(
+                    guild_id, channel_before.id, member.id
                 )
 
         # 終了した個別のメンバーセッションデータを返す（voice_events.py で統計更新と通知チェックを行う）
@@ -716,7 +974,6 @@ class VoiceStateManager:
             f"notify_member_moved: Member {member.id} moved from channel {channel_before.id} ({channel_before.name}) to channel {channel_after.id} ({channel_after.name})."
         )
         guild_id = member.guild.id
-        key_after = (guild_id, channel_after.id)
 
         # 通話通知マネージャーに処理を委譲 (移動元からの退出処理)
         # 移動元のチャンネルに誰もいなくなった場合のみ通話終了とみなし、通知を送信
@@ -750,10 +1007,10 @@ class VoiceStateManager:
                     guild_id, channel_before.id
                 )
             else:
-                # 既存セッションからのメンバー削除は update_session_members でまとめて行う
+                # 既存セッションからは移動したメンバーだけを削除する (O(1))
                 ended_sessions_from_before = (
-                    self.statistical_session_manager.update_session_members(
-                        guild_id, channel_before
+                    self.statistical_session_manager.remove_member(
+                        guild_id, channel_before.id, member.id
                     )
                 )
 
@@ -768,34 +1025,10 @@ class VoiceStateManager:
             # ステータス更新対象としてチャンネルを追加
             self.bot_status_updater.add_active_channel(guild_id, channel_after.id)
 
-            # 統計セッションマネージャーでメンバーリストを更新し、終了した個別のセッションデータを取得
             # 移動してきたメンバーのデータとしてID、現在の通話時間（この時点では0）、参加時刻を記録
-            # update_session_members は退出メンバーのデータを返すため、ここでは別途処理が必要
-            now = datetime.datetime.now(datetime.timezone.utc)
-            if (
-                member.id
-                not in self.statistical_session_manager.active_voice_sessions[
-                    key_after
-                ]["current_members"]
-            ):
-                # 新規参加メンバーの参加時刻を記録
-                self.statistical_session_manager.active_voice_sessions[key_after][
-                    "current_members"
-                ][member.id] = now
-                self.statistical_session_manager.active_voice_sessions[key_after][
-                    "all_participants"
-                ].add(member.id)
-                joined_session_data = (
-                    member.id,
-                    0,
-                    now,
-                )  # 移動してきたメンバーのデータとして記録
-                logger.debug(
-                    f"Recorded joined_session_data for moved member {member.id}."
-                )
-            else:
-                # 既に current_members にいる場合は、移動ではなく状態変化とみなす（ここでは処理しない）
-                pass
+            joined_session_data = self.statistical_session_manager.add_member(
+                guild_id, channel_after.id, member.id
+            )
 
         else:
             # 移動先チャンネルの人数がconstants.MIN_MEMBERS_FOR_SESSION人未満の場合は、既にセッションが存在する場合のみ更新する
@@ -803,41 +1036,110 @@ class VoiceStateManager:
             if self.statistical_session_manager.is_session_active(
                 guild_id, channel_after.id
             ):
-                # 統計セッションマネージャーでメンバーリストを更新し、終了した個別のセッションデータを取得
                 # 移動してきたメンバーのデータとしてID、現在の通話時間（この時点では0）、参加時刻を記録
-                # update_session_members は退出メンバーのデータを返すため、ここでは別途処理が必要
-                now = datetime.datetime.now(datetime.timezone.utc)
-                key_after = (guild_id, channel_after.id)
-                if key_after in self.statistical_session_manager.active_voice_sessions:
-                    if (
-                        member.id
-                        not in self.statistical_session_manager.active_voice_sessions[
-                            key_after
-                        ]["current_members"]
-                    ):
-                        # 新規参加メンバーの参加時刻を記録
-                        self.statistical_session_manager.active_voice_sessions[
-                            key_after
-                        ]["current_members"][member.id] = now
-                        self.statistical_session_manager.active_voice_sessions[
-                            key_after
-                        ]["all_participants"].add(member.id)
-                        joined_session_data = (
-                            member.id,
-                            0,
-                            now,
-                        )  # 移動してきたメンバーのデータとして記録
-                        logger.debug(
-                            f"Recorded joined_session_data for moved member {member.id}."
-                        )
-                    else:
-                        # 既に current_members にいる場合は、移動ではなく状態変化とみなす（ここでは処理しない）
-                        pass
+                joined_session_data = self.statistical_session_manager.add_member(
+                    guild_id, channel_after.id, member.id
+                )
 
         # 移動元チャンネルで終了した個別のメンバーセッションデータのリストと、
         # 移動先チャンネルに参加したメンバーのデータを返す
         return ended_sessions_from_before, joined_session_data
 
+    def seed_channel(
+        self, guild_id: int, channel: discord.VoiceChannel, now: float
+    ) -> tuple[bool, bool]:
+        """
+        起動時のブートストラップで、既に通話中のチャンネルの状態を各コンポーネントに登録します。
+        スナップショットから復元済みのセッションはそのまま引き継ぎます。
+
+        Returns:
+            (通話セッションを登録したか, 2人以上通話セッションを開始したか) のタプル。
+        """
+        call_seeded = self.call_notification_manager.seed_call_session(
+            guild_id, channel, now
+        )
+        session_seeded = False
+        if len(channel.members) >= constants.MIN_MEMBERS_FOR_SESSION:
+            if not self.statistical_session_manager.is_session_active(
+                guild_id, channel.id
+            ):
+                self.statistical_session_manager.start_session(guild_id, channel)
+                session_seeded = True
+            self.bot_status_updater.add_active_channel(guild_id, channel.id)
+        return call_seeded, session_seeded
+
+    async def check_session_consistency(self) -> int:
+        """
+        2人以上通話セッションのメンバーとチャンネルの実際のメンバーの整合性をチェックします。
+        ギルドごとに StatisticalSessionManager に処理を委譲し、見つかったずれの件数の合計を返します。
+        ギルドのキューがある場合は、ボイスステート更新と競合しないようキューの中でチェックします。
+        """
+        guild_ids = {
+            guild_id
+            for guild_id, _ in self.statistical_session_manager.active_voice_sessions
+        }
+        if self.guild_actors is None:
+            results = [await self._check_guild_consistency(g) for g in guild_ids]
+        else:
+            results = await asyncio.gather(
+                *(
+                    self.guild_actors.run(g, self._check_guild_consistency, g)
+                    for g in guild_ids
+                )
+            )
+        return sum(results)
+
+    async def _check_guild_consistency(self, guild_id: int) -> int:
+        drift = await self.statistical_session_manager.reconcile_sessions(guild_id)
+        # チェックで終了したセッションのチャンネルはステータス更新の対象から削除する
+        for key in list(self.bot_status_updater.active_status_channels):
+            if key[0] == guild_id and not (
+                self.statistical_session_manager.is_session_active(*key)
+            ):
+                self.bot_status_updater.remove_active_channel(*key)
+        return drift
+
+    async def save_snapshot(self, force: bool = False) -> bool:
+        """
+        進行中の通話セッションのスナップショットをデータベースに保存します。
+        進行中のセッションがなく、前回のスナップショットも空の場合は書き込みを省略します (force=True で常に保存)。
+        """
+        sessions, members = self.statistical_session_manager.snapshot_rows()
+        calls = self.call_notification_manager.snapshot_rows()
+        is_empty = not sessions and not calls
+        if is_empty and self._snapshot_was_empty and not force:
+            return False
+        snapshot_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        # 一部のシャードだけを担当している場合は、そのシャードのギルドのスナップショットだけを置き換える
+        saved = await save_session_snapshot(
+            sessions, members, calls, snapshot_at, get_shard_scope(self.bot)
+        )
+        if saved:
+            self._snapshot_was_empty = is_empty
+        return saved
+
+    async def restore_from_snapshot(self):
+        """
+        起動時に、保存されたスナップショットから進行中の通話セッションを復元します。
+        復元後の状態ですぐにスナップショットを保存し直し、同じスナップショットが二重に記録されないようにします。
+        """
+        snapshot = await load_session_snapshot(get_shard_scope(self.bot))
+        restored_calls = self.call_notification_manager.restore_call_sessions(
+            snapshot["calls"]
+        )
+        restored_sessions = await self.statistical_session_manager.restore_sessions(
+            snapshot["sessions"], snapshot["members"]
+        )
+        for (
+            guild_id,
+            channel_id,
+        ) in self.statistical_session_manager.get_active_session_keys():
+            self.bot_status_updater.add_active_channel(guild_id, channel_id)
+        await self.save_snapshot(force=True)
+        logger.info(
+            f"Restored {restored_sessions}/{len(snapshot['sessions'])} statistical sessions and {restored_calls}/{len(snapshot['calls'])} call sessions from snapshot."
+        )
+
     # 二人以上の通話時間計算ヘルパー関数は StatisticalSessionManager に移動
     # get_active_call_durations は StatisticalSessionManager に移動
     # _update_call_status_task は BotStatusUpdater に移動